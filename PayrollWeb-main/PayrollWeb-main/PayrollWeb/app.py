@@ -1,7 +1,30 @@
+import importlib
+import threading
 from flask import Flask
 from flask_login import LoginManager
 from config import Config
-from models import db, User
+from models import db
+
+BLUEPRINTS = ('routes.auth:auth_bp', 'routes.admin:admin_bp', 'routes.employee:employee_bp', 'routes.api:api_bp')
+
+def register_blueprints(app):
+    for path in BLUEPRINTS:
+        module, name = path.split(':')
+        app.register_blueprint(getattr(importlib.import_module(module), name))
+
+def register_blueprints_lazily(app):
+    """Import and register the blueprints when the first request comes in"""
+    wsgi_app = app.wsgi_app
+    lock = threading.Lock()
+    
+    def first_request(environ, start_response):
+        with lock:
+            if app.wsgi_app is first_request:
+                register_blueprints(app)
+                app.wsgi_app = wsgi_app
+        return wsgi_app(environ, start_response)
+    
+    app.wsgi_app = first_request
 
 def create_app():
     app = Flask(__name__)
@@ -9,6 +32,12 @@ def create_app():
     
     # Initialize extensions
     db.init_app(app)
+    from services.rendering import init_rendering
+    init_rendering(app)
+    from services.database import configure_engines
+    configure_engines(app, db)
+    from services.metrics import init_metrics
+    init_metrics(app, db)
     
     # Setup Flask-Login
     login_manager = LoginManager()
@@ -19,23 +48,40 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # Served from the principal cache; one primary-key lookup of its version in steady state
+        from services.principal import load_principal
+        return load_principal(int(user_id))
     
     # Register blueprints
-    from routes.auth import auth_bp
-    from routes.admin import admin_bp
-    from routes.employee import employee_bp
+    production = app.config['BOOT_MODE'] == 'production'
+    if production:
+        register_blueprints_lazily(app)
+    else:
+        register_blueprints(app)
+    
+    # Conditional GETs and static fingerprints
+    from services.http_cache import init_http_cache
+    init_http_cache(app)
+    
+    # Background jobs
+    from services.jobs import init_jobs
+    init_jobs(app)
+    from services.punches import init_punches
+    init_punches(app)
     
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(admin_bp)
-    app.register_blueprint(employee_bp)
+    # Register CLI commands
+    from commands import register_commands
+    register_commands(app)
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    # Create database tables (in production: `flask db upgrade` when deploying)
+    if not production:
+        from migrations import upgrade
+        with app.app_context():
+            db.create_all()
+            upgrade()
     
     return app
 
 if __name__ == '__main__':
     app = create_app()
-    app.run(debug=True)
+    app.run(debug=app.debug)
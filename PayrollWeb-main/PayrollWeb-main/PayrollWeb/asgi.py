@@ -0,0 +1,8 @@
+"""
+ASGI entry point: employee self-service pages on the event loop (see services.asgi)
+Run: uvicorn asgi:app
+"""
+from app import create_app
+from services.asgi import AsgiApp
+
+app = AsgiApp(create_app())
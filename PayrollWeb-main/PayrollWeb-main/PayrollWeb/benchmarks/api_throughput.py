@@ -0,0 +1,136 @@
+"""
+JSON API throughput benchmark.
+
+Builds a scratch SQLite database of N employees with a month of attendance
+summaries, then runs W worker processes, each calling the app's WSGI
+interface as fast as it can for a few seconds (no HTTP server, so this is
+the app's ceiling rather than a network figure), and reports requests per
+second for:
+- one employee: GET /api/v1/employees/<id>
+- employee page: GET /api/v1/employees?per_page=100&compact=1
+- salary batch: POST /api/v1/salary/batch, 100 employees x 3 months
+- salary page (HTML): GET /admin/salary?month=..., for comparison
+Every API call is made with orjson and again with the standard json module.
+Run: python benchmarks/api_throughput.py --employees 10000 --workers 4 --seconds 3
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+YEAR, MONTH = 2024, 6
+TOKEN = 'benchmark'
+HEADERS = {'Authorization': f'Bearer {TOKEN}'}
+
+
+def configure(directory):
+    os.environ.update(DATABASE_URL='sqlite:///' + os.path.join(directory, 'api.db'),
+                      STATS_CACHE_PATH=os.path.join(directory, 'stats.db'),
+                      TEMPLATE_CACHE_DIR=os.path.join(directory, 'templates'),
+                      API_TOKEN=TOKEN, JOB_WORKERS='0', PUNCH_COMPACT_SECONDS='0', METRICS_ENABLED='0')
+
+
+def build_database(employees):
+    from app import create_app
+    from models import db, Employee, AttendanceSummary, User
+    app = create_app()
+    with app.app_context():
+        db.session.execute(db.insert(Employee), [
+            {'id': i, 'full_name': f'Employee {i}', 'position': 'Technician',
+             'daily_wage': 300000.0, 'start_date': date(2024, 1, 1)} for i in range(1, employees + 1)])
+        db.session.execute(db.insert(AttendanceSummary), [
+            {'employee_id': i, 'year': YEAR, 'month': month, 'total_hours': 160.0, 'days_worked': 20}
+            for i in range(1, employees + 1) for month in (MONTH - 2, MONTH - 1, MONTH)])
+        admin = User(username='admin', role='admin')
+        admin.set_password('admin')
+        db.session.add(admin)
+        db.session.commit()
+
+
+def requests_of(name, employees, rng):
+    """Endless (method, path, json body) of one benchmark"""
+    month = f'{YEAR:04d}-{MONTH:02d}'
+    while True:
+        first = rng.randrange(1, max(employees - 100, 1) + 1)
+        if name == 'one employee':
+            yield 'GET', f'/api/v1/employees/{first}', None
+        elif name == 'employee page':
+            yield 'GET', f'/api/v1/employees?per_page=100&compact=1&after={first}', None
+        elif name == 'salary batch':
+            yield 'POST', '/api/v1/salary/batch', {
+                'employee_ids': list(range(first, first + 100)), 'compact': True,
+                'from': f'{YEAR:04d}-{MONTH - 2:02d}', 'to': month}
+        else:
+            yield 'GET', f'/admin/salary?month={month}', None
+
+
+def worker(name, encoder, employees, seconds, results):
+    import services.api
+    from app import create_app
+    if encoder == 'json':
+        services.api.orjson = None
+    client = create_app().test_client()
+    if name.endswith('(HTML)'):
+        client.post('/login', data={'username': 'admin', 'password': 'admin'})
+        client.get('/admin/dashboard')
+    count = 0
+    calls = requests_of(name, employees, random.Random(os.getpid()))
+    for method, path, body in itertools.islice(calls, 10):  # Warm up: routes, statement caches
+        client.open(path, method=method, json=body, headers=HEADERS)
+    started = time.perf_counter()
+    try:
+        for method, path, body in calls:
+            if time.perf_counter() - started >= seconds:
+                break
+            response = client.open(path, method=method, json=body, headers=HEADERS)
+            assert response.status_code == 200, (path, response.status_code)
+            response.get_data()
+            count += 1
+    finally:
+        results.put(count / (time.perf_counter() - started))
+
+
+def run(name, encoder, employees, workers, seconds):
+    """Requests per second of all workers together"""
+    context = multiprocessing.get_context('spawn')  # Fresh processes, nothing inherited from the setup
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(name, encoder, employees, seconds, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    rate = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    configure(tempfile.mkdtemp())
+    build_database(args.employees)
+    os.environ['BOOT_MODE'] = 'production'
+
+    print(f'{args.employees} employees, {args.workers} workers, {args.seconds:g}s, requests/s')
+    print(f'{"":>22}{"orjson":>10}{"json":>10}')
+    for name in ('one employee', 'employee page', 'salary batch'):
+        rates = [run(name, encoder, args.employees, args.workers, args.seconds) for encoder in ('orjson', 'json')]
+        print(f'{name:>22}' + ''.join(f'{rate:>10.0f}' for rate in rates))
+    rate = run('salary page (HTML)', 'orjson', args.employees, args.workers, args.seconds)
+    print(f'{"salary page (HTML)":>22}{rate:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
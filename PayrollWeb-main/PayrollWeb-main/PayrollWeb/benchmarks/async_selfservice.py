@@ -0,0 +1,191 @@
+"""
+Sync (WSGI) vs async (ASGI) serving benchmark for employee self-service.
+
+Builds a scratch SQLite database of N employees with accounts and a month
+of attendance, then serves the app from one process, two ways:
+- sync: Werkzeug's threaded WSGI server, one thread per connection;
+- async: uvicorn asgi:app, the self-service pages on the event loop with
+  aiosqlite (services.asgi).
+For each number of concurrent clients, every client signs in as its own
+employee and fetches the dashboard, attendance and salary pages in a
+loop, over one keep-alive connection where the server allows it. Reports requests per second, p50/p99 latency,
+failed requests, and the server's thread count and resident memory.
+Run: python benchmarks/async_selfservice.py --employees 2000 --connections 10 100 1000 --seconds 5
+"""
+import argparse
+import asyncio
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PAGES = ('/employee/dashboard', '/employee/attendance', '/employee/salary')
+TIMEOUT = 30  # Seconds before a request counts as failed
+
+SYNC_SERVER = '''
+import sys
+from werkzeug.serving import make_server
+from app import create_app
+make_server('127.0.0.1', int(sys.argv[1]), create_app(), threaded=True).serve_forever()
+'''
+
+
+def configure(directory):
+    os.environ.update(DATABASE_URL='sqlite:///' + os.path.join(directory, 'selfservice.db'),
+                      STATS_CACHE_PATH=os.path.join(directory, 'stats.db'),
+                      TEMPLATE_CACHE_DIR=os.path.join(directory, 'templates'),
+                      JOB_WORKERS='0', PUNCH_COMPACT_SECONDS='0', METRICS_ENABLED='0',
+                      PRINCIPAL_CACHE_SIZE='100000', PYTHONPATH=ROOT)
+
+
+def build_database(employees):
+    """Employees, their accounts and this month's attendance; return the session cookies"""
+    from app import create_app
+    from models import db, Employee, User, Attendance
+    from services.passwords import hash_password
+    from services.summary import rebuild_summaries
+    app = create_app()
+    today = date.today()
+    days = [today.replace(day=1) + timedelta(days=i) for i in range(min(today.day, 20))]
+    with app.app_context():
+        password_hash = hash_password('123456')  # One hash for everyone: scrypt is slow on purpose
+        db.session.execute(db.insert(Employee), [
+            {'id': i, 'full_name': f'Employee {i}', 'position': 'Technician',
+             'daily_wage': 300000.0, 'start_date': date(2024, 1, 1)} for i in range(1, employees + 1)])
+        db.session.execute(db.insert(User), [
+            {'id': i, 'username': f'user{i}', 'password_hash': password_hash, 'role': 'user', 'employee_id': i}
+            for i in range(1, employees + 1)])
+        db.session.execute(db.insert(Attendance), [
+            {'employee_id': i, 'work_date': day, 'work_hours': 8.0}
+            for i in range(1, employees + 1) for day in days])
+        db.session.commit()
+        rebuild_summaries()
+        # Signed-in sessions, as Flask-Login would store them
+        serializer = app.session_interface.get_signing_serializer(app)
+        name = app.config['SESSION_COOKIE_NAME']
+        return [f'{name}={serializer.dumps({"_user_id": str(i), "_fresh": True})}'
+                for i in range(1, employees + 1)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, port):
+    if mode == 'sync':
+        command = [sys.executable, '-c', SYNC_SERVER, str(port)]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+                   '--log-level', 'warning', '--no-access-log', '--backlog', '4096']
+    server = subprocess.Popen(command, cwd=ROOT, stderr=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            socket.create_connection(('127.0.0.1', port)).close()
+            return server
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def server_status(pid):
+    """(threads, resident MB) of a process"""
+    with open(f'/proc/{pid}/status') as f:
+        status = f.read()
+    threads = int(re.search(r'Threads:\s+(\d+)', status).group(1))
+    rss = int(re.search(r'VmRSS:\s+(\d+)', status).group(1)) / 1024
+    return threads, rss
+
+
+async def fetch(reader, writer, path, cookie):
+    """(status, whether the server keeps the connection open)"""
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n\r\n'.encode())
+    head = await reader.readuntil(b'\r\n\r\n')
+    length = int(re.search(rb'(?i)content-length:\s*(\d+)', head).group(1))
+    await reader.readexactly(length)
+    return int(head.split(b' ', 2)[1]), not re.search(rb'(?i)connection:\s*close', head)
+
+
+async def client(port, cookie, run, latencies, failures):
+    connection = await asyncio.open_connection('127.0.0.1', port)
+    await run['start'].wait()
+    i = 0
+    while time.perf_counter() < run['deadline']:
+        path = PAGES[i % len(PAGES)]
+        i += 1
+        began = time.perf_counter()
+        try:
+            if connection is None:
+                # Werkzeug's server closes the connection after each response
+                connection = await asyncio.open_connection('127.0.0.1', port)
+            status, keep_alive = await asyncio.wait_for(fetch(*connection, path, cookie), TIMEOUT)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, AttributeError):
+            failures.append(path)
+            status, keep_alive = None, False
+        if status == 200:
+            latencies.append(time.perf_counter() - began)
+        elif status is not None:
+            failures.append(path)
+        if not keep_alive and connection:
+            connection[1].close()
+            connection = None
+    if connection:
+        connection[1].close()
+
+
+async def load(port, cookies, connections, seconds, pid):
+    latencies, failures = [], []
+    run = {'start': asyncio.Event(), 'deadline': 0}
+    tasks = [asyncio.create_task(client(port, cookies[i % len(cookies)], run, latencies, failures))
+             for i in range(connections)]
+    await asyncio.sleep(0.5 + connections / 1000)  # Let every connection open
+    began = time.perf_counter()
+    run['deadline'] = began + seconds
+    run['start'].set()
+    await asyncio.sleep(seconds / 2)
+    status = server_status(pid)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return latencies, failures, time.perf_counter() - began, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--connections', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    configure(tempfile.mkdtemp())
+    cookies = build_database(args.employees)
+    os.environ['BOOT_MODE'] = 'production'
+
+    print(f'{args.employees} employees, {args.seconds:g}s per run, one server process')
+    print(f'{"mode":>6}{"conns":>7}{"req/s":>9}{"p50 ms":>9}{"p99 ms":>9}{"failed":>8}{"threads":>9}{"RSS MB":>8}')
+    for mode in ('sync', 'async'):
+        port = free_port()
+        server = start_server(mode, port)
+        try:
+            for connections in args.connections:
+                latencies, failures, elapsed, (threads, rss) = asyncio.run(
+                    load(port, cookies, connections, args.seconds, server.pid))
+                latencies.sort()
+                p50 = statistics.median(latencies) * 1000 if latencies else float('nan')
+                p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+                print(f'{mode:>6}{connections:>7}{len(latencies) / elapsed:>9.0f}{p50:>9.1f}{p99:>9.1f}'
+                      f'{len(failures):>8}{threads:>9}{rss:>8.0f}')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Attendance month filter benchmark.
+
+Builds a scratch SQLite database with the app's schema and compares the
+old extract(year)/extract(month) filter with the half-open date range used
+by the attendance pages: EXPLAIN QUERY PLAN and median latency of each.
+Run: python benchmarks/attendance_range.py --rows 10000000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select
+from models import db, Attendance
+from services.payroll import attendance_in_month
+
+DAYS = 730
+
+
+def build_database(path, rows):
+    engine = create_engine('sqlite:///' + path)
+    db.metadata.create_all(engine)
+    engine.dispose()
+
+    employees = -(-rows // DAYS)
+    first_day = date(2024, 1, 1)
+    dates = [(first_day + timedelta(days=i)).isoformat() for i in range(DAYS)]
+
+    def generate():
+        count = 0
+        for employee_id in range(1, employees + 1):
+            for day in dates:
+                if count == rows:
+                    return
+                yield (employee_id, day, 1.0)
+                count += 1
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.executemany(
+        'INSERT INTO attendances (employee_id, work_date, work_hours) VALUES (?, ?, ?)',
+        generate()
+    )
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return employees
+
+
+def extract_filter(year, month):
+    return db.and_(
+        db.extract('year', Attendance.work_date) == year,
+        db.extract('month', Attendance.work_date) == month
+    )
+
+
+def compile_sql(statement, engine):
+    return str(statement.compile(engine, compile_kwargs={'literal_binds': True}))
+
+
+def measure(conn, sql, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        count = len(conn.execute(sql).fetchall())
+        timings.append((time.perf_counter() - started) * 1000)
+    return count, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', help='Reuse or keep the scratch database at this path')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench.db')
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        employees = build_database(path, args.rows)
+        print(f'Built {args.rows:,} attendance rows for {employees:,} employees '
+              f'in {time.perf_counter() - started:.1f}s')
+
+    engine = create_engine('sqlite:///' + path)
+    year, month, employee_id = 2024, 6, 1
+    cases = [
+        ('all employees, extract', select(Attendance).where(extract_filter(year, month))),
+        ('all employees, range', select(Attendance).where(attendance_in_month(year, month))),
+        ('one employee, extract', select(Attendance).where(
+            Attendance.employee_id == employee_id, extract_filter(year, month))),
+        ('one employee, range', select(Attendance).where(
+            Attendance.employee_id == employee_id, attendance_in_month(year, month))),
+    ]
+
+    conn = sqlite3.connect(path)
+    for name, statement in cases:
+        sql = compile_sql(statement.order_by(Attendance.work_date.desc()), engine)
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+        count, median = measure(conn, sql, args.repeat)
+        print(f'\n{name}: {count:,} rows, median {median:.2f} ms')
+        for step in plan:
+            print(f'    {step}')
+    conn.close()
+
+    if not args.db:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
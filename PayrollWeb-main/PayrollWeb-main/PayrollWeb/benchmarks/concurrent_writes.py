@@ -0,0 +1,109 @@
+"""
+Concurrent attendance write benchmark.
+
+Starts N client processes that each insert attendance rows one transaction
+at a time (like the attendance form), optionally alongside reader processes
+running the monthly summary query, against a scratch SQLite database. Runs
+once with default engine settings and once with the app's configuration
+(WAL, synchronous=NORMAL, busy_timeout, mmap), and reports writes per
+second and "database is locked" errors.
+Run: python benchmarks/concurrent_writes.py --clients 8 --readers 2 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select, func, exc
+from config import Config
+from models import db, Employee, Attendance
+from services.database import configure_engine
+
+EMPLOYEES = 1000
+
+
+def make_engine(path, tuned):
+    engine = create_engine('sqlite:///' + path)
+    if tuned:
+        configure_engine(engine, vars(Config))
+    return engine
+
+
+def build_database(path):
+    engine = create_engine('sqlite:///' + path)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Employee), [
+            {'id': i, 'full_name': f'Employee {i}', 'daily_wage': 100.0, 'start_date': date(2024, 1, 1)}
+            for i in range(1, EMPLOYEES + 1)
+        ])
+    engine.dispose()
+
+
+def writer(path, tuned, client, deadline, results):
+    engine = make_engine(path, tuned)
+    writes = errors = 0
+    day = date(2000, 1, 1) + timedelta(days=client * 100000)
+    while time.time() < deadline:
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(Attendance).values(
+                    employee_id=writes % EMPLOYEES + 1,
+                    work_date=day + timedelta(days=writes),
+                    work_hours=8.0
+                ))
+            writes += 1
+        except exc.OperationalError:
+            errors += 1
+    results.put((writes, errors))
+
+
+def reader(path, tuned, deadline):
+    engine = make_engine(path, tuned)
+    query = select(Attendance.employee_id, func.sum(Attendance.work_hours)).group_by(Attendance.employee_id)
+    while time.time() < deadline:
+        try:
+            with engine.connect() as conn:
+                conn.execute(query).all()
+        except exc.OperationalError:
+            pass
+
+
+def run(tuned, clients, readers, seconds):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    build_database(path)
+    results = multiprocessing.Queue()
+    deadline = time.time() + seconds
+    processes = [multiprocessing.Process(target=writer, args=(path, tuned, i, deadline, results))
+                 for i in range(clients)]
+    processes += [multiprocessing.Process(target=reader, args=(path, tuned, deadline))
+                  for _ in range(readers)]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in range(clients)]
+    for process in processes:
+        process.join()
+    return sum(t[0] for t in totals) / seconds, sum(t[1] for t in totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, action='append', help='parallel writers (repeatable), default 1, 4, 8')
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f'{"clients":>8}{"engine":>10}{"writes/s":>12}{"locked":>10}')
+    for clients in args.clients or [1, 4, 8]:
+        for tuned in (False, True):
+            rate, errors = run(tuned, clients, args.readers, args.seconds)
+            print(f'{clients:>8}{"tuned" if tuned else "default":>10}{rate:>12.1f}{errors:>10}')
+
+
+if __name__ == '__main__':
+    main()
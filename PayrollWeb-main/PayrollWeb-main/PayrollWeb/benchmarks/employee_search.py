@@ -0,0 +1,96 @@
+"""
+Employee search benchmark.
+
+Fills a scratch SQLite database with synthetic Vietnamese employees, builds
+the FTS5 search index and reports the median latency of ranked searches
+(prefix, accented, multi-word, typo) next to the old three-column LIKE scan.
+Run: python benchmarks/employee_search.py --employees 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUERIES = [
+    ('prefix', 'nguy'),
+    ('accented', 'Đặng Thị Hạnh'),
+    ('folded', 'dang thi hanh'),
+    ('multi-word', 'ho quoc tuan'),
+    ('typo', 'nguyne xuan phnog'),
+    ('phone', '0912'),
+    ('phone part', '5678'),
+    ('email', 'user12345'),
+    ('no match', 'zzzz'),
+]
+
+
+def build_database(path, count):
+    from services.workforce import random_name
+    rng = random.Random(1)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.executemany(
+        'INSERT INTO employees (id, full_name, phone, email, daily_wage, start_date, status) '
+        "VALUES (?, ?, ?, ?, 100, '2024-01-01', 'active')",
+        ((i, random_name(rng), f'09{rng.randrange(10 ** 8):08d}', f'user{i}@example.com')
+         for i in range(1, count + 1))
+    )
+    conn.commit()
+    conn.close()
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--like', action='store_true', help='also time the old LIKE search')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'search.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+
+    from flask import Flask
+    from config import Config
+    from models import db, Employee
+    from services.search import rebuild_index, search_employee_ids, like_filter
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        build_database(path, args.employees)
+        started = time.perf_counter()
+        rebuild_index()
+        print(f'{args.employees} employees, index built in {time.perf_counter() - started:.1f}s')
+
+        print(f'{"query":<12}{"text":<22}{"fts ms":>10}{"like ms":>10}  top result')
+        for label, text in QUERIES:
+            fts_ms, ids = median_ms(lambda: search_employee_ids(text, limit=50), args.repeat)
+            like_ms = ''
+            if args.like:
+                like_ms, _ = median_ms(lambda: db.session.execute(
+                    db.select(Employee.id).where(like_filter(text)).limit(50)).all(), 3)
+                like_ms = f'{like_ms:.1f}'
+            top = db.session.get(Employee, ids[0]).full_name if ids else '-'
+            print(f'{label:<12}{text:<22}{fts_ms:>10.2f}{like_ms:>10}  {top}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Load test of the main routes on a synthetic workforce.
+
+Builds a scratch database with services.workforce (fixed seed and months,
+so runs are comparable), then drives each scenario through Flask's test
+client, first from one client and then from --clients concurrent clients.
+Reports p50/p95/p99 latency, throughput and SQL queries per request, and
+writes the results as JSON; --compare prints the change against an earlier
+result file.
+Run: python benchmarks/load_test.py --employees 2000 --months 6 -o results.json
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LAST_MONTH = (2025, 12)
+ADMIN = ('admin', 'admin123')
+
+
+def login(client, username, password):
+    """Log in from a fresh session, fail unless redirected to the dashboard"""
+    client.delete_cookie('session')
+    response = client.post('/login', data={'username': username, 'password': password})
+    assert response.status_code == 302, f'login of {username} failed'
+    return response
+
+
+def scenarios(employees):
+    """name -> (login as 'admin' / 'employee' / None, request function)"""
+    month = f'{LAST_MONTH[0]:04d}-{LAST_MONTH[1]:02d}'
+    return {
+        'login': (None, lambda client, i: login(client, f'user{i % employees + 1}', '123456')),
+        'admin_dashboard': ('admin', lambda client, i: client.get('/admin/dashboard')),
+        'employee_list': ('admin', lambda client, i: client.get('/admin/employees')),
+        'employee_search': ('admin', lambda client, i: client.get(
+            '/admin/employees', query_string={'search': ['nguyen van', 'tran thi h', 'le minh', 'hoang'][i % 4]})),
+        'attendance_list': ('admin', lambda client, i: client.get(
+            '/admin/attendance', query_string={'month': month})),
+        'salary': ('admin', lambda client, i: client.get('/admin/salary', query_string={'month': month})),
+        'export_csv': ('admin', lambda client, i: client.get(
+            '/admin/salary/export', query_string={'from': month, 'to': month, 'format': 'csv'})),
+        'employee_dashboard': ('employee', lambda client, i: client.get('/employee/dashboard')),
+        'employee_salary': ('employee', lambda client, i: client.get(
+            '/employee/salary', query_string={'month': month})),
+    }
+
+
+class QueryCounter:
+    """Counts SQL statements per thread"""
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def __call__(self, *args):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+
+    def take(self):
+        count = getattr(self.local, 'count', 0)
+        self.local.count = 0
+        return count
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(latencies, queries, seconds):
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / seconds, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2),
+    }
+
+
+def run_scenario(app, counter, role, request, requests, clients):
+    def make_client(index):
+        client = app.test_client()
+        if role == 'admin':
+            login(client, *ADMIN)
+        elif role == 'employee':
+            login(client, f'user{index + 1}', '123456')
+        return client
+
+    def worker(index, count):
+        client = make_client(index)
+        request(client, 0).close()  # Warm up caches of this client
+        counter.take()
+        latencies, queries = [], []
+        for i in range(count):
+            started = time.perf_counter()
+            response = request(client, index * count + i)
+            response.get_data()
+            response.close()
+            latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(counter.take())
+            assert response.status_code < 400, response.status_code
+        return latencies, queries
+
+    per_client = max(1, requests // clients)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(worker, range(clients), [per_client] * clients))
+    seconds = time.perf_counter() - started
+    return summarize([l for r in results for l in r[0]], [q for r in results for q in r[1]], seconds)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(previous, current):
+    print(f'\n{"scenario":<20}{"mode":<12}{"p95 ms":>18}{"queries/req":>16}')
+    for name, modes in current['results'].items():
+        for mode, now in modes.items():
+            before = previous.get('results', {}).get(name, {}).get(mode)
+            if not before:
+                continue
+            change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0
+            print(f'{name:<20}{mode:<12}{before["p95_ms"]:>7.1f} → {now["p95_ms"]:<6.1f}{change:+5.0f}%'
+                  f'{before["queries_per_request"]:>7} → {now["queries_per_request"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario and mode')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--scenario', action='append', help='run only these scenarios (repeatable)')
+    parser.add_argument('--output', '-o', help='write the JSON results here')
+    parser.add_argument('--compare', help='earlier JSON results to compare with')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'load.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')  # Keep logins cheap unless asked
+
+    from sqlalchemy import event
+    from app import create_app
+    from models import db, User
+    from services.workforce import generate_workforce
+
+    app = create_app()
+    counter = QueryCounter()
+    with app.app_context():
+        started = time.perf_counter()
+        admin = User(username=ADMIN[0], role='admin')
+        admin.set_password(ADMIN[1])
+        db.session.add(admin)
+        db.session.commit()
+        _, rows = generate_workforce(args.employees, args.months, seed=args.seed, last_month=LAST_MONTH)
+        print(f'{args.employees} employees, {rows} attendance rows in {time.perf_counter() - started:.1f}s')
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', counter)
+
+    selected = scenarios(args.employees)
+    if args.scenario:
+        selected = {name: selected[name] for name in args.scenario}
+
+    results = {}
+    print(f'{"scenario":<20}{"mode":<12}{"rps":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}')
+    for name, (role, request) in selected.items():
+        results[name] = {}
+        for mode, clients in (('sequential', 1), ('concurrent', args.clients)):
+            result = run_scenario(app, counter, role, request, args.requests, clients)
+            results[name][mode] = result
+            print(f'{name:<20}{mode:<12}{result["rps"]:>8}{result["p50_ms"]:>9}{result["p95_ms"]:>9}'
+                  f'{result["p99_ms"]:>9}{result["queries_per_request"]:>9}')
+
+    output = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'cpus': os.cpu_count(),
+        'parameters': {
+            'employees': args.employees, 'months': args.months, 'seed': args.seed,
+            'requests': args.requests, 'clients': args.clients,
+            'password_hash_method': app.config['PASSWORD_HASH_METHOD'],
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Login password verification benchmark.
+
+For each hash method, hashes a password once and then verifies it from
+--clients concurrent threads through services.passwords (the bounded
+hashing pool), reporting hash time, verifications per second and latency.
+Run: python benchmarks/login_throughput.py --logins 200 --clients 16
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from config import Config
+from services import passwords
+
+METHODS = [
+    'scrypt:32768:8:1',
+    'scrypt:16384:8:1',
+    'pbkdf2:sha256:600000',
+    'pbkdf2:sha256:100000',
+]
+
+
+def run(app, method, logins, clients):
+    app.config['PASSWORD_HASH_METHOD'] = method
+    with app.app_context():
+        started = time.perf_counter()
+        password_hash = passwords.hash_password('123456')
+        hash_ms = (time.perf_counter() - started) * 1000
+
+    def login(_):
+        with app.app_context():
+            started = time.perf_counter()
+            assert passwords.verify_password(password_hash, '123456')
+            return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        latencies = sorted(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+    return hash_ms, logins / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=16, help='concurrent login requests')
+    parser.add_argument('--workers', type=int, default=Config.PASSWORD_HASH_WORKERS, help='hashing pool size')
+    parser.add_argument('--method', action='append', help='hash method (repeatable), default: a fixed set')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['PASSWORD_HASH_WORKERS'] = args.workers
+
+    print(f'{args.logins} logins, {args.clients} clients, {args.workers} hashing workers, {os.cpu_count()} CPUs')
+    print(f'{"method":<24}{"hash ms":>10}{"logins/s":>12}{"p50 ms":>10}{"p95 ms":>10}')
+    for method in args.method or METHODS:
+        hash_ms, rate, p50, p95 = run(app, method, args.logins, args.clients)
+        print(f'{method:<24}{hash_ms:>10.1f}{rate:>12.1f}{p50:>10.1f}{p95:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Sharded payroll scaling benchmark.
+
+Fills a scratch SQLite database with employees and one month of attendance
+summaries, then computes the month with services.parallel.compute_payroll
+on 1..N worker processes. A synthetic per-employee rule stands in for
+Python-heavy payroll rules. Every run is checked to be identical to the
+serial one.
+Run: python benchmarks/parallel_payroll.py --employees 500000 --max-workers 8
+"""
+import argparse
+import hashlib
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+YEAR, MONTH = 2024, 6
+
+
+def build_database(path, count):
+    rng = random.Random(1)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.executemany(
+        'INSERT INTO employees (id, full_name, position, daily_wage, start_date, status) '
+        "VALUES (?, ?, ?, ?, '2024-01-01', ?)",
+        ((i, f'Employee {i}', rng.choice(('Sales person', 'Accountant', 'Technician')),
+          float(rng.randrange(200000, 600000, 10000)), 'active' if rng.random() < 0.95 else 'inactive')
+         for i in range(1, count + 1))
+    )
+    conn.executemany(
+        'INSERT INTO attendance_summaries (employee_id, year, month, total_hours, days_worked) '
+        'VALUES (?, ?, ?, ?, ?)',
+        ((i, YEAR, MONTH, float(rng.randrange(10, 23)), 20) for i in range(1, count + 1) if rng.random() < 0.9)
+    )
+    conn.commit()
+    conn.close()
+
+
+def progressive_tax_rule(cost, row):
+    """Stand-in for Python payroll rules: a bracketed tax evaluated `cost` times"""
+    brackets = ((5e6, 0.05), (10e6, 0.10), (18e6, 0.15), (32e6, 0.20), (52e6, 0.25), (80e6, 0.30))
+    tax = 0.0
+    for _ in range(cost):
+        tax, lower = 0.0, 0.0
+        for upper, rate in brackets:
+            if row.total_salary <= lower:
+                break
+            tax += (min(row.total_salary, upper) - lower) * rate
+            lower = upper
+    return row._replace(total_salary=row.total_salary - tax)
+
+
+def digest(rows):
+    sha = hashlib.sha256()
+    count = 0
+    for row in rows:
+        sha.update(repr(tuple(row)).encode())
+        count += 1
+    return sha.hexdigest(), count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=500000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--shard-size', type=int, default=20000)
+    parser.add_argument('--rule-cost', type=int, default=20, help='rule evaluations per employee')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'payroll.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+
+    from flask import Flask
+    from config import Config
+    from models import db
+    from services.database import configure_engines
+    from services.parallel import compute_payroll
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['PAYROLL_SHARD_SIZE'] = args.shard_size
+    db.init_app(app)
+    configure_engines(app, db)
+    rule = partial(progressive_tax_rule, args.rule_cost)
+    with app.app_context():
+        db.create_all()
+        build_database(path, args.employees)
+        print(f'{args.employees} employees, shards of {args.shard_size}, '
+              f'rule cost {args.rule_cost}, {os.cpu_count()} CPUs')
+
+        print(f'{"workers":>8}{"seconds":>10}{"rows/s":>12}{"speedup":>10}  identical')
+        baseline = serial = None
+        for workers in range(1, args.max_workers + 1):
+            digest(compute_payroll(YEAR, MONTH, rule=rule, workers=workers))  # Start the pool
+            started = time.perf_counter()
+            result = digest(compute_payroll(YEAR, MONTH, rule=rule, workers=workers))
+            seconds = time.perf_counter() - started
+            baseline = baseline or seconds
+            serial = serial or result
+            print(f'{workers:>8}{seconds:>10.2f}{result[1] / seconds:>12.0f}{baseline / seconds:>10.2f}  '
+                  f'{"yes" if result == serial else "NO"}')
+
+
+if __name__ == '__main__':
+    main()
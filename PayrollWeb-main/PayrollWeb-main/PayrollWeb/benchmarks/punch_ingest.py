@@ -0,0 +1,160 @@
+"""
+Clock punch ingestion benchmark.
+
+N client processes punch as fast as they can for a few seconds against a
+scratch SQLite database with the app's engine settings, two ways:
+- attendance: the form's write path, i.e. a duplicate check, an attendance
+  insert under the unique constraint and a summary bucket refresh in one
+  transaction per punch.
+- log: one insert into the punch_events log per punch.
+The punches written to the log are then folded into attendance with
+services.punches.compact_all, and its throughput is reported as well.
+Run: python benchmarks/punch_ingest.py --clients 8 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, exc, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as upsert
+from config import Config
+from models import db, Employee, Attendance, AttendanceSummary, PunchEvent
+from services.database import configure_engine
+
+EMPLOYEES = 5000
+START = datetime(2024, 6, 3, 8)
+
+
+def make_engine(path):
+    engine = create_engine('sqlite:///' + path)
+    configure_engine(engine, vars(Config))
+    return engine
+
+
+def build_database(path):
+    engine = make_engine(path)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Employee), [
+            {'id': i, 'full_name': f'Employee {i}', 'daily_wage': 100.0, 'start_date': date(2024, 1, 1)}
+            for i in range(1, EMPLOYEES + 1)
+        ])
+    engine.dispose()
+
+
+def punches(client, clients):
+    """Endless (employee_id, kind, punched_at): the client's employees clock in, then out, day after day"""
+    employees = range(client + 1, EMPLOYEES + 1, clients)
+    day = 0
+    while True:
+        for kind, hour in (('in', 0), ('out', 8)):
+            for employee_id in employees:
+                yield employee_id, kind, START + timedelta(days=day, hours=hour)
+        day += 1
+
+
+def attendance_writer(path, client, clients, deadline, results):
+    engine = make_engine(path)
+    summary = upsert(AttendanceSummary)
+    summary = summary.on_conflict_do_update(
+        index_elements=['employee_id', 'year', 'month'],
+        set_={'total_hours': summary.excluded.total_hours, 'days_worked': summary.excluded.days_worked}
+    )
+    writes = errors = 0
+    for employee_id, kind, punched_at in punches(client, clients):
+        if time.time() >= deadline:
+            break
+        if kind == 'in':
+            continue
+        work_date = punched_at.date()
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(select(Attendance.id).where(
+                    Attendance.employee_id == employee_id, Attendance.work_date == work_date)).first()
+                if not exists:
+                    conn.execute(insert(Attendance).values(employee_id=employee_id, work_date=work_date,
+                                                           work_hours=8.0))
+                hours, days = conn.execute(select(func.sum(Attendance.work_hours), func.count()).where(
+                    Attendance.employee_id == employee_id,
+                    Attendance.work_date >= work_date.replace(day=1))).one()
+                conn.execute(summary.values(employee_id=employee_id, year=work_date.year,
+                                            month=work_date.month, total_hours=hours, days_worked=days))
+            writes += 2  # One row stands for the in and the out punch
+        except exc.OperationalError:
+            errors += 1
+    results.put((writes, errors))
+
+
+def log_writer(path, client, clients, deadline, results):
+    engine = make_engine(path)
+    writes = errors = 0
+    for employee_id, kind, punched_at in punches(client, clients):
+        if time.time() >= deadline:
+            break
+        try:
+            with engine.begin() as conn:
+                conn.execute(insert(PunchEvent).values(employee_id=employee_id, kind=kind, punched_at=punched_at,
+                                                       received_at=datetime.utcnow()))
+            writes += 1
+        except exc.OperationalError:
+            errors += 1
+    results.put((writes, errors))
+
+
+def run(target, path, clients, seconds):
+    results = multiprocessing.Queue()
+    deadline = time.time() + seconds
+    processes = [multiprocessing.Process(target=target, args=(path, i, clients, deadline, results))
+                 for i in range(clients)]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in range(clients)]
+    for process in processes:
+        process.join()
+    return sum(t[0] for t in totals), sum(t[1] for t in totals)
+
+
+def compact(path):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    from flask import Flask
+    from services.database import configure_engines
+    from services.punches import compact_all
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+    db.init_app(app)
+    configure_engines(app, db)
+    with app.app_context():
+        started = time.perf_counter()
+        results = compact_all()
+        return sum(r.events for r in results), sum(r.shifts for r in results), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f'{args.clients} clients, {args.seconds:g}s, {EMPLOYEES} employees')
+    print(f'{"path":>12}{"punches/s":>12}{"locked":>10}')
+    for name, target in (('attendance', attendance_writer), ('log', log_writer)):
+        path = os.path.join(tempfile.mkdtemp(), 'punches.db')
+        build_database(path)
+        count, errors = run(target, path, args.clients, args.seconds)
+        print(f'{name:>12}{count / args.seconds:>12.0f}{errors:>10}')
+
+    events, shifts, seconds = compact(path)
+    print(f'compacted {events} punches into {shifts} shifts in {seconds:.2f}s '
+          f'({events / seconds:.0f} punches/s)')
+
+
+if __name__ == '__main__':
+    main()
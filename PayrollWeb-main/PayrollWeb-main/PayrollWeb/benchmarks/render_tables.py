@@ -0,0 +1,153 @@
+"""
+Report table rendering benchmark.
+
+Renders the salary table of 10k rows (by default) three ways and reports
+milliseconds per 10k rows:
+- before: the table as it used to be written, with "{:,.0f}".format(...)
+  per cell;
+- after: _salary_table.html with the memoized |money filter;
+- fragment hit: services.rendering.month_fragment on an unchanged month,
+  which skips the payroll queries as well.
+Also times loading the templates in a fresh environment, without and with
+the bytecode cache.
+Run: python benchmarks/render_tables.py --rows 10000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+YEAR, MONTH = 2024, 6
+
+BEFORE = '''<tbody>
+{% set total_salary = 0 %}
+{% for data in salary_data %}
+<tr>
+    <td>{{ loop.index }}</td>
+    <td><strong>{{ data.employee.full_name }}</strong></td>
+    <td>{{ data.employee.position }}</td>
+    <td><span class="badge bg-info">{{ data.total_work }}</span></td>
+    <td>{{ "{:,.0f}".format(data.daily_wage) }} VNĐ</td>
+    <td><strong class="text-success">{{ "{:,.0f}".format(data.total_salary) }} VNĐ</strong></td>
+</tr>
+{% set total_salary = total_salary + data.total_salary %}
+{% endfor %}
+</tbody>'''
+
+
+class Row:
+    def __init__(self, i, rng):
+        self.full_name = f'Employee {i}'
+        self.position = rng.choice(('Sales person', 'Accountant', 'Technician'))
+
+
+def salary_data(count):
+    rng = random.Random(1)
+    rows = []
+    for i in range(1, count + 1):
+        wage = float(rng.randrange(200000, 600000, 10000))
+        hours = float(rng.randrange(10, 200))
+        rows.append({'employee': Row(i, rng), 'total_work': hours, 'daily_wage': wage, 'total_salary': wage * hours})
+    return rows
+
+
+def best(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def environment(bytecode_dir=None):
+    from services.rendering import money
+    env = Environment(loader=FileSystemLoader(TEMPLATES), autoescape=True,
+                      bytecode_cache=FileSystemBytecodeCache(bytecode_dir) if bytecode_dir else None)
+    env.filters['money'] = money
+    return env
+
+
+def load_all(env):
+    for name in env.list_templates(extensions=['html']):
+        env.get_template(name)
+
+
+def fragment_hit(rows, repeat):
+    """Seconds of a fragment miss and of a hit for the salary table of `rows` employees"""
+    path = os.path.join(tempfile.mkdtemp(), 'render.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    from datetime import date
+    from flask import Flask
+    from config import Config
+    from models import db, Employee, AttendanceSummary
+    from services.parallel import compute_payroll
+    from services.rendering import init_rendering, month_fragment
+
+    app = Flask(__name__, template_folder=TEMPLATES)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+    db.init_app(app)
+    init_rendering(app)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(Employee), [
+            {'id': i, 'full_name': f'Employee {i}', 'position': 'Technician',
+             'daily_wage': 300000.0, 'start_date': date(2024, 1, 1)} for i in range(1, rows + 1)])
+        db.session.execute(db.insert(AttendanceSummary), [
+            {'employee_id': i, 'year': YEAR, 'month': MONTH, 'total_hours': 160.0, 'days_worked': 20}
+            for i in range(1, rows + 1)])
+        db.session.commit()
+
+        def table_context():
+            data = [{'employee': row, 'total_work': row.total_work, 'daily_wage': row.daily_wage,
+                     'total_salary': row.total_salary} for row in compute_payroll(YEAR, MONTH)]
+            return {'salary_data': data, 'total_salary': sum(d['total_salary'] for d in data)}
+
+        with app.test_request_context():
+            started = time.perf_counter()
+            month_fragment('_salary_table.html', YEAR, MONTH, table_context)
+            miss = time.perf_counter() - started
+            hit = best(lambda: month_fragment('_salary_table.html', YEAR, MONTH, table_context), repeat)
+    return miss, hit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    data = salary_data(args.rows)
+    total = sum(d['total_salary'] for d in data)
+    per_10k = 10000 / args.rows * 1000
+
+    env = environment()
+    before = env.from_string(BEFORE)
+    after = env.get_template('_salary_table.html')
+    print(f'{args.rows} rows, ms per 10k rows')
+    print(f'{"before":>14}{best(lambda: before.render(salary_data=data), args.repeat) * per_10k:>10.1f}')
+    print(f'{"after":>14}{best(lambda: after.render(salary_data=data, total_salary=total), args.repeat) * per_10k:>10.1f}')
+    miss, hit = fragment_hit(args.rows, args.repeat)
+    print(f'{"fragment miss":>14}{miss * per_10k:>10.1f}  (payroll queries included)')
+    print(f'{"fragment hit":>14}{hit * per_10k:>10.3f}')
+
+    bytecode_dir = tempfile.mkdtemp()
+    load_all(environment(bytecode_dir))  # Fill the bytecode cache
+    cold = best(lambda: load_all(environment()), args.repeat)
+    cached = best(lambda: load_all(environment(bytecode_dir)), args.repeat)
+    shutil.rmtree(bytecode_dir)
+    print(f'loading every template in a new process: {cold * 1000:.1f} ms compiled, '
+          f'{cached * 1000:.1f} ms from the bytecode cache')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Startup benchmark.
+
+Starts fresh Python processes against a scratch SQLite database and
+reports, per BOOT_MODE, the median milliseconds spent importing the app,
+in create_app(), serving the first request (GET /login) and in total
+until that first response. It also times create_app() for further app
+instances in the same process, as a test suite creating many apps sees it.
+Run: python benchmarks/startup.py --runs 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+instance = app.create_app()
+created = time.perf_counter()
+response = instance.test_client().get('/login')
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+again = []
+for _ in range(5):
+    before = time.perf_counter()
+    app.create_app()
+    again.append(time.perf_counter() - before)
+print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                  'first_request': served - created, 'total': served - started,
+                  'next_create_app': min(again)}))
+'''
+
+COLUMNS = ('import', 'create_app', 'first_request', 'total', 'next_create_app')
+
+
+def probe(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(directory, 'startup.db'),
+               STATS_CACHE_PATH=os.path.join(directory, 'stats.db'),
+               TEMPLATE_CACHE_DIR=os.path.join(directory, 'templates'),
+               JOB_WORKERS='0', PUNCH_COMPACT_SECONDS='0', PYTHONPATH=ROOT)
+    probe(dict(env, BOOT_MODE='development'))  # Create the schema, warm the OS file cache
+
+    print(f'median of {args.runs} processes, ms')
+    print(f'{"mode":>12}' + ''.join(f'{name:>17}' for name in COLUMNS))
+    for mode in ('development', 'production'):
+        runs = [probe(dict(env, BOOT_MODE=mode)) for _ in range(args.runs)]
+        print(f'{mode:>12}' + ''.join(f'{statistics.median(run[name] for run in runs) * 1000:>17.1f}'
+                                      for name in COLUMNS))
+
+
+if __name__ == '__main__':
+    main()
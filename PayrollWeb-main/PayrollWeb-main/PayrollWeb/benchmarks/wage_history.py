@@ -0,0 +1,110 @@
+"""
+Effective-dated wage benchmark.
+
+Fills a scratch SQLite database with a synthetic workforce, gives a share
+of the employees a rate change on a random day of every month, then times
+the set-based monthly payroll (services.payroll.iter_payroll) against a
+per-row reference that looks up the rate of each attendance row in Python,
+and checks that both agree.
+Run: python benchmarks/wage_history.py --employees 40000 --months 12
+(about 10M attendance rows)
+"""
+import argparse
+import bisect
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def add_rate_changes(employee_ids, months, share, seed):
+    """Every month, give `share` of the employees a new rate from a random day"""
+    from models import db, Employee, WageRate
+    from services.payroll import month_bounds
+    rng = random.Random(seed)
+    wages = dict(db.session.execute(db.select(Employee.id, Employee.daily_wage)).all())
+    rows = [{'employee_id': i, 'effective_from': date(2000, 1, 1), 'rate': wages[i]} for i in employee_ids]
+    for year, month in months:
+        start, end = month_bounds(year, month)
+        for employee_id in rng.sample(employee_ids, int(len(employee_ids) * share)):
+            wages[employee_id] = round(wages[employee_id] * rng.uniform(0.95, 1.1), -3)
+            day = start + timedelta(days=rng.randrange((end - start).days))
+            rows.append({'employee_id': employee_id, 'effective_from': day, 'rate': wages[employee_id]})
+    db.session.execute(db.insert(WageRate), rows)
+    db.session.execute(db.update(Employee), [{'id': i, 'daily_wage': w} for i, w in wages.items()])
+    db.session.commit()
+    return len(rows)
+
+
+def reference_payroll(year, month):
+    """Per-row pricing: every attendance row looks up its rate in Python"""
+    from models import db, Attendance, WageRate
+    from services.payroll import attendance_in_month
+    history = defaultdict(list)
+    for employee_id, effective_from, rate in db.session.execute(
+            db.select(WageRate.employee_id, WageRate.effective_from, WageRate.rate)
+            .order_by(WageRate.employee_id, WageRate.effective_from)):
+        history[employee_id].append((effective_from, rate))
+    totals = defaultdict(float)
+    for employee_id, work_date, work_hours in db.session.execute(
+            db.select(Attendance.employee_id, Attendance.work_date, Attendance.work_hours)
+            .where(attendance_in_month(year, month))):
+        rates = history[employee_id]
+        index = max(bisect.bisect_right(rates, (work_date, float('inf'))) - 1, 0)
+        totals[employee_id] += work_hours * rates[index][1]
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--employees', type=int, default=40000)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--share', type=float, default=0.2, help='share of employees with a rate change per month')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'wages.db')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+
+    from flask import Flask
+    from config import Config
+    from models import db, Employee
+    from services.database import configure_engines
+    from services.payroll import iter_months, iter_payroll
+    from services.workforce import generate_workforce
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    configure_engines(app, db)
+    with app.app_context():
+        db.create_all()
+        last = (2024, 12)
+        started = time.perf_counter()
+        _, attendance = generate_workforce(args.employees, args.months, seed=args.seed, last_month=last)
+        first_index = last[0] * 12 + last[1] - args.months
+        months = list(iter_months((first_index // 12, first_index % 12 + 1), last))
+        employee_ids = db.session.execute(db.select(Employee.id)).scalars().all()
+        rates = add_rate_changes(employee_ids, months, args.share, args.seed)
+        print(f'{args.employees} employees, {attendance} attendance rows, {rates} wage rates '
+              f'(built in {time.perf_counter() - started:.0f}s)')
+
+        print(f'{"month":<10}{"set-based ms":>14}{"per-row ms":>12}{"max diff":>12}')
+        for year, month in months[-3:]:
+            started = time.perf_counter()
+            rows = list(iter_payroll(year, month, status=None))
+            set_ms = (time.perf_counter() - started) * 1000
+            started = time.perf_counter()
+            reference = reference_payroll(year, month)
+            row_ms = (time.perf_counter() - started) * 1000
+            diff = max(abs(row[5] - reference.get(row[0], 0)) for row in rows)
+            print(f'{year:04d}-{month:02d}  {set_ms:>14.0f}{row_ms:>12.0f}{diff:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
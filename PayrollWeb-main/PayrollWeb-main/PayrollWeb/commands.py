@@ -0,0 +1,232 @@
+"""
+Flask CLI commands
+Run: flask <group> <command> --help
+"""
+import click
+from flask.cli import AppGroup
+
+summary_cli = AppGroup('summary', help='Maintain the monthly attendance summary.')
+
+
+@summary_cli.command('rebuild')
+def summary_rebuild():
+    """Rebuild the summary table from raw attendance."""
+    from services.summary import rebuild_summaries
+    from services.stats import stats_cache
+    count = rebuild_summaries()
+    stats_cache().clear()
+    click.echo(f'Rebuilt {count} monthly buckets.')
+
+
+@summary_cli.command('verify')
+@click.option('--repair', is_flag=True, help='Recompute the mismatched buckets.')
+def summary_verify(repair):
+    """Reconcile the summary table against raw attendance."""
+    from models import db
+    from services.summary import verify_summaries, refresh_summaries
+    mismatches = verify_summaries()
+    for (employee_id, year, month), want, got in mismatches:
+        click.echo(f'employee {employee_id} {year}-{month:02d}: '
+                   f'expected {want[0]}h/{want[1]}d, found {got[0]}h/{got[1]}d')
+
+    if not mismatches:
+        click.echo('Summary is consistent with attendance.')
+        return
+
+    if repair:
+        from services.stats import invalidate, bucket_keys
+        refresh_summaries(*(key for key, want, got in mismatches))
+        db.session.commit()
+        invalidate(*bucket_keys(*(key for key, want, got in mismatches)))
+        click.echo(f'Repaired {len(mismatches)} buckets.')
+    else:
+        raise click.ClickException(f'{len(mismatches)} buckets out of sync.')
+
+
+db_cli = AppGroup('db', help='Manage the database schema.')
+
+
+@db_cli.command('upgrade')
+def db_upgrade():
+    """Create missing tables and apply pending migrations."""
+    from models import db
+    from migrations import upgrade
+    db.create_all()
+    applied = upgrade()
+    for name in applied:
+        click.echo(f'Applied {name}')
+    if not applied:
+        click.echo('Database is up to date.')
+
+
+@db_cli.command('status')
+def db_status():
+    """List migrations that have not been applied yet."""
+    from migrations import pending_migrations
+    pending = pending_migrations()
+    for name in pending:
+        click.echo(f'Pending {name}')
+    if not pending:
+        click.echo('Database is up to date.')
+
+
+attendance_cli = AppGroup('attendance', help='Bulk attendance operations.')
+
+
+@attendance_cli.command('import')
+@click.argument('file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']),
+              help='File format, guessed from the extension by default.')
+@click.option('--batch-size', type=int, help='Rows per INSERT batch.')
+def attendance_import(file, fmt, batch_size):
+    """Import attendance from a CSV or JSON Lines FILE ('-' for stdin)."""
+    from flask import current_app
+    from services.importer import ImportFileError, detect_format, import_attendance
+    fmt = fmt or detect_format(file.name)
+    batch_size = batch_size or current_app.config['IMPORT_BATCH_SIZE']
+    try:
+        result = import_attendance(file, fmt, batch_size)
+    except ImportFileError as e:
+        raise click.ClickException(str(e))
+
+    from services.stats import invalidate, bucket_keys
+    invalidate(*bucket_keys(*result.buckets))
+    for line, message in result.errors:
+        click.echo(f'line {line}: {message}', err=True)
+    click.echo(f'Imported {result.imported} of {result.rows} rows '
+               f'in {result.seconds:.2f}s ({result.rows_per_second:,.0f} rows/s), '
+               f'{result.error_count} errors.')
+
+
+payroll_cli = AppGroup('payroll', help='Payroll reports and period close.')
+
+
+@payroll_cli.command('export')
+@click.option('--from', 'first_month', required=True, help='First month, YYYY-MM.')
+@click.option('--to', 'last_month', help='Last month, YYYY-MM (default: --from).')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl', 'xlsx']), default='csv')
+@click.option('--output', '-o', type=click.File('wb'), default='-', help='Output file (default: stdout).')
+def payroll_export(first_month, last_month, fmt, output):
+    """Export the monthly salary report for a range of months."""
+    from services.export import export_payroll
+    from services.payroll import parse_month
+    first = parse_month(first_month)
+    last = parse_month(last_month or first_month)
+    if first > last:
+        raise click.BadParameter('--to must not be before --from')
+    for chunk in export_payroll(first, last, fmt):
+        output.write(chunk)
+
+
+@payroll_cli.command('close')
+@click.option('--month', required=True, help='Month to close, YYYY-MM.')
+def payroll_close(month):
+    """Close a month: snapshot payslips and lock its attendance."""
+    from services.payroll import parse_month
+    from services.periods import close_period, PeriodError
+    try:
+        period = close_period(*parse_month(month), closed_by='cli')
+    except PeriodError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Closed {month}: {period.employee_count} payslips, total {period.total_salary:,.0f}.')
+
+
+@payroll_cli.command('reopen')
+@click.option('--month', required=True, help='Month to reopen, YYYY-MM.')
+def payroll_reopen(month):
+    """Reopen a closed month, discarding its payslips."""
+    from services.payroll import parse_month
+    from services.periods import reopen_period, PeriodError
+    try:
+        reopen_period(*parse_month(month))
+    except PeriodError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Reopened {month}.')
+
+
+search_cli = AppGroup('search', help='Maintain the employee search index.')
+
+
+@search_cli.command('rebuild')
+def search_rebuild():
+    """Rebuild the full-text employee search index."""
+    from services.search import rebuild_index, search_available
+    if not search_available():
+        raise click.ClickException('Full-text search needs SQLite FTS5; LIKE search is used instead.')
+    count = rebuild_index()
+    click.echo(f'Indexed {count} employees.')
+
+
+seed_cli = AppGroup('seed', help='Generate synthetic data.')
+
+
+@seed_cli.command('workforce')
+@click.option('--employees', type=int, default=1000, show_default=True)
+@click.option('--months', type=int, default=12, show_default=True)
+@click.option('--seed', type=int, default=1, show_default=True, help='Random seed.')
+@click.option('--last-month', help='Last month of attendance, YYYY-MM (default: previous month).')
+def seed_workforce(employees, months, seed, last_month):
+    """Add synthetic employees, users and attendance (password 123456)."""
+    import time
+    from services.payroll import parse_month
+    from services.workforce import generate_workforce
+    started = time.perf_counter()
+    count, rows = generate_workforce(employees, months, seed=seed,
+                                     last_month=parse_month(last_month) if last_month else None)
+    click.echo(f'Created {count} employees and {rows} attendance rows '
+               f'in {time.perf_counter() - started:.1f}s.')
+
+
+jobs_cli = AppGroup('jobs', help='Background jobs.')
+
+
+@jobs_cli.command('work')
+@click.option('--threads', type=int, help='Worker threads (default: JOB_WORKERS).')
+def jobs_work(threads):
+    """Run queued background jobs until interrupted."""
+    from flask import current_app
+    from services.jobs import Worker
+    worker = Worker(current_app._get_current_object(), threads or max(current_app.config['JOB_WORKERS'], 1))
+    click.echo(f'Worker {worker.name} running {worker.threads} threads.')
+    worker.loop()
+
+
+punches_cli = AppGroup('punches', help='Clock punch log.')
+
+
+@punches_cli.command('compact')
+@click.option('--batch-size', type=int, help='Events per transaction (default: PUNCH_BATCH_SIZE).')
+def punches_compact(batch_size):
+    """Fold every pending punch into attendance."""
+    from services.punches import compact_all
+    results = compact_all(batch_size)
+    click.echo(f'{sum(r.events for r in results)} events, {sum(r.shifts for r in results)} shifts, '
+               f'{sum(r.skipped for r in results)} skipped, {sum(r.late for r in results)} late, '
+               f'{sum(r.rejected for r in results)} days held for closed months.')
+
+
+@punches_cli.command('prune')
+@click.option('--days', type=int, help='Keep this many days of folded punches (default: PUNCH_HISTORY_DAYS).')
+def punches_prune(days):
+    """Delete old folded punches from the punch history."""
+    from services.punches import prune_history
+    click.echo(f'{prune_history(days)} folded punches deleted.')
+
+
+@punches_cli.command('status')
+def punches_status():
+    """Show the pending punch count."""
+    from services.punches import pending_count, rejected_count
+    click.echo(f'{pending_count()} punches waiting for compaction, '
+               f'{rejected_count()} days of punch hours held for closed months.')
+
+
+def register_commands(app):
+    app.cli.add_command(summary_cli)
+    app.cli.add_command(attendance_cli)
+    app.cli.add_command(payroll_cli)
+    app.cli.add_command(db_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(seed_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(punches_cli)
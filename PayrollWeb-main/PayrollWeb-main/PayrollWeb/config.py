@@ -3,12 +3,99 @@ import os
 # Path to project
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Create database folder if not exist
+# Database folder (created with the first SQLite connection, see services.database)
 database_dir = os.path.join(basedir, 'database')
-if not os.path.exists(database_dir):
-    os.makedirs(database_dir)
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(database_dir, 'hrms.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(database_dir, 'hrms.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # 'production' skips schema creation on start (run `flask db upgrade` when deploying)
+    # and registers the routes with the first request instead of at startup
+    BOOT_MODE = os.environ.get('BOOT_MODE', 'development')
+    
+    # Connection pool
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        # Off by default for the local SQLite file, where connections do not go stale
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1' if os.environ.get('DATABASE_URL') else '0') == '1',
+    }
+    
+    # Optional read replica for the payroll report routes
+    REPORTS_DATABASE_URL = os.environ.get('REPORTS_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'reports': REPORTS_DATABASE_URL} if REPORTS_DATABASE_URL else {}
+    
+    # SQLite connection pragmas (WAL journaling is always on)
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    
+    # Rows per page on the admin list pages (?per_page= is capped by MAX_PAGE_SIZE)
+    PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 500))
+    
+    # JSON API (/api/v1): bearer token for integrations (admins may use their session),
+    # and the longest month range of one salary request
+    API_TOKEN = os.environ.get('API_TOKEN')
+    API_MAX_MONTHS = int(os.environ.get('API_MAX_MONTHS', 24))
+    
+    # Rows per INSERT batch for bulk attendance import
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 5000))
+    
+    # How long the what-if simulation keeps its loaded payroll arrays
+    SIMULATION_CACHE_SECONDS = int(os.environ.get('SIMULATION_CACHE_SECONDS', 60))
+    
+    # Logged-in users kept in memory by the Flask-Login user loader
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+    PRINCIPAL_CACHE_SECONDS = int(os.environ.get('PRINCIPAL_CACHE_SECONDS', 300))
+    
+    # Werkzeug hash method for new and rehashed passwords, e.g. 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Password hashes computed at the same time (each scrypt call holds ~32 MB)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+    
+    # Dashboard statistics cache: 'memory' (per process) or 'sqlite' (shared by all workers)
+    STATS_CACHE_BACKEND = os.environ.get('STATS_CACHE_BACKEND', 'memory')
+    STATS_CACHE_PATH = os.environ.get('STATS_CACHE_PATH') or os.path.join(database_dir, 'stats_cache.db')
+    STATS_CACHE_SIZE = int(os.environ.get('STATS_CACHE_SIZE', 10000))
+    STATS_CACHE_SECONDS = int(os.environ.get('STATS_CACHE_SECONDS', 300))
+    
+    # Rendering outside debug mode: compiled templates cached on disk ('' = off), report tables in memory
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR', os.path.join(database_dir, 'template_cache'))
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 32))  # Rendered tables kept per process
+    FRAGMENT_CACHE_SECONDS = int(os.environ.get('FRAGMENT_CACHE_SECONDS', 3600))
+    
+    # Request/SQL instrumentation, shown on /admin/metrics and /admin/metrics/prometheus
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # Bearer token for Prometheus scrapers
+    N_PLUS_ONE_THRESHOLD = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 5))  # Same statement this often in one request
+    # Fraction of requests run under cProfile (0 = off); stats files go to PROFILE_DIR
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(basedir, 'profiles')
+    
+    # Payroll computed on this many processes (1 = in the web process), in shards of employees
+    PAYROLL_WORKERS = int(os.environ.get('PAYROLL_WORKERS', 1))
+    PAYROLL_SHARD_SIZE = int(os.environ.get('PAYROLL_SHARD_SIZE', 20000))
+    
+    # Background jobs: worker threads per process (0 = run only `flask jobs work`)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1))
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', 60))  # Requeue running jobs silent this long
+    JOB_RETRY_SECONDS = int(os.environ.get('JOB_RETRY_SECONDS', 10))  # First retry delay, doubled each time
+    JOB_FILES_DIR = os.environ.get('JOB_FILES_DIR') or os.path.join(database_dir, 'jobs')
+    
+    # ASGI mode (uvicorn asgi:app): these endpoints run on the event loop with async database
+    # I/O (ASYNC_DATABASE_URL, derived from SQLALCHEMY_DATABASE_URI by default), the others on
+    # ASGI_THREADS threads
+    ASYNC_ENDPOINTS = os.environ.get('ASYNC_ENDPOINTS', 'employee.dashboard,employee.attendance,employee.salary').split(',')
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL')
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))
+    
+    # Clock punches: compacted into attendance every PUNCH_COMPACT_SECONDS (0 = only `flask punches compact`)
+    PUNCH_COMPACT_SECONDS = float(os.environ.get('PUNCH_COMPACT_SECONDS', 5))
+    PUNCH_BATCH_SIZE = int(os.environ.get('PUNCH_BATCH_SIZE', 10000))  # Log rows folded per transaction
+    PUNCH_MAX_SHIFT_HOURS = float(os.environ.get('PUNCH_MAX_SHIFT_HOURS', 16))  # Longer shifts are missed clock-outs
+    # Folded punches are kept this long for duplicate checks and late punches (0 = forever)
+    PUNCH_HISTORY_DAYS = int(os.environ.get('PUNCH_HISTORY_DAYS', 62))
\ No newline at end of file
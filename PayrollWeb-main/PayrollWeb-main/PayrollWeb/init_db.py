@@ -4,6 +4,8 @@ Run: python init_db.py
 """
 from app import create_app
 from models import db, User, Employee, Attendance
+from services.summary import rebuild_summaries
+from services.search import rebuild_index
 from datetime import datetime, timedelta
 
 def init_database():
@@ -128,6 +130,14 @@ def init_database():
         
         db.session.commit()
         
+        # Build monthly attendance summary
+        print("Building attendance summary...")
+        rebuild_summaries()
+        
+        # Build employee search index
+        print("Building search index...")
+        rebuild_index()
+        
         print("\n" + "="*50)
         print("Initiate database successfully!")
         print("="*50)
@@ -0,0 +1,116 @@
+"""
+Schema migrations for databases created by an older version of the app.
+db.create_all() only creates missing tables, so new indexes and backfills
+on existing tables are applied here, each one exactly once.
+"""
+from datetime import datetime
+from models import db
+
+migrations_table = db.Table(
+    'schema_migrations', db.metadata,
+    db.Column('name', db.String(100), primary_key=True),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+
+def _attendance_summary():
+    """Backfill attendance_summaries from existing attendance"""
+    from services.summary import rebuild_summaries
+    rebuild_summaries()
+
+
+def _attendance_indexes():
+    """Create the indexes declared on Attendance"""
+    from models import Attendance
+    for index in Attendance.__table__.indexes:
+        index.create(bind=db.engine, checkfirst=True)
+
+
+def _employee_search():
+    """Build the full-text employee search index"""
+    from services.search import rebuild_index
+    rebuild_index()
+
+
+def _user_auth_version():
+    """Add users.auth_version to existing users tables"""
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('users')}
+    if 'auth_version' not in columns:
+        db.session.execute(db.text('ALTER TABLE users ADD COLUMN auth_version INTEGER NOT NULL DEFAULT 1'))
+
+
+def _page_version_indexes():
+    """Create the indexes declared on PageVersion"""
+    from models import PageVersion
+    for index in PageVersion.__table__.indexes:
+        index.create(bind=db.engine, checkfirst=True)
+
+
+def _punch_history():
+    """Seed punch_history with each clock's last punches, so late punches have something to pair with"""
+    from models import PunchClock, PunchHistory
+    rows = []
+    for clock in db.session.execute(db.select(PunchClock)).scalars():
+        if clock.open_since is None:
+            rows.append({'employee_id': clock.employee_id, 'punched_at': clock.last_punch_at, 'kind': 'out'})
+            continue
+        rows.append({'employee_id': clock.employee_id, 'punched_at': clock.open_since, 'kind': 'in'})
+        if clock.last_punch_at != clock.open_since:
+            # A second clock-in that was ignored while the shift was open
+            rows.append({'employee_id': clock.employee_id, 'punched_at': clock.last_punch_at, 'kind': 'in'})
+    if rows:
+        db.session.execute(db.insert(PunchHistory), rows)
+
+
+def _employee_search_phone_suffixes():
+    """Rebuild the search index with the phone digit suffixes"""
+    from services.search import rebuild_index
+    rebuild_index()
+
+
+def _employee_search_sort_key():
+    """Rebuild the search index with rank-ordered rowids"""
+    from services.search import rebuild_index
+    rebuild_index()
+
+
+def _punch_rejection_reason():
+    """Add punch_rejections.reason to existing punch_rejections tables"""
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns('punch_rejections')}
+    if 'reason' not in columns:
+        db.session.execute(db.text(
+            "ALTER TABLE punch_rejections ADD COLUMN reason VARCHAR(20) NOT NULL DEFAULT 'closed_month'"))
+
+
+MIGRATIONS = [
+    ('0001_attendance_summary', _attendance_summary),
+    ('0002_attendance_indexes', _attendance_indexes),
+    ('0003_employee_search', _employee_search),
+    ('0004_user_auth_version', _user_auth_version),
+    ('0005_page_version_indexes', _page_version_indexes),
+    ('0006_punch_history', _punch_history),
+    ('0007_employee_search_phone_suffixes', _employee_search_phone_suffixes),
+    ('0008_employee_search_sort_key', _employee_search_sort_key),
+    ('0009_punch_rejection_reason', _punch_rejection_reason),
+]
+
+
+def pending_migrations():
+    """Names of the migrations not yet applied"""
+    migrations_table.create(bind=db.engine, checkfirst=True)
+    applied = set(db.session.execute(db.select(migrations_table.c.name)).scalars())
+    return [name for name, step in MIGRATIONS if name not in applied]
+
+
+def upgrade():
+    """Apply pending migrations in order, return their names"""
+    pending = pending_migrations()
+    for name, step in MIGRATIONS:
+        if name not in pending:
+            continue
+        step()
+        db.session.execute(migrations_table.insert().values(
+            name=name, applied_at=datetime.utcnow()
+        ))
+        db.session.commit()
+    return pending
@@ -1,9 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.database import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -13,14 +13,18 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(20), nullable=False, default='user')  # 'admin' or 'user'
     employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), nullable=True)
+    # Bumped whenever the user or its employee changes; checked against the cached copy (services.principal)
+    auth_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     
     employee = db.relationship('Employee', back_populates='user', uselist=False)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from services.passwords import hash_password
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        from services.passwords import verify_password
+        return verify_password(self.password_hash, password)
     
     def is_admin(self):
         return self.role == 'admin'
@@ -34,27 +38,26 @@ class Employee(db.Model):
     phone = db.Column(db.String(20))
     email = db.Column(db.String(100))
     position = db.Column(db.String(100))
-    daily_wage = db.Column(db.Float, nullable=False)  # Salary of 1 day or 1 hour
+    daily_wage = db.Column(db.Float, nullable=False)  # Salary of 1 day or 1 hour, the latest rate
     start_date = db.Column(db.Date, nullable=False, default=datetime.utcnow)
     status = db.Column(db.String(20), nullable=False, default='active')  # 'active' or 'inactive'
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', back_populates='employee', uselist=False)
     attendances = db.relationship('Attendance', back_populates='employee', cascade='all, delete-orphan')
+    summaries = db.relationship('AttendanceSummary', back_populates='employee', cascade='all, delete-orphan')
+    wage_rates = db.relationship('WageRate', back_populates='employee', cascade='all, delete-orphan',
+                                 order_by='WageRate.effective_from')
     
     def get_total_work_days(self, year, month):
         """Calculate total work hour in a month"""
-        total = 0
-        for attendance in self.attendances:
-            if attendance.work_date.year == year and attendance.work_date.month == month:
-                total += attendance.work_hours
-        return total
+        from services.payroll import get_total_work
+        return get_total_work(self.id, year, month)
     
     def calculate_salary(self, year, month):
         """Calculate salary"""
-        total_work = self.get_total_work_days(year, month)
-        return total_work * self.daily_wage
-
+        from services.payroll import get_salary
+        return get_salary(self, year, month)[1]
 
 class Attendance(db.Model):
     __tablename__ = 'attendances'
@@ -68,6 +71,161 @@ class Attendance(db.Model):
     
     employee = db.relationship('Employee', back_populates='attendances')
     
+    # unique_employee_date doubles as the (employee_id, work_date) index
+    # used by per-employee month lookups; work_date alone serves the
+    # all-employee month listings.
     __table_args__ = (
         db.UniqueConstraint('employee_id', 'work_date', name='unique_employee_date'),
+        db.Index('ix_attendances_work_date', 'work_date'),
+    )
+
+
+class AttendanceSummary(db.Model):
+    """Monthly rollup of attendance, kept in sync by services.summary"""
+    __tablename__ = 'attendance_summaries'
+    
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    total_hours = db.Column(db.Float, nullable=False, default=0)
+    days_worked = db.Column(db.Integer, nullable=False, default=0)
+    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    employee = db.relationship('Employee', back_populates='summaries')
+
+
+class PunchEvent(db.Model):
+    """Raw clock-in/clock-out, appended by services.punches and folded into Attendance
+    by its compactor. No foreign key and no secondary index, so an append is one row write."""
+    __tablename__ = 'punch_events'
+    
+    id = db.Column(db.Integer, primary_key=True)  # Append order
+    employee_id = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(3), nullable=False)  # in, out
+    punched_at = db.Column(db.DateTime, nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class PunchClock(db.Model):
+    """Compacted punch state of an employee: the last punch applied and the open shift"""
+    __tablename__ = 'punch_clocks'
+    
+    employee_id = db.Column(db.Integer, primary_key=True)  # No FK, like the log
+    last_punch_at = db.Column(db.DateTime, nullable=False)
+    open_since = db.Column(db.DateTime)  # Clocked in, not out yet
+
+
+class PunchHistory(db.Model):
+    """A punch already folded into attendance. Its key is the punch's identity, so a retried
+    upload is recognized, and a late punch is paired again with the ones around it."""
+    __tablename__ = 'punch_history'
+    
+    employee_id = db.Column(db.Integer, primary_key=True)  # No FK, like the log
+    punched_at = db.Column(db.DateTime, primary_key=True)
+    kind = db.Column(db.String(3), primary_key=True)
+    
+    __table_args__ = (
+        {'sqlite_with_rowid': False},
+    )
+
+
+class PunchRejection(db.Model):
+    """Punch hours of a day held until an admin applies them or dismisses them (see
+    services.punches). Negative when a late punch shortened a shift."""
+    __tablename__ = 'punch_rejections'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, nullable=False)  # No FK, like the log
+    work_date = db.Column(db.Date, nullable=False)
+    work_hours = db.Column(db.Float, nullable=False)
+    reason = db.Column(db.String(20), nullable=False, default='closed_month')  # closed_month, below_zero
+    rejected_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class WageRate(db.Model):
+    """Wage of an employee from effective_from until the next rate (see services.payroll)"""
+    __tablename__ = 'wage_rates'
+    
+    employee_id = db.Column(db.Integer, db.ForeignKey('employees.id'), primary_key=True)
+    effective_from = db.Column(db.Date, primary_key=True)
+    rate = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    employee = db.relationship('Employee', back_populates='wage_rates')
+    
+    # The clustered (employee_id, effective_from) key finds the rate in effect
+    # on a date with one seek; effective_from alone finds a month's changes.
+    __table_args__ = (
+        db.Index('ix_wage_rates_effective_from', 'effective_from'),
+        {'sqlite_with_rowid': False},
+    )
+
+
+class PageVersion(db.Model):
+    """Version stamp of an employee's self-service pages for one month (see services.versions).
+    year = month = 0 is the stamp of changes that affect every month."""
+    __tablename__ = 'page_versions'
+    
+    employee_id = db.Column(db.Integer, primary_key=True)  # No FK: stamps are never joined
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Whole-month stamps sum every employee's row of the month
+    __table_args__ = (
+        db.Index('ix_page_versions_month', 'year', 'month', 'version', 'updated_at'),
+    )
+
+
+class PayrollPeriod(db.Model):
+    """A month whose payroll has been closed; its attendance is locked"""
+    __tablename__ = 'payroll_periods'
+    
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    closed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    closed_by = db.Column(db.String(50))  # Username
+    employee_count = db.Column(db.Integer, nullable=False, default=0)
+    total_salary = db.Column(db.Float, nullable=False, default=0)
+
+
+class Payslip(db.Model):
+    """Salary of one employee for a closed month, as computed at close time.
+    Name, position and wage are copied so later edits do not change it."""
+    __tablename__ = 'payslips'
+    
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    employee_id = db.Column(db.Integer, primary_key=True)  # No FK: payslips outlive employees
+    full_name = db.Column(db.String(100), nullable=False)
+    position = db.Column(db.String(100))
+    daily_wage = db.Column(db.Float, nullable=False)
+    total_work = db.Column(db.Float, nullable=False, default=0)
+    total_salary = db.Column(db.Float, nullable=False, default=0)
+
+
+class Job(db.Model):
+    """Background job run by services.jobs"""
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)  # Percent
+    message = db.Column(db.String(255))
+    result = db.Column(db.Text)  # JSON
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    worker = db.Column(db.String(100))  # host:pid of the process running it
+    heartbeat_at = db.Column(db.DateTime)
+    created_by = db.Column(db.String(50))  # Username
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_after', 'status', 'run_after'),
     )
@@ -1,8 +1,30 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, stream_template, stream_with_context, redirect, url_for, flash, request, current_app, jsonify, abort, Response, send_file
 from flask_login import login_required, current_user
-from models import db, Employee, User, Attendance
-from datetime import datetime
+from models import db, Employee, User, Attendance, PayrollPeriod, Job, PunchRejection
+from services.payroll import attendance_in_month, parse_month, set_wage
+from services.parallel import compute_payroll
+from services.summary import bucket_of, refresh_summaries
+from services.pagination import paginate, stream_rows, parse_date
+from services.loading import attendance_rows, employee_choices, with_profile
+from services.importer import detect_format
+from services.export import FORMATS, export_payroll
+from services.principal import invalidate_principal
+from services.database import read_replica
+from services.search import search_available, search_filter, search_page
+from services.metrics import metrics, prometheus_text
+from services.periods import closed_months, ensure_open, payslip_rows
+from services.punches import apply_rejection
+from services.versions import bump_employee
+from services.rendering import month_fragment
+from services.jobs import FINISHED, enqueue, job_dict, job_file, job_result
+from services.stats import (active_employees, total_employees, month_hours, payroll_total,
+                            invalidate, headcount_keys, bucket_keys, employee_keys, stats_cache)
+from datetime import date, datetime
 from functools import wraps
+import hmac
+import os
+import time
+import uuid
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -19,11 +41,13 @@ def admin_required(f):
 @login_required
 @admin_required
 def dashboard():
-    total_employees = Employee.query.count()
-    active_employees = Employee.query.filter_by(status='active').count()
+    now = datetime.now()
     return render_template('admin/dashboard.html', 
-                         total_employees=total_employees,
-                         active_employees=active_employees)
+                         total_employees=total_employees(),
+                         active_employees=active_employees(),
+                         month_hours=month_hours(now.year, now.month),
+                         payroll_total=payroll_total(now.year, now.month),
+                         cache_hit_ratio=stats_cache().hit_ratio)
 
 # ==================== Employee Management ====================
 
@@ -32,17 +56,23 @@ def dashboard():
 @admin_required
 def employees():
     search = request.args.get('search', '')
+    query = Employee.query
     if search:
-        employees = Employee.query.filter(
-            db.or_(
-                Employee.full_name.contains(search),
-                Employee.phone.contains(search),
-                Employee.email.contains(search)
-            )
-        ).all()
-    else:
-        employees = Employee.query.all()
-    return render_template('admin/employees.html', employees=employees, search=search)
+        # Ranked full-text results, paged by offset
+        if not request.args.get('stream') and search_available():
+            page = search_page(search)
+            return render_template('admin/employees.html', employees=page.items, page=page, search=search)
+        query = query.filter(search_filter(search))
+    
+    # ?stream=1 renders every row as it is read instead of one page
+    if request.args.get('stream'):
+        return stream_template('admin/employees.html',
+                               employees=stream_rows(query, [Employee.id]),
+                               page=None,
+                               search=search)
+    
+    page = paginate(query, [Employee.id], [int])
+    return render_template('admin/employees.html', employees=page.items, page=page, search=search)
 
 @admin_bp.route('/employees/add', methods=['GET', 'POST'])
 @login_required
@@ -78,7 +108,9 @@ def add_employee():
                 user.set_password(password)
                 db.session.add(user)
             
+            bump_employee(employee.id)
             db.session.commit()
+            invalidate(*headcount_keys())
             flash('Employee added successfully!', 'success')
             return redirect(url_for('admin.employees'))
         except Exception as e:
@@ -91,15 +123,20 @@ def add_employee():
 @login_required
 @admin_required
 def edit_employee(id):
-    employee = Employee.query.get_or_404(id)
+    employee = with_profile(Employee.query, 'employee_form').filter_by(id=id).first_or_404()
     
     if request.method == 'POST':
         try:
+            stats_keys = employee_keys(employee.id)
             employee.full_name = request.form.get('full_name')
             employee.phone = request.form.get('phone')
             employee.email = request.form.get('email')
             employee.position = request.form.get('position')
-            employee.daily_wage = float(request.form.get('daily_wage'))
+            daily_wage = float(request.form.get('daily_wage'))
+            if daily_wage != employee.daily_wage:
+                effective_from = request.form.get('wage_effective_from')
+                effective_from = datetime.strptime(effective_from, '%Y-%m-%d').date() if effective_from else date.today()
+                set_wage(employee, daily_wage, effective_from)
             employee.start_date = datetime.strptime(request.form.get('start_date'), '%Y-%m-%d')
             employee.status = request.form.get('status')
             
@@ -132,7 +169,11 @@ def edit_employee(id):
                         user.set_password('123456')  # Default password
                     db.session.add(user)
             
+            bump_employee(employee.id)
             db.session.commit()
+            invalidate(*stats_keys)
+            if employee.user:
+                invalidate_principal(employee.user.id)
             flash('Update successfully!', 'success')
             return redirect(url_for('admin.employees'))
         except Exception as e:
@@ -146,18 +187,10 @@ def edit_employee(id):
 @admin_required
 def delete_employee(id):
     employee = Employee.query.get_or_404(id)
-    try:
-        # Delete related user
-        if employee.user:
-            db.session.delete(employee.user)
-        # Delete employee (cascade will delete attendance)
-        db.session.delete(employee)
-        db.session.commit()
-        flash('Employee deleted successfully!', 'success')
-    except Exception as e:
-        db.session.rollback()
-        flash(f'Error: {str(e)}', 'danger')
-    return redirect(url_for('admin.employees'))
+    # Long attendance histories take a while to delete: done by a background job
+    job = enqueue('delete_employee', {'employee_id': employee.id}, created_by=current_user.username)
+    flash(f'Deleting {employee.full_name} in the background.', 'info')
+    return redirect(url_for('admin.job', id=job.id))
 
 # ==================== Work hour management ====================
 
@@ -168,23 +201,32 @@ def attendance():
     employee_id = request.args.get('employee_id', type=int)
     month = request.args.get('month', datetime.now().strftime('%Y-%m'))
     
-    query = Attendance.query
+    # Only the columns the list prints, the employee name joined in
+    query = attendance_rows()
     
     if employee_id:
-        query = query.filter_by(employee_id=employee_id)
+        query = query.filter(Attendance.employee_id == employee_id)
     
     if month:
-        year, mon = map(int, month.split('-'))
-        query = query.filter(
-            db.extract('year', Attendance.work_date) == year,
-            db.extract('month', Attendance.work_date) == mon
-        )
+        year, mon = parse_month(month)
+        query = query.filter(attendance_in_month(year, mon))
     
-    attendances = query.order_by(Attendance.work_date.desc()).all()
-    employees = Employee.query.filter_by(status='active').all()
+    employees = employee_choices()
+    sort_key = [Attendance.work_date, Attendance.id]
     
+    # ?stream=1 renders every row as it is read instead of one page
+    if request.args.get('stream'):
+        return stream_template('admin/attendance.html',
+                               attendances=stream_rows(query, sort_key, descending=True),
+                               page=None,
+                               employees=employees,
+                               selected_employee=employee_id,
+                               selected_month=month)
+    
+    page = paginate(query, sort_key, [parse_date, int], descending=True)
     return render_template('admin/attendance.html', 
-                         attendances=attendances, 
+                         attendances=page.items, 
+                         page=page,
                          employees=employees,
                          selected_employee=employee_id,
                          selected_month=month)
@@ -200,6 +242,8 @@ def add_attendance():
             work_hours = float(request.form.get('work_hours'))
             note = request.form.get('note', '')
             
+            ensure_open(work_date)
+            
             # Duplication check
             existing = Attendance.query.filter_by(
                 employee_id=employee_id,
@@ -217,21 +261,48 @@ def add_attendance():
                 note=note
             )
             db.session.add(attendance)
+            bucket = bucket_of(employee_id, work_date)
+            refresh_summaries(bucket)
             db.session.commit()
+            invalidate(*bucket_keys(bucket))
             flash('Check-in added successfully!', 'success')
             return redirect(url_for('admin.attendance'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error: {str(e)}', 'danger')
     
-    employees = Employee.query.filter_by(status='active').all()
+    employees = employee_choices()
     return render_template('admin/add_attendance.html', employees=employees)
 
+@admin_bp.route('/attendance/import', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def import_attendance_file():
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Please choose a file to import!', 'danger')
+            return redirect(url_for('admin.import_attendance_file'))
+        
+        fmt = request.form.get('format') or detect_format(upload.filename)
+        if fmt not in ('csv', 'jsonl'):
+            flash('Invalid format!', 'danger')
+            return redirect(url_for('admin.import_attendance_file'))
+        # Saved to a file the background job imports from
+        path = job_file(f'upload-{uuid.uuid4().hex}', fmt)
+        upload.save(path)
+        job = enqueue('import_attendance', {'path': path, 'fmt': fmt, 'filename': upload.filename},
+                      created_by=current_user.username)
+        flash(f'Importing {upload.filename} in the background.', 'info')
+        return redirect(url_for('admin.job', id=job.id))
+    
+    return render_template('admin/import_attendance.html')
+
 @admin_bp.route('/attendance/edit/<int:id>', methods=['GET', 'POST'])
 @login_required
 @admin_required
 def edit_attendance(id):
-    attendance = Attendance.query.get_or_404(id)
+    attendance = with_profile(Attendance.query, 'attendance_form').filter_by(id=id).first_or_404()
     
     if request.method == 'POST':
         try:
@@ -240,6 +311,8 @@ def edit_attendance(id):
             work_hours = float(request.form.get('work_hours'))
             note = request.form.get('note', '')
             
+            ensure_open(attendance.work_date, work_date)
+            
             # Duplication check (except for current attendance)
             existing = Attendance.query.filter(
                 Attendance.employee_id == employee_id,
@@ -251,21 +324,26 @@ def edit_attendance(id):
                 flash('Attendace already existed for this day!', 'danger')
                 return render_template('admin/edit_attendance.html', 
                                      attendance=attendance,
-                                     employees=Employee.query.filter_by(status='active').all())
+                                     employees=employee_choices())
             
+            # Both the old and the new month bucket may change
+            old_bucket = bucket_of(attendance.employee_id, attendance.work_date)
             attendance.employee_id = employee_id
             attendance.work_date = work_date
             attendance.work_hours = work_hours
             attendance.note = note
             
+            new_bucket = bucket_of(employee_id, work_date)
+            refresh_summaries(old_bucket, new_bucket)
             db.session.commit()
+            invalidate(*bucket_keys(old_bucket, new_bucket))
             flash('Attendance updated successfully!', 'success')
             return redirect(url_for('admin.attendance'))
         except Exception as e:
             db.session.rollback()
             flash(f'Error: {str(e)}', 'danger')
     
-    employees = Employee.query.filter_by(status='active').all()
+    employees = employee_choices()
     return render_template('admin/edit_attendance.html', 
                          attendance=attendance, 
                          employees=employees)
@@ -276,36 +354,277 @@ def edit_attendance(id):
 def delete_attendance(id):
     attendance = Attendance.query.get_or_404(id)
     try:
+        ensure_open(attendance.work_date)
         db.session.delete(attendance)
+        bucket = bucket_of(attendance.employee_id, attendance.work_date)
+        refresh_summaries(bucket)
         db.session.commit()
+        invalidate(*bucket_keys(bucket))
         flash('Attendance deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
         flash(f'Error: {str(e)}', 'danger')
     return redirect(url_for('admin.attendance'))
 
+@admin_bp.route('/punches/rejected')
+@login_required
+@admin_required
+def rejected_punches():
+    rows = db.session.execute(
+        db.select(PunchRejection, Employee.full_name)
+        .outerjoin(Employee, Employee.id == PunchRejection.employee_id)
+        .order_by(PunchRejection.work_date, PunchRejection.employee_id)
+    ).all()
+    closed = closed_months((rejection.work_date.year, rejection.work_date.month) for rejection, _ in rows)
+    return render_template('admin/rejected_punches.html', rows=rows, closed=closed)
+
+@admin_bp.route('/punches/rejected/<int:id>/apply', methods=['POST'])
+@login_required
+@admin_required
+def apply_rejected_punch(id):
+    rejection = PunchRejection.query.get_or_404(id)
+    try:
+        apply_rejection(rejection)
+        flash('Punch hours added to attendance!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error: {str(e)}', 'danger')
+    return redirect(url_for('admin.rejected_punches'))
+
+@admin_bp.route('/punches/rejected/<int:id>/dismiss', methods=['POST'])
+@login_required
+@admin_required
+def dismiss_rejected_punch(id):
+    db.session.delete(PunchRejection.query.get_or_404(id))
+    db.session.commit()
+    flash('Punch hours dismissed.', 'success')
+    return redirect(url_for('admin.rejected_punches'))
+
 # ==================== SALARY ====================
 
 @admin_bp.route('/salary')
 @login_required
 @admin_required
+@read_replica
 def salary():
     month = request.args.get('month', datetime.now().strftime('%Y-%m'))
-    year, mon = map(int, month.split('-'))
+    year, mon = parse_month(month)
+    
+    period = db.session.get(PayrollPeriod, (year, mon))
     
-    employees = Employee.query.filter_by(status='active').all()
+    def table_context():
+        if period:
+            salary_data = payslip_rows(year, mon)
+        else:
+            salary_data = [{
+                'employee': row,
+                'total_work': row.total_work,
+                'daily_wage': row.daily_wage,
+                'total_salary': row.total_salary
+            } for row in compute_payroll(year, mon)]
+        return {'salary_data': salary_data,
+                'total_salary': sum(data['total_salary'] for data in salary_data)}
     
-    salary_data = []
-    for emp in employees:
-        total_work = emp.get_total_work_days(year, mon)
-        total_salary = emp.calculate_salary(year, mon)
-        salary_data.append({
-            'employee': emp,
-            'total_work': total_work,
-            'daily_wage': emp.daily_wage,
-            'total_salary': total_salary
-        })
+    # Rendered once per version of the month's data
+    salary_table = month_fragment('_salary_table.html', year, mon, table_context,
+                                  period.closed_at if period else None)
     
+    now = datetime.now()
     return render_template('admin/salary.html', 
-                         salary_data=salary_data, 
-                         selected_month=month)
+                         salary_table=salary_table, 
+                         selected_month=month,
+                         period=period,
+                         can_close=not period and (year, mon) < (now.year, now.month))
+
+@admin_bp.route('/salary/close', methods=['POST'])
+@login_required
+@admin_required
+def close_salary():
+    month = request.form.get('month', '')
+    try:
+        parse_month(month)
+    except ValueError:
+        flash('Invalid month!', 'danger')
+        return redirect(url_for('admin.salary'))
+    # Snapshotting every payslip is a long write: done by a background job
+    job = enqueue('close_period', {'month': month, 'closed_by': current_user.username},
+                  created_by=current_user.username)
+    flash(f'Closing the payroll of {month} in the background.', 'info')
+    return redirect(url_for('admin.job', id=job.id))
+
+@admin_bp.route('/salary/export')
+@login_required
+@admin_required
+@read_replica
+def export_salary():
+    month = datetime.now().strftime('%Y-%m')
+    first_month = request.args.get('from') or month
+    last_month = request.args.get('to') or first_month
+    fmt = request.args.get('format', 'csv')
+    
+    try:
+        first, last = parse_month(first_month), parse_month(last_month)
+    except ValueError:
+        flash('Invalid month!', 'danger')
+        return redirect(url_for('admin.salary'))
+    if fmt not in FORMATS or first > last:
+        flash('Invalid export range or format!', 'danger')
+        return redirect(url_for('admin.salary'))
+    
+    mimetype, extension = FORMATS[fmt]
+    filename = f'payroll_{first_month}_{last_month}.{extension}'
+    return current_app.response_class(
+        stream_with_context(export_payroll(first, last, fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@admin_bp.route('/salary/export/job', methods=['POST'])
+@login_required
+@admin_required
+def export_salary_job():
+    first_month = request.form.get('from', '')
+    last_month = request.form.get('to') or first_month
+    fmt = request.form.get('format', 'csv')
+    try:
+        first, last = parse_month(first_month), parse_month(last_month)
+    except ValueError:
+        flash('Invalid month!', 'danger')
+        return redirect(url_for('admin.salary'))
+    if fmt not in FORMATS or first > last:
+        flash('Invalid export range or format!', 'danger')
+        return redirect(url_for('admin.salary'))
+    
+    job = enqueue('payroll_export', {'first': first_month, 'last': last_month, 'fmt': fmt},
+                  created_by=current_user.username)
+    return redirect(url_for('admin.job', id=job.id))
+
+# ==================== BACKGROUND JOBS ====================
+
+@admin_bp.route('/jobs')
+@login_required
+@admin_required
+def jobs():
+    recent = Job.query.order_by(Job.id.desc()).limit(50).all()
+    return render_template('admin/jobs.html', jobs=recent)
+
+@admin_bp.route('/jobs/<int:id>')
+@login_required
+@admin_required
+def job(id):
+    job = Job.query.get_or_404(id)
+    return render_template('admin/job.html', job=job, result=job_result(job), finished=job.status in FINISHED)
+
+@admin_bp.route('/api/jobs/<int:id>')
+@login_required
+@admin_required
+def job_status(id):
+    return jsonify(job_dict(Job.query.get_or_404(id)))
+
+@admin_bp.route('/jobs/<int:id>/download')
+@login_required
+@admin_required
+def job_download(id):
+    job = Job.query.get_or_404(id)
+    result = job_result(job)
+    if job.status != 'done' or not result or 'file' not in result:
+        abort(404)
+    path = os.path.join(current_app.config['JOB_FILES_DIR'], result['file'])
+    if not os.path.exists(path):
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=result['download_name'])
+
+# ==================== WHAT-IF SIMULATION ====================
+
+@admin_bp.route('/simulation', methods=['GET', 'POST'])
+@login_required
+@admin_required
+@read_replica
+def simulation():
+    now = datetime.now()
+    first_month = request.values.get('from') or f'{now.year}-01'
+    last_month = request.values.get('to') or now.strftime('%Y-%m')
+    positions = [p for (p,) in db.session.query(Employee.position).distinct().order_by(Employee.position) if p]
+    
+    results = None
+    if request.method == 'POST':
+        try:
+            first, last = parse_month(first_month), parse_month(last_month)
+            rules = [
+                {'position': position, 'raise_pct': pct or 0, 'raise_amount': amount or 0}
+                for position, pct, amount in zip(request.form.getlist('position'),
+                                                 request.form.getlist('raise_pct'),
+                                                 request.form.getlist('raise_amount'))
+                if pct or amount
+            ]
+            if first > last:
+                raise ValueError('the first month is after the last month')
+            from services.simulation import get_dataset, simulate  # numpy, loaded on first use
+            dataset = get_dataset(first, last)
+            results = simulate(dataset, [{'name': 'Scenario', 'rules': rules}])
+        except Exception as e:
+            flash(f'Error: {str(e)}', 'danger')
+    
+    return render_template('admin/simulation.html',
+                         positions=positions,
+                         results=results,
+                         first_month=first_month,
+                         last_month=last_month)
+
+@admin_bp.route('/api/simulation', methods=['POST'])
+@login_required
+@admin_required
+@read_replica
+def simulation_api():
+    data = request.get_json(silent=True) or {}
+    try:
+        first = parse_month(data['from'])
+        last = parse_month(data.get('to') or data['from'])
+        scenarios = data.get('scenarios') or []
+        if first > last:
+            raise ValueError('"from" is after "to"')
+        if not isinstance(scenarios, list):
+            raise ValueError('"scenarios" must be a list')
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid request: {str(e)}'}), 400
+    
+    started = time.perf_counter()
+    from services.simulation import get_dataset, simulate
+    dataset = get_dataset(first, last, data.get('status', 'active'))
+    loaded = time.perf_counter()
+    try:
+        results = simulate(dataset, scenarios, bool(data.get('include_employees')))
+    except (AttributeError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid scenario: {str(e)}'}), 400
+    
+    return jsonify({
+        'months': dataset.months,
+        'positions': dataset.positions,
+        'employees': dataset.size,
+        'results': results,
+        'load_ms': (loaded - started) * 1000,
+        'simulate_ms': (time.perf_counter() - loaded) * 1000
+    })
+
+# ==================== METRICS ====================
+
+@admin_bp.route('/metrics')
+@login_required
+@admin_required
+def metrics_page():
+    endpoints, n_plus_one = metrics.snapshot()
+    return render_template('admin/metrics.html',
+                         endpoints=endpoints,
+                         n_plus_one=n_plus_one,
+                         profiles=metrics.profiles,
+                         started=datetime.fromtimestamp(metrics.started))
+
+@admin_bp.route('/metrics/prometheus')
+def metrics_prometheus():
+    # Scrapers authenticate with METRICS_TOKEN as a bearer token, people as admins
+    token = current_app.config['METRICS_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    if not (token and hmac.compare_digest(authorization, f'Bearer {token}')):
+        if not current_user.is_authenticated or not current_user.is_admin():
+            abort(403)
+    return Response(prometheus_text(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,144 @@
+from flask import Blueprint, request, current_app
+from flask_login import current_user
+from models import db, Employee, Attendance
+from services.api import ApiError, api_response, parse_fields, rows_payload
+from services.pagination import paginate, parse_date
+from services.loading import attendance_rows
+from services.payroll import month_bounds, parse_month
+from services.export import COLUMNS as SALARY_FIELDS, payroll_rows
+from services.search import search_filter
+from services.database import read_replica
+from datetime import date, datetime
+import hmac
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+EMPLOYEE_FIELDS = ('id', 'full_name', 'phone', 'email', 'position', 'daily_wage',
+                   'start_date', 'status', 'created_at')
+ATTENDANCE_FIELDS = ('id', 'employee_id', 'work_date', 'work_hours', 'note', 'employee_name')
+
+@api_bp.before_request
+def authenticate():
+    # Integrations authenticate with API_TOKEN as a bearer token, people as admins
+    token = current_app.config['API_TOKEN']
+    authorization = request.headers.get('Authorization', '')
+    if not (token and hmac.compare_digest(authorization, f'Bearer {token}')):
+        if not current_user.is_authenticated or not current_user.is_admin():
+            raise ApiError('Authentication required', 401)
+
+@api_bp.errorhandler(ApiError)
+def api_error(e):
+    return api_response({'error': str(e)}, e.status)
+
+def month_range(first_month, last_month):
+    """((year, month), (year, month)) of a from/to pair, at most API_MAX_MONTHS long"""
+    try:
+        first = parse_month(first_month)
+        last = parse_month(last_month or first_month)
+        date(*first, 1), date(*last, 1)  # Month numbers out of range raise ValueError
+    except (AttributeError, TypeError, ValueError):
+        raise ApiError('Months must be given as YYYY-MM')
+    if first > last:
+        raise ApiError('"from" is after "to"')
+    months = (last[0] - first[0]) * 12 + last[1] - first[1] + 1
+    if months > current_app.config['API_MAX_MONTHS']:
+        raise ApiError(f'At most {current_app.config["API_MAX_MONTHS"]} months per request')
+    return first, last
+
+def request_months():
+    """Month range of ?month= or ?from=&to=, the current month by default"""
+    month = request.args.get('month')
+    if month:
+        return month_range(month, month)
+    return month_range(request.args.get('from') or datetime.now().strftime('%Y-%m'), request.args.get('to'))
+
+# ==================== EMPLOYEES ====================
+
+@api_bp.route('/employees')
+def employees():
+    fields = parse_fields(request.args.get('fields'), EMPLOYEE_FIELDS)
+    # The cursor needs the id: selected after the requested fields if they lack it, cut off again
+    columns = [getattr(Employee, field) for field in fields]
+    if 'id' not in fields:
+        columns.append(Employee.id)
+    query = db.session.query(*columns)
+    status = request.args.get('status')
+    if status:
+        query = query.filter(Employee.status == status)
+    search = request.args.get('search')
+    if search:
+        query = query.filter(search_filter(search))
+    page = paginate(query, [Employee.id], [int])
+    rows = [tuple(row)[:len(fields)] for row in page.items]
+    return api_response(rows_payload(rows, fields, page.next_url if page.has_next else None))
+
+@api_bp.route('/employees/<int:id>')
+def employee(id):
+    fields = parse_fields(request.args.get('fields'), EMPLOYEE_FIELDS)
+    row = db.session.query(*[getattr(Employee, field) for field in fields]).filter(Employee.id == id).first()
+    if row is None:
+        raise ApiError('Employee not found', 404)
+    return api_response({'data': dict(zip(fields, row))})
+
+# ==================== ATTENDANCE ====================
+
+@api_bp.route('/attendance')
+def attendance():
+    fields = parse_fields(request.args.get('fields'), ATTENDANCE_FIELDS)
+    first, last = request_months()
+
+    # The admin attendance list's projection, over a range of months
+    query = attendance_rows().filter(
+        Attendance.work_date >= month_bounds(*first)[0],
+        Attendance.work_date < month_bounds(*last)[1]
+    )
+    employee_ids = request.args.getlist('employee_id', type=int)
+    if employee_ids:
+        query = query.filter(Attendance.employee_id.in_(employee_ids))
+
+    page = paginate(query, [Attendance.work_date, Attendance.id], [parse_date, int], descending=True)
+    rows = [tuple(getattr(row, field) for field in fields) for row in page.items]
+    return api_response(rows_payload(rows, fields, page.next_url if page.has_next else None))
+
+# ==================== SALARY ====================
+
+def salary_rows(first, last, employee_ids, fields):
+    indexes = [SALARY_FIELDS.index(field) for field in fields]
+    return [tuple(row[i] for i in indexes) for row in payroll_rows(first, last, employee_ids=employee_ids)]
+
+@api_bp.route('/salary')
+@read_replica
+def salary():
+    """Salary rows of a page of employees for every month of the range, month by month"""
+    fields = parse_fields(request.args.get('fields'), SALARY_FIELDS)
+    first, last = request_months()
+
+    query = db.session.query(Employee.id)
+    status = request.args.get('status', 'active')
+    if status != 'all':
+        query = query.filter(Employee.status == status)
+    employee_ids = request.args.getlist('employee_id', type=int)
+    if employee_ids:
+        query = query.filter(Employee.id.in_(employee_ids))
+
+    # Cursor over employees; each page holds all the months of its employees
+    page = paginate(query, [Employee.id], [int])
+    rows = salary_rows(first, last, [row.id for row in page.items], fields)
+    return api_response(rows_payload(rows, fields, page.next_url if page.has_next else None))
+
+@api_bp.route('/salary/batch', methods=['POST'])
+@read_replica
+def salary_batch():
+    """Salary rows of the given employees x months, in one call"""
+    data = request.get_json(silent=True) or {}
+    try:
+        employee_ids = [int(i) for i in data['employee_ids']]
+    except (KeyError, TypeError, ValueError):
+        raise ApiError('"employee_ids" must be a list of ids')
+    if len(employee_ids) > current_app.config['MAX_PAGE_SIZE']:
+        raise ApiError(f'At most {current_app.config["MAX_PAGE_SIZE"]} employees per request')
+    first, last = month_range(data.get('from'), data.get('to'))
+    fields = parse_fields(data.get('fields'), SALARY_FIELDS)
+
+    rows = salary_rows(first, last, employee_ids, fields)
+    return api_response(rows_payload(rows, fields, compact=bool(data.get('compact'))))
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User, Employee
+from services.passwords import rehash_in_background
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
@@ -27,6 +28,7 @@ def login():
         
         if user and user.check_password(password):
             login_user(user)
+            rehash_in_background(user, password)
             flash('Login successfully!', 'success')
             return redirect(url_for('auth.index'))
         else:
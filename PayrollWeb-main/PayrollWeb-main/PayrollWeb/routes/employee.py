@@ -1,10 +1,26 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
 from flask_login import login_required, current_user
-from models import db, Attendance
+from models import Attendance
+from services.payroll import attendance_in_month, employee_payroll, parse_month
+from services.loading import own_attendance_rows
+from services.punches import KINDS, fresh_totals, record_punch
+from services.periods import is_closed, get_payslip
+from services.http_cache import conditional_page, page_validators
 from datetime import datetime
 
 employee_bp = Blueprint('employee', __name__, url_prefix='/employee')
 
+def _month_validators(*extra):
+    """ETag validators of the signed-in employee's page for the requested month"""
+    if not current_user.employee:
+        return None
+    try:
+        year, mon = parse_month(request.args.get('month', datetime.now().strftime('%Y-%m')))
+    except ValueError:
+        return None
+    return page_validators(current_app, current_user.id, current_user.employee.id, year, mon,
+                           *(value(year, mon) for value in extra))
+
 @employee_bp.route('/dashboard')
 @login_required
 def dashboard():
@@ -14,27 +30,43 @@ def dashboard():
     if not current_user.employee:
         return "Account is not linked with employee!"
     
-    # Take the current month
+    # Take the current month, with the punches not compacted yet
     now = datetime.now()
-    total_work = current_user.employee.get_total_work_days(now.year, now.month)
+    days, open_since = fresh_totals(current_user.employee.id, now.year, now.month)
+    total_work = round(sum(days.values()), 2)
     
     return render_template('employee/dashboard.html', 
                          employee=current_user.employee,
-                         total_work=total_work)
+                         total_work=total_work,
+                         open_since=open_since)
+
+@employee_bp.route('/punch', methods=['POST'])
+@login_required
+def punch():
+    if not current_user.employee:
+        return "Account is not linked with employee!"
+    
+    kind = request.form.get('kind')
+    if kind not in KINDS:
+        flash('Invalid punch!', 'danger')
+        return redirect(url_for('employee.dashboard'))
+    
+    punched_at = record_punch(current_user.employee.id, kind)
+    flash(f'Clocked {kind} at {punched_at:%H:%M}.', 'success')
+    return redirect(url_for('employee.dashboard'))
 
 @employee_bp.route('/attendance')
 @login_required
+@conditional_page(_month_validators)
 def attendance():
     if not current_user.employee:
         return "Account is not linked with employee!"
     
     month = request.args.get('month', datetime.now().strftime('%Y-%m'))
-    year, mon = map(int, month.split('-'))
+    year, mon = parse_month(month)
     
-    attendances = Attendance.query.filter(
-        Attendance.employee_id == current_user.employee.id,
-        db.extract('year', Attendance.work_date) == year,
-        db.extract('month', Attendance.work_date) == mon
+    attendances = own_attendance_rows(current_user.employee.id).filter(
+        attendance_in_month(year, mon)
     ).order_by(Attendance.work_date.desc()).all()
     
     total_work = sum(a.work_hours for a in attendances)
@@ -46,19 +78,30 @@ def attendance():
 
 @employee_bp.route('/salary')
 @login_required
+@conditional_page(lambda: _month_validators(is_closed))
 def salary():
     if not current_user.employee:
         return "Account is not linked with employee!"
     
     month = request.args.get('month', datetime.now().strftime('%Y-%m'))
-    year, mon = map(int, month.split('-'))
+    year, mon = parse_month(month)
     
     employee = current_user.employee
-    total_work = employee.get_total_work_days(year, mon)
-    total_salary = employee.calculate_salary(year, mon)
+    closed = is_closed(year, mon)
+    payslip = get_payslip(employee.id, year, mon) if closed else None
+    if payslip:
+        # Closed month: the payslip as issued, with the wage of that time
+        employee = payslip
+        total_work, daily_wage, total_salary = payslip.total_work, payslip.daily_wage, payslip.total_salary
+    elif closed:
+        total_work, daily_wage, total_salary = 0, employee.daily_wage, 0
+    else:
+        total_work, daily_wage, total_salary = employee_payroll(employee.id, year, mon)
     
     return render_template('employee/salary.html',
                          employee=employee,
                          selected_month=month,
+                         daily_wage=daily_wage,
                          total_work=total_work,
-                         total_salary=total_salary)
+                         total_salary=total_salary,
+                         closed=closed)
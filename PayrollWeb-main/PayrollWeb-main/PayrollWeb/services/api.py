@@ -0,0 +1,97 @@
+"""
+JSON API encoding.
+
+API responses are built from plain row tuples, never ORM objects. ?fields=
+picks the columns of a resource, and ?compact=1 sends the column names once
+with each row as an array instead of an object. Bodies are encoded with
+orjson when it is installed (the standard json module otherwise), or as
+MessagePack for clients sending Accept: application/msgpack, if msgpack is
+installed. Both packages are optional.
+"""
+import json
+from datetime import date
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+
+
+class ApiError(Exception):
+    """An error answered as {"error": message} with the given status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not serializable')
+
+
+def mimetypes():
+    """The encodings this process can write, preferred first"""
+    return [JSON, MSGPACK] if msgpack else [JSON]
+
+
+def encode(payload):
+    """(body, mimetype) of the payload in the encoding the client accepts"""
+    if not request.accept_mimetypes:
+        mimetype = JSON  # No Accept header
+    else:
+        mimetype = request.accept_mimetypes.best_match(mimetypes())
+    if mimetype is None:
+        raise ApiError(f'Acceptable types: {", ".join(mimetypes())}', 406)
+    if mimetype == MSGPACK:
+        return msgpack.packb(payload, default=_default), mimetype
+    if orjson:
+        return orjson.dumps(payload), mimetype
+    return json.dumps(payload, default=_default, separators=(',', ':')), mimetype
+
+
+def api_response(payload, status=200):
+    try:
+        body, mimetype = encode(payload)
+    except ApiError as e:
+        # Nothing acceptable: the error itself goes out as JSON
+        body, mimetype, status = json.dumps({'error': str(e)}), JSON, e.status
+    response = current_app.response_class(body, status=status, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+
+def parse_fields(value, available):
+    """Field names from a comma-separated string or a list, all of `available` if empty"""
+    if not value:
+        return list(available)
+    if isinstance(value, str):
+        value = value.split(',')
+    fields = [str(field).strip() for field in value if str(field).strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ApiError(f'Unknown fields: {", ".join(unknown)}; available: {", ".join(available)}')
+    return fields
+
+
+def rows_payload(rows, fields, next_url=None, compact=None):
+    """Body of a list: {"data": [objects], "next": url}, or with compact
+    {"fields": [...], "rows": [arrays], "next": url}. Rows are in field order."""
+    if compact is None:
+        compact = request.args.get('compact', '') not in ('', '0')
+    if compact:
+        payload = {'fields': fields, 'rows': [tuple(row) for row in rows]}
+    else:
+        payload = {'data': [dict(zip(fields, row)) for row in rows]}
+    payload['next'] = next_url
+    return payload
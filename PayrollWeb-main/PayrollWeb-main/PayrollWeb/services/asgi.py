@@ -0,0 +1,169 @@
+"""
+ASGI serving mode.
+
+AsgiApp wraps the Flask app for an ASGI server. Requests for
+ASYNC_ENDPOINTS (the employee self-service pages by default) run on the
+event loop: the Flask request is dispatched as usual inside
+AsyncSession.run_sync, with db.session bound to that session's sync
+facade, so the views and services are the same code as in WSGI mode but
+every statement awaits the async driver (aiosqlite, asyncpg) instead of
+blocking a thread. A waiting request costs a greenlet, not a thread.
+
+Every other request runs on a pool of ASGI_THREADS threads as plain WSGI,
+responses streamed chunk by chunk. Needs sqlalchemy[asyncio] (greenlet)
+and the async driver of the database, e.g. pip install aiosqlite greenlet
+uvicorn.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from flask import request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.util import await_only
+from werkzeug.exceptions import HTTPException
+from models import db
+from services.database import configure_engine
+from services.metrics import instrument_engine
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg', 'mysql': 'mysql+aiomysql'}
+SESSION_KEY = 'payroll.async_session'
+
+
+def async_url(url):
+    """The async driver's URL for a database URL"""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ of an ASGI HTTP scope with its full request body"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+def call_wsgi(app, environ, send):
+    """Run a WSGI request, passing the response to send() as ASGI messages"""
+    response = []
+
+    def start_response(status, headers, exc_info=None):
+        response[:] = [int(status.split(' ', 1)[0]),
+                       [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]]
+
+    def start():
+        send({'type': 'http.response.start', 'status': response[0], 'headers': response[1]})
+
+    iterable = app(environ, start_response)
+    try:
+        started = False
+        for chunk in iterable:
+            if not started:
+                start()
+                started = True
+            if chunk:
+                send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not started:
+            start()
+        send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(iterable, 'close'):
+            iterable.close()
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+def _bind_async_session():
+    # First before_request hook: the request's queries go through the async session
+    session = request.environ.get(SESSION_KEY)
+    if session is not None:
+        db.session.registry.set(session)
+
+
+class AsgiApp:
+    """ASGI application serving a Flask app"""
+
+    def __init__(self, app):
+        self.app = app
+        self.endpoints = frozenset(app.config['ASYNC_ENDPOINTS'])
+        url = app.config['ASYNC_DATABASE_URL'] or async_url(app.config['SQLALCHEMY_DATABASE_URI'])
+        self.engine = create_async_engine(url, **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        configure_engine(self.engine.sync_engine, app.config)
+        if app.config['METRICS_ENABLED']:
+            instrument_engine(self.engine.sync_engine)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.executor = ThreadPoolExecutor(app.config['ASGI_THREADS'], thread_name_prefix='wsgi')
+        app.before_request_funcs.setdefault(None, []).insert(0, _bind_async_session)
+
+    def is_async(self, environ):
+        """Whether the request goes to one of ASYNC_ENDPOINTS"""
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return False
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return False  # 404s, redirects, and routes not registered yet (BOOT_MODE=production)
+        return endpoint in self.endpoints
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            environ = wsgi_environ(scope, await read_body(receive))
+            if self.is_async(environ):
+                await self.call_async(environ, send)
+            else:
+                await self.call_threaded(environ, send)
+
+    async def call_async(self, environ, send):
+        async with self.sessions() as session:
+            environ[SESSION_KEY] = session.sync_session
+            await session.run_sync(lambda _: call_wsgi(self.app, environ, lambda m: await_only(send(m))))
+
+    async def call_threaded(self, environ, send):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, call_wsgi, self.app, environ,
+                                   lambda m: asyncio.run_coroutine_threadsafe(send(m), loop).result())
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
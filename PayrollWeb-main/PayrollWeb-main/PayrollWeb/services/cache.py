@@ -0,0 +1,127 @@
+"""
+Cache backends.
+
+LRUCache lives in the process; SQLiteCache keeps JSON values in an SQLite
+file so every worker process sees the same entries and invalidations.
+Both expire entries after `ttl` seconds, return `default` on a miss and
+count hits and misses (per process).
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class CacheStats:
+    hits = 0
+    misses = 0
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.delete(key)
+
+
+class LRUCache(CacheStats):
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache(CacheStats):
+    """Cache shared by worker processes through an SQLite file (JSON values)"""
+
+    PURGE_EVERY = 1000  # Sets between removals of expired rows
+
+    def __init__(self, path, ttl=60):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._sets = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS cache '
+                               '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)')
+            self._local.connection = connection
+        return connection
+
+    def get(self, key, default=None):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        connection = self._connection()
+        connection.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                           (key, json.dumps(value), time.time() + self.ttl))
+        self._sets += 1
+        if self._sets % self.PURGE_EVERY == 0:
+            connection.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if keys:
+            self._connection().executemany('DELETE FROM cache WHERE key = ?', [(key,) for key in keys])
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM cache WHERE expires > ?',
+                                          (time.time(),)).fetchone()[0]
@@ -0,0 +1,70 @@
+"""
+Database engine configuration.
+
+The URL and pool settings come from the environment (see Config). SQLite
+connections get WAL journaling and the other pragmas below on connect, so
+readers no longer block writers and writers wait for the lock instead of
+failing with "database is locked". When REPORTS_DATABASE_URL is set, routes
+decorated with @read_replica send their SELECTs to that engine; writes,
+including Core insert/update/delete statements, stay on the primary.
+"""
+import os
+from functools import wraps
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND = 'reports'
+
+
+def sqlite_pragmas(config):
+    """PRAGMA statements run on every new SQLite connection"""
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA busy_timeout={int(config["SQLITE_BUSY_TIMEOUT_MS"])}',
+        f'PRAGMA mmap_size={int(config["SQLITE_MMAP_SIZE"])}',
+    ]
+
+
+def configure_engine(engine, config):
+    """Install the connect-time settings for the engine's backend"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(config)
+    path = engine.url.database
+    if path and path != ':memory:' and not path.startswith('file:'):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def configure_engines(app, db):
+    """Configure every engine of the app (primary and read replica)"""
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(engine, app.config)
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs to the replica inside @read_replica routes"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and getattr(clause, 'is_select', False)
+                and has_request_context() and g.get('read_replica') and REPLICA_BIND in self._db.engines):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(f):
+    """Route decorator: run the view's queries on the read replica, if configured"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.read_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,171 @@
+"""
+Streaming payroll export.
+
+Rows come from services.parallel.compute_payroll month by month and are encoded
+chunk by chunk, so memory stays flat however many employees and months are
+exported. XLSX is written as a zip stream with inline strings, which needs
+no spreadsheet library and no temporary file.
+"""
+import csv
+import io
+import json
+import zipfile
+from xml.sax.saxutils import escape
+from services.payroll import iter_months, iter_payroll
+from services.parallel import compute_payroll
+from services.periods import closed_months, iter_payslips
+
+COLUMNS = ('month', 'employee_id', 'full_name', 'position',
+           'total_work', 'daily_wage', 'total_salary')
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+CHUNK_ROWS = 1000
+
+
+def payroll_rows(first, last, status='active', employee_ids=None):
+    """Yield one export row per employee per month, from first to last (year, month).
+    Closed months come from their payslips. employee_ids limits the rows to
+    those employees, whatever their status."""
+    closed = closed_months(iter_months(first, last))
+    for year, month in iter_months(first, last):
+        label = f'{year:04d}-{month:02d}'
+        if (year, month) in closed:
+            rows = iter_payslips(year, month, employee_ids=employee_ids)
+        elif employee_ids is not None:
+            rows = iter_payroll(year, month, status=None, employee_ids=employee_ids)
+        else:
+            rows = compute_payroll(year, month, status=status)
+        for row in rows:
+            yield (label,) + row
+
+
+def iter_csv(rows):
+    """Encode rows as CSV with a header line"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def iter_jsonl(rows):
+    """Encode rows as one JSON object per line"""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(COLUMNS, row)), ensure_ascii=False))
+        if len(lines) == CHUNK_ROWS:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _Sink:
+    """Write-only, unseekable file object that collects what zipfile writes"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Payroll" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    """One <row> of numeric and inline string cells"""
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value!r}</v></c>')
+        else:
+            text = escape('' if value is None else str(value))
+            cells.append(f'<c t="inlineStr"><is><t>{text}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def iter_xlsx(rows):
+    """Encode rows as a single-sheet XLSX workbook"""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content)
+        yield sink.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _xlsx_row(COLUMNS)
+            ).encode('utf-8'))
+            for count, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if count % CHUNK_ROWS == 0:
+                    yield sink.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.drain()
+
+
+ENCODERS = {
+    'csv': iter_csv,
+    'jsonl': iter_jsonl,
+    'xlsx': iter_xlsx,
+}
+
+
+def export_payroll(first, last, fmt='csv', status='active'):
+    """Yield the encoded payroll export of the months first..last as bytes chunks"""
+    return ENCODERS[fmt](payroll_rows(first, last, status=status))
@@ -0,0 +1,107 @@
+"""
+HTTP caching.
+
+@conditional_page answers a GET with 304 Not Modified when the client's
+ETag (or, without one, its Last-Modified date) still matches, before the
+view runs a query or renders a template. Pages are sent with
+"Cache-Control: private, no-cache", so browsers keep them but revalidate
+on every visit.
+
+Static files are linked with a content hash (?v=...) and, when requested
+with it, served with a one-year immutable Cache-Control.
+"""
+import hashlib
+import os
+from functools import wraps
+from flask import make_response, request, session
+from services.versions import page_stamp
+
+STATIC_MAX_AGE = 365 * 24 * 3600
+
+_template_version = None
+_static_versions = {}  # path -> (mtime, hash)
+
+
+def _file_hash(*paths):
+    sha = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()[:12]
+
+
+def template_version(app):
+    """Hash of all templates, so a deploy that changes a page changes its ETags"""
+    global _template_version
+    if _template_version is None:
+        paths = []
+        for directory, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+            paths += sorted(os.path.join(directory, name) for name in files)
+        _template_version = _file_hash(*sorted(paths))
+    return _template_version
+
+
+def page_validators(app, user_id, employee_id, year, month, *extra):
+    """(ETag, Last-Modified) of an employee's page for a month"""
+    stamp, last_modified = page_stamp(employee_id, year, month)
+    key = f'{template_version(app)}:{request.path}:{user_id}:{year}-{month}:{stamp}:{extra}'
+    return hashlib.sha1(key.encode()).hexdigest()[:20], last_modified
+
+
+def conditional_page(validators):
+    """View decorator; validators() returns (etag, last_modified) or None to skip caching"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # A pending flash message is part of the page
+            result = validators() if '_flashes' not in session else None
+            if result is None:
+                return f(*args, **kwargs)
+            etag, last_modified = result
+            if request.if_none_match:
+                unchanged = request.if_none_match.contains_weak(etag)
+            else:
+                unchanged = bool(last_modified and request.if_modified_since
+                                 and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None))
+            response = make_response('', 304) if unchanged else make_response(f(*args, **kwargs))
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
+
+
+def static_version(app, filename):
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _static_versions.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, _file_hash(path))
+        _static_versions[path] = cached
+    return cached[1]
+
+
+def init_http_cache(app):
+    """Fingerprint static URLs and serve fingerprinted files with long-lived headers"""
+
+    @app.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            version = static_version(app, values['filename'])
+            if version:
+                values['v'] = version
+
+    @app.after_request
+    def _static_cache_headers(response):
+        if request.endpoint == 'static' and request.args.get('v') and response.status_code in (200, 304):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
@@ -0,0 +1,195 @@
+"""
+Bulk attendance import from CSV or JSON Lines.
+
+The file is read as a stream, every row is validated, and valid rows are
+written with INSERT ... ON CONFLICT (employee_id, work_date) DO UPDATE in
+large executemany batches, all inside one transaction. Rows are converted
+to driver-ready tuples here so the batches go straight to the DBAPI cursor
+without per-row SQLAlchemy parameter processing.
+"""
+import csv
+import json
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from models import db, Employee, Attendance, PayrollPeriod
+from services.summary import rebuild_month
+from services.versions import bump
+
+FIELDS = ('employee_id', 'work_date', 'work_hours', 'note')
+COLUMNS = FIELDS + ('created_at',)
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFileError(Exception):
+    """Raised when the file as a whole cannot be imported (e.g. missing columns)"""
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message), the first MAX_REPORTED_ERRORS
+        self.buckets = set()  # (employee_id, year, month) touched by the import
+        self.seconds = 0.0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def detect_format(filename):
+    """'csv' or 'jsonl' from a file name"""
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def iter_csv(stream):
+    """Yield (line, record) from a CSV stream with a header row"""
+    reader = csv.reader(stream)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip().lower() for name in header]
+    missing = [name for name in FIELDS[:3] if name not in header]
+    if missing:
+        raise ImportFileError(f'Missing columns: {", ".join(missing)}')
+
+    for line, values in enumerate(reader, start=2):
+        if values:
+            yield line, dict(zip(header, values))
+
+
+def iter_jsonl(stream):
+    """Yield (line, record) from a JSON Lines stream"""
+    for line, text in enumerate(stream, start=1):
+        text = text.strip()
+        if not text:
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as e:
+            yield line, e
+            continue
+        yield line, record if isinstance(record, dict) else ValueError('not an object')
+
+
+def parse_record(record, employee_ids):
+    """Validate one record, return (employee_id, work_date, work_hours, note) or raise ValueError"""
+    if isinstance(record, Exception):
+        raise ValueError(f'invalid JSON: {record}')
+
+    try:
+        employee_id = int(record.get('employee_id'))
+    except (TypeError, ValueError):
+        raise ValueError('employee_id must be an integer')
+    if employee_id not in employee_ids:
+        raise ValueError(f'unknown employee_id {employee_id}')
+
+    try:
+        work_date = date.fromisoformat(str(record.get('work_date')).strip())
+    except ValueError:
+        raise ValueError('work_date must be YYYY-MM-DD')
+
+    try:
+        work_hours = float(record.get('work_hours'))
+    except (TypeError, ValueError):
+        raise ValueError('work_hours must be a number')
+    if not 0 <= work_hours <= 24:
+        raise ValueError('work_hours must be between 0 and 24')
+
+    return employee_id, work_date, work_hours, record.get('note') or ''
+
+
+def upsert_statement():
+    """INSERT ... ON CONFLICT (employee_id, work_date) DO UPDATE for the bound dialect"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(Attendance.__table__).values({name: db.bindparam(name) for name in COLUMNS})
+    return statement.on_conflict_do_update(
+        index_elements=['employee_id', 'work_date'],
+        set_={
+            'work_hours': statement.excluded.work_hours,
+            'note': statement.excluded.note
+        }
+    )
+
+
+def import_attendance(stream, fmt='csv', batch_size=5000, progress=None):
+    """Import attendance rows from a text stream, return an ImportResult.
+
+    progress(result), if given, is called after every batch. If it commits,
+    the import is no longer atomic, but running it again is harmless: the
+    summaries of each batch are refreshed before the call, so whatever is
+    committed is consistent with its summaries."""
+    result = ImportResult()
+    started = time.perf_counter()
+    records = iter_jsonl(stream) if fmt == 'jsonl' else iter_csv(stream)
+    employee_ids = set(db.session.execute(db.select(Employee.id)).scalars())
+    closed = set(db.session.execute(db.select(PayrollPeriod.year, PayrollPeriod.month)).tuples())
+    dialect = db.engine.dialect
+    compiled = upsert_statement().compile(dialect=dialect)
+    sql = str(compiled)
+    positional = dialect.positional and tuple(compiled.positiontup) == COLUMNS
+    created_at_type = Attendance.__table__.c.created_at.type
+    created_at = (created_at_type.bind_processor(dialect) or (lambda value: value))(datetime.utcnow())
+    batch = []
+    pending = set()  # Buckets written since their summaries were refreshed
+
+    def flush(batch):
+        if not positional:
+            batch = [dict(zip(COLUMNS, row)) for row in batch]
+        # The session's connection of the moment: progress() may have committed and released the last one
+        db.session.connection().exec_driver_sql(sql, batch)
+        result.imported += len(batch)
+        if progress:
+            # progress() may commit: the batch's summaries go in the same transaction
+            months = defaultdict(list)
+            for employee_id, year, month in pending:
+                months[(year, month)].append(employee_id)
+            for (year, month), month_employees in sorted(months.items()):
+                rebuild_month(year, month, month_employees)
+            bump(*pending)
+            pending.clear()
+            progress(result)
+
+    try:
+        for line, record in records:
+            result.rows += 1
+            try:
+                employee_id, work_date, work_hours, note = parse_record(record, employee_ids)
+            except ValueError as e:
+                result.add_error(line, str(e))
+                continue
+            if (work_date.year, work_date.month) in closed:
+                result.add_error(line, f'payroll period {work_date:%Y-%m} is closed')
+                continue
+            result.buckets.add((employee_id, work_date.year, work_date.month))
+            pending.add((employee_id, work_date.year, work_date.month))
+            batch.append((employee_id, work_date.isoformat(), work_hours, note, created_at))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+
+        if batch:
+            flush(batch)
+
+        for year, month in sorted({(year, month) for _, year, month in pending}):
+            rebuild_month(year, month)
+        bump(*pending)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    result.seconds = time.perf_counter() - started
+    return result
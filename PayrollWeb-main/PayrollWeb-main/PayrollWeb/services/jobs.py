@@ -0,0 +1,261 @@
+"""
+Background jobs.
+
+Heavy admin operations (period close, payroll export, attendance import,
+deleting an employee with a long history) are queued in the jobs table and
+run by a pool of worker threads, so the request returns at once and the
+browser polls the job page. Each serving process starts its worker on its
+first request; `flask jobs work` runs one on its own.
+
+Workers claim queued jobs with a conditional UPDATE, so several processes
+can share the table. A running job's heartbeat is refreshed while it runs;
+one whose heartbeat is older than JOB_LEASE_SECONDS belonged to a worker
+that died and is queued again. A failed job is retried with exponential
+backoff until it has run max_attempts times.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from models import db, Job
+
+HANDLERS = {}  # kind -> (function, max_attempts)
+FINISHED = ('done', 'failed')
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def handler(kind, max_attempts=3):
+    """Register function(context, **params) as the handler of a job kind"""
+    def register(function):
+        HANDLERS[kind] = (function, max_attempts)
+        return function
+    return register
+
+
+def load_handlers():
+    """Register the handlers of services.tasks, imported on first use"""
+    import services.tasks  # noqa: F401
+
+
+def enqueue(kind, params=None, created_by=None):
+    """Queue a job and wake the local worker, return the Job"""
+    load_handlers()
+    job = Job(kind=kind, params=json.dumps(params or {}), created_by=created_by,
+              max_attempts=HANDLERS[kind][1], run_after=datetime.utcnow())
+    db.session.add(job)
+    db.session.commit()
+    if _worker:
+        _worker.wake.set()
+    return job
+
+
+def job_params(job):
+    return json.loads(job.params or '{}')
+
+
+def job_result(job):
+    return json.loads(job.result) if job.result else None
+
+
+def job_dict(job):
+    """JSON-ready view of a job for the status API"""
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'attempts': job.attempts,
+        'result': job_result(job),
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def job_file(job_id, extension):
+    """Path of a file produced by or handed to a job"""
+    directory = current_app.config['JOB_FILES_DIR']
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'job-{job_id}.{extension}')
+
+
+class JobContext:
+    """Passed to handlers: the job id, whether no retry follows, and progress reporting"""
+
+    def __init__(self, job_id, final_attempt=True):
+        self.job_id = job_id
+        self.final_attempt = final_attempt
+        self._reported = 0.0
+
+    def progress(self, done, total, message=None):
+        """Store done/total as a percentage (throttled); commits the session"""
+        now = time.monotonic()
+        if done < total and now - self._reported < 0.5:
+            return
+        self._reported = now
+        values = {'progress': int(100 * done / total) if total else 100,
+                  'heartbeat_at': datetime.utcnow()}
+        if message is not None:
+            values['message'] = message[:255]
+        db.session.execute(db.update(Job).where(Job.id == self.job_id).values(**values))
+        db.session.commit()
+
+
+def claim_next(worker):
+    """Mark the next due queued job as running by `worker`, return its id or None"""
+    now = datetime.utcnow()
+    candidates = db.session.execute(
+        db.select(Job.id).where(Job.status == 'queued', Job.run_after <= now).order_by(Job.id).limit(5)
+    ).scalars().all()
+    for job_id in candidates:
+        claimed = db.session.execute(db.update(Job).where(Job.id == job_id, Job.status == 'queued').values(
+            status='running', worker=worker, attempts=Job.attempts + 1,
+            started_at=now, heartbeat_at=now, message=None
+        ))
+        db.session.commit()
+        if claimed.rowcount == 1:
+            return job_id
+    db.session.rollback()
+    return None
+
+
+def requeue_stale():
+    """Queue again (or fail) the running jobs whose worker stopped heartbeating"""
+    deadline = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+    stale = db.session.execute(
+        db.select(Job).where(Job.status == 'running', Job.heartbeat_at < deadline)
+    ).scalars().all()
+    for job in stale:
+        _retry_or_fail(job, f'Worker {job.worker} stopped responding')
+    db.session.commit()
+    return len(stale)
+
+
+def heartbeat(job_ids):
+    if job_ids:
+        db.session.execute(db.update(Job).where(Job.id.in_(job_ids), Job.status == 'running')
+                           .values(heartbeat_at=datetime.utcnow()))
+        db.session.commit()
+
+
+def _retry_or_fail(job, message):
+    job.message = message[:255]
+    if job.attempts < job.max_attempts:
+        delay = current_app.config['JOB_RETRY_SECONDS'] * 2 ** (job.attempts - 1)
+        job.status = 'queued'
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+    else:
+        job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+
+
+def run_job(job_id):
+    """Run a claimed job to completion, failure or its next retry"""
+    job = db.session.get(Job, job_id)
+    try:
+        load_handlers()
+        function = HANDLERS[job.kind][0]
+        context = JobContext(job_id, final_attempt=job.attempts >= job.max_attempts)
+        result = function(context, **job_params(job))
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Job %s (%s) failed:\n%s', job_id, job.kind, traceback.format_exc())
+        job = db.session.get(Job, job_id)
+        _retry_or_fail(job, f'{type(e).__name__}: {e}')
+        db.session.commit()
+        return
+    job = db.session.get(Job, job_id)
+    job.status = 'done'
+    job.progress = 100
+    job.result = json.dumps(result) if result is not None else None
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+class Worker:
+    """Polls the jobs table and runs claimed jobs on a thread pool"""
+
+    def __init__(self, app, threads):
+        self.app = app
+        self.threads = threads
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='job')
+        self.running = set()
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.loop, name='job-dispatcher', daemon=True).start()
+
+    def loop(self):
+        config = self.app.config
+        last_heartbeat = 0.0
+        while True:
+            with self.app.app_context():
+                try:
+                    if time.monotonic() - last_heartbeat > config['JOB_LEASE_SECONDS'] / 3:
+                        with self.lock:
+                            running = list(self.running)
+                        heartbeat(running)
+                        requeue_stale()
+                        last_heartbeat = time.monotonic()
+                    self.dispatch()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Job dispatcher error')
+                finally:
+                    db.session.remove()
+            self.wake.wait(config['JOB_POLL_SECONDS'])
+            self.wake.clear()
+
+    def dispatch(self):
+        while True:
+            with self.lock:
+                if len(self.running) >= self.threads:
+                    return
+            job_id = claim_next(self.name)
+            if job_id is None:
+                return
+            with self.lock:
+                self.running.add(job_id)
+            self.executor.submit(self.run, job_id)
+
+    def run(self, job_id):
+        try:
+            with self.app.app_context():
+                try:
+                    run_job(job_id)
+                finally:
+                    db.session.remove()
+        finally:
+            with self.lock:
+                self.running.discard(job_id)
+            self.wake.set()
+
+
+def start_worker(app):
+    """Start this process's worker once, return it"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = Worker(app, app.config['JOB_WORKERS'])
+            _worker.start()
+    return _worker
+
+
+def init_jobs(app):
+    """Start the worker with the first request, so CLI commands never claim jobs"""
+    if app.config['JOB_WORKERS'] <= 0:
+        return
+
+    @app.before_request
+    def _start_job_worker():
+        if _worker is None:
+            start_worker(app)
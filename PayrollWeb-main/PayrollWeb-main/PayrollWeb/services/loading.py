@@ -0,0 +1,53 @@
+"""
+Query shapes of the list and form pages.
+
+A profile names the relationships a view uses and loads them up front:
+joinedload for the one-to-one account, selectinload for collections.
+Every other relationship raises instead of lazy loading, so a template
+that starts walking one shows up as an error instead of one SELECT per row.
+
+The list pages use projections instead: they select only the columns the
+template prints and return plain rows, with no identity map to fill. Their
+query count is fixed whatever the number of rows.
+"""
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from models import db, Attendance, Employee
+
+PROFILES = {
+    # Edit employee: account fields, and the wage history set_wage reads
+    'employee_form': (joinedload(Employee.user), selectinload(Employee.wage_rates), raiseload('*')),
+    # Edit attendance: the row alone, the employee comes from the dropdown
+    'attendance_form': (raiseload('*'),),
+}
+
+
+def with_profile(query, name):
+    """Apply the loading strategy of a view to an ORM query"""
+    return query.options(*PROFILES[name])
+
+
+def employee_choices(status='active'):
+    """(id, full_name, position) rows for the employee dropdowns"""
+    query = db.session.query(Employee.id, Employee.full_name, Employee.position).order_by(Employee.id)
+    if status:
+        query = query.filter(Employee.status == status)
+    return query.all()
+
+
+def attendance_rows():
+    """Query of the admin attendance list: the row's columns and its employee's name"""
+    return db.session.query(
+        Attendance.id,
+        Attendance.employee_id,
+        Attendance.work_date,
+        Attendance.work_hours,
+        Attendance.note,
+        Employee.full_name.label('employee_name')
+    ).join(Employee, Attendance.employee_id == Employee.id)
+
+
+def own_attendance_rows(employee_id):
+    """Query of an employee's own attendance page"""
+    return db.session.query(Attendance.work_date, Attendance.work_hours, Attendance.note).filter(
+        Attendance.employee_id == employee_id
+    )
@@ -0,0 +1,197 @@
+"""
+Request and SQL instrumentation.
+
+init_metrics(app) times every request and, through engine events, counts
+the SQL statements it runs and the time spent in them. A request that runs
+the same statement N_PLUS_ONE_THRESHOLD times or more (typically a lazy
+relationship loaded in a loop) is flagged as an N+1 pattern. With
+PROFILE_SAMPLE_RATE > 0 a sample of requests is run under cProfile and the
+stats are written to PROFILE_DIR. Figures are kept per endpoint and per
+process, and rendered as a page or as Prometheus text.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import deque
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+RECENT_N_PLUS_ONE = 50
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.n_plus_one = 0
+
+    def observe(self, seconds, status, sql_statements, sql_seconds, n_plus_one):
+        self.requests += 1
+        self.errors += status >= 500
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        self.sql_statements += sql_statements
+        self.sql_seconds += sql_seconds
+        self.n_plus_one += n_plus_one
+
+    def quantile(self, q):
+        """Upper bound of the histogram bucket holding quantile q"""
+        target = q * self.requests
+        count = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            count += n
+            if count >= target:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    def __init__(self):
+        self.endpoints = {}
+        self.n_plus_one = deque(maxlen=RECENT_N_PLUS_ONE)  # (time, endpoint, statement, count)
+        self.profiles = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status, statements, sql_seconds, threshold):
+        repeated = [(sql, n) for sql, n in statements.items() if n >= threshold]
+        with self._lock:
+            stats = self.endpoints.setdefault(endpoint, EndpointStats())
+            stats.observe(seconds, status, sum(statements.values()), sql_seconds, len(repeated))
+            for sql, n in repeated:
+                self.n_plus_one.appendleft((time.time(), endpoint, sql, n))
+
+    def snapshot(self):
+        with self._lock:
+            return sorted(self.endpoints.items()), list(self.n_plus_one)
+
+
+metrics = Metrics()
+
+
+class RequestMetrics:
+    """What one request has done so far"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = {}  # SQL text -> times executed
+        self.sql_seconds = 0.0
+        self.profile = None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics' in g:
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics' in g and conn.info.get('metrics_started'):
+        current = g.metrics
+        current.sql_seconds += time.perf_counter() - conn.info['metrics_started'].pop()
+        current.statements[statement] = current.statements.get(statement, 0) + 1
+
+
+def _write_profile(app, profile, endpoint):
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    name = f'{endpoint}-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{threading.get_ident()}.prof'
+    profile.dump_stats(os.path.join(directory, name))
+    metrics.profiles += 1
+
+
+def instrument_engine(engine):
+    """Count and time the statements run on engine in the current request"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def init_metrics(app, db):
+    """Hook request timing, SQL counting and sampled profiling into the app"""
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+
+    @app.before_request
+    def start_request():
+        current = g.metrics = RequestMetrics()
+        rate = app.config['PROFILE_SAMPLE_RATE']
+        if rate and random.random() < rate:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                current.profile = profile
+            except ValueError:
+                pass  # Another request of this process is being profiled
+
+    @app.after_request
+    def finish_request(response):
+        current = g.get('metrics')
+        if current is None:
+            return response
+        endpoint = request.endpoint or 'unknown'
+
+        # Recorded when the response is closed, so streamed bodies are included
+        def finish():
+            seconds = time.perf_counter() - current.started
+            if current.profile is not None:
+                current.profile.disable()
+                _write_profile(app, current.profile, endpoint)
+            metrics.record(endpoint, seconds, response.status_code, current.statements,
+                           current.sql_seconds, app.config['N_PLUS_ONE_THRESHOLD'])
+
+        response.call_on_close(finish)
+        return response
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format"""
+    endpoints, _ = metrics.snapshot()
+    lines = [
+        '# HELP payroll_request_duration_seconds Request latency by endpoint.',
+        '# TYPE payroll_request_duration_seconds histogram',
+    ]
+    for endpoint, stats in endpoints:
+        label = f'endpoint="{_label(endpoint)}"'
+        count = 0
+        for bound, n in zip(BUCKETS, stats.buckets):
+            count += n
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'payroll_request_duration_seconds_bucket{{{label},le="{le}"}} {count}')
+        lines.append(f'payroll_request_duration_seconds_sum{{{label}}} {stats.seconds}')
+        lines.append(f'payroll_request_duration_seconds_count{{{label}}} {stats.requests}')
+
+    counters = [
+        ('payroll_request_errors_total', 'Responses with a 5xx status.', 'errors'),
+        ('payroll_sql_statements_total', 'SQL statements executed by requests.', 'sql_statements'),
+        ('payroll_sql_seconds_total', 'Time spent in SQL statements by requests.', 'sql_seconds'),
+        ('payroll_n_plus_one_total', 'Repeated statements flagged as N+1 patterns.', 'n_plus_one'),
+    ]
+    for name, help_text, attribute in counters:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for endpoint, stats in endpoints:
+            lines.append(f'{name}{{endpoint="{_label(endpoint)}"}} {getattr(stats, attribute)}')
+
+    lines.append('# HELP payroll_profiles_total Request profiles written.')
+    lines.append('# TYPE payroll_profiles_total counter')
+    lines.append(f'payroll_profiles_total {metrics.profiles}')
+    return '\n'.join(lines) + '\n'
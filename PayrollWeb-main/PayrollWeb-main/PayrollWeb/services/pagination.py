@@ -0,0 +1,93 @@
+"""
+Keyset (cursor) pagination for list pages.
+
+A page is fetched with WHERE (k1, k2) > cursor ORDER BY k1, k2 LIMIT n + 1,
+so the deepest page costs the same as the first one.
+"""
+from datetime import date
+from flask import current_app, request, url_for
+from models import db
+
+
+class Page:
+    def __init__(self, items, next_cursor, start):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.start = start  # Number of rows before this page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def first_url(self):
+        return page_url()
+
+    @property
+    def next_url(self):
+        return page_url(after=self.next_cursor, start=self.start + len(self.items))
+
+
+def encode_cursor(values):
+    """Serialize the sort key of a row for the 'after' query parameter"""
+    return '_'.join(v.isoformat() if isinstance(v, date) else str(v) for v in values)
+
+
+def decode_cursor(value, types):
+    """Parse an 'after' parameter back into a sort key, None if invalid"""
+    parts = value.split('_') if value else []
+    if len(parts) != len(types):
+        return None
+    try:
+        return tuple(convert(part) for convert, part in zip(types, parts))
+    except ValueError:
+        return None
+
+
+def page_url(**cursor):
+    """URL of the current list with the given cursor and the other filters kept"""
+    args = request.args.to_dict(flat=False)
+    args.pop('after', None)
+    args.pop('start', None)
+    args.update(cursor)
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def parse_date(value):
+    """Cursor part converter for date columns"""
+    return date.fromisoformat(value)
+
+
+def get_page_size():
+    """Page size from ?per_page=, bounded by MAX_PAGE_SIZE"""
+    page_size = request.args.get('per_page', current_app.config['PAGE_SIZE'], type=int)
+    return max(1, min(page_size, current_app.config['MAX_PAGE_SIZE']))
+
+
+def paginate(query, columns, types, descending=False):
+    """Return the page of `query` selected by the request's cursor"""
+    page_size = get_page_size()
+    after = decode_cursor(request.args.get('after'), types)
+    start = max(request.args.get('start', 0, type=int), 0) if after else 0
+
+    if after:
+        key = db.tuple_(*columns)
+        if descending:
+            query = query.filter(key < db.tuple_(*after))
+        else:
+            query = query.filter(key > db.tuple_(*after))
+
+    order = [column.desc() if descending else column for column in columns]
+    items = query.order_by(*order).limit(page_size + 1).all()
+
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor(getattr(items[-1], column.key) for column in columns)
+    return Page(items, next_cursor, start)
+
+
+def stream_rows(query, columns, descending=False):
+    """Iterate over every row of `query` in sort order, in chunks"""
+    order = [column.desc() if descending else column for column in columns]
+    return query.order_by(*order).yield_per(current_app.config['PAGE_SIZE'])
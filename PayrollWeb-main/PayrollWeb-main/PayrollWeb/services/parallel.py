@@ -0,0 +1,106 @@
+"""
+Sharded payroll pipeline.
+
+compute_payroll() yields the salary rows of a month in employee id order.
+With PAYROLL_WORKERS > 1 and more than PAYROLL_SHARD_SIZE employees, the
+employees are split into contiguous id ranges computed by a pool of worker
+processes, each with its own database connection. Shards stream back in
+order as they finish, so the output is row for row the serial one.
+Per-employee Python rules (a picklable function PayrollRow -> PayrollRow)
+run inside the workers, which is where the extra cores pay off.
+
+Workers are spawned, not forked, so they inherit neither the web process's
+threads nor its open connections. Each shard is read in its own
+transaction.
+"""
+import multiprocessing
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from models import db, Employee
+from services.payroll import iter_payroll
+
+PayrollRow = namedtuple('PayrollRow', 'employee_id full_name position total_work daily_wage total_salary')
+
+# Settings a worker process needs to open the database like the app does
+WORKER_CONFIG = ('SQLALCHEMY_ENGINE_OPTIONS', 'SQLITE_BUSY_TIMEOUT_MS', 'SQLITE_MMAP_SIZE')
+
+_pool = None  # (key, ProcessPoolExecutor)
+_pool_lock = threading.Lock()
+
+
+def iter_rows(year, month, status='active', id_range=None, rule=None):
+    """PayrollRows of a month (or of one id range), computed in this process"""
+    rows = (PayrollRow(*row) for row in iter_payroll(year, month, status=status, id_range=id_range))
+    return (rule(row) for row in rows) if rule else rows
+
+
+def shard_bounds(status, shard_size):
+    """Contiguous (first_id, last_id) ranges of at most shard_size employees"""
+    query = db.select(Employee.id).order_by(Employee.id)
+    if status:
+        query = query.where(Employee.status == status)
+    ids = db.session.execute(query).scalars().all()
+    return [(ids[i], ids[min(i + shard_size, len(ids)) - 1]) for i in range(0, len(ids), shard_size)]
+
+
+def _init_worker(database_uri, config):
+    from flask import Flask
+    from services.database import configure_engines
+    app = Flask(__name__)
+    app.config.update(config, SQLALCHEMY_DATABASE_URI=database_uri)
+    db.init_app(app)
+    configure_engines(app, db)
+    app.app_context().push()
+
+
+def _compute_shard(args):
+    try:
+        return list(iter_rows(*args))
+    finally:
+        db.session.remove()
+
+
+def _discard_pool():
+    global _pool
+    if _pool:
+        _pool[1].shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def worker_pool(workers, database_uri):
+    """The process pool for this database, started on first use"""
+    global _pool
+    key = (workers, database_uri)
+    with _pool_lock:
+        if _pool and _pool[0] != key:
+            _discard_pool()
+        if _pool is None:
+            config = {name: current_app.config[name] for name in WORKER_CONFIG}
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                           initializer=_init_worker, initargs=(database_uri, config))
+            _pool = (key, executor)
+        return _pool[1]
+
+
+def compute_payroll(year, month, status='active', rule=None, workers=None):
+    """Yield the month's PayrollRows in employee id order, on PAYROLL_WORKERS processes
+    when there is more than one shard of employees"""
+    config = current_app.config
+    workers = config['PAYROLL_WORKERS'] if workers is None else workers
+    url = db.session.get_bind().url
+    if workers > 1 and url.database not in (None, '', ':memory:'):
+        bounds = shard_bounds(status, config['PAYROLL_SHARD_SIZE'])
+        if len(bounds) > 1:
+            pool = worker_pool(workers, url.render_as_string(hide_password=False))
+            try:
+                for rows in pool.map(_compute_shard, [(year, month, status, id_range, rule) for id_range in bounds]):
+                    yield from rows
+            except BrokenProcessPool:
+                with _pool_lock:
+                    _discard_pool()
+                raise
+            return
+    yield from iter_rows(year, month, status, rule=rule)
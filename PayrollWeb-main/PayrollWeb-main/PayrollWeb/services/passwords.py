@@ -0,0 +1,83 @@
+"""
+Password hashing with a configurable algorithm and cost.
+
+PASSWORD_HASH_METHOD is any Werkzeug method string, e.g. 'scrypt:32768:8:1'
+or 'pbkdf2:sha256:600000'. Hashes made with other parameters still verify;
+after a successful login they are rehashed in the background. Hashing and
+verification run on a bounded thread pool (hashlib releases the GIL). This
+only caps how many CPU- and memory-heavy derivations run at once during a
+login storm: the request thread still waits for its own hash, so a login
+takes at least one hash time. Only the rehash is off the request path.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+_executor = None
+
+
+def normalize_method(method):
+    """Werkzeug method string with its defaults filled in"""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        return 'scrypt:' + ':'.join(args or ['32768', '8', '1'])
+    if name == 'pbkdf2':
+        if len(args) < 2:
+            args = (args or ['sha256']) + [str(DEFAULT_PBKDF2_ITERATIONS)]
+        return 'pbkdf2:' + ':'.join(args)
+    raise ValueError(f'Invalid hash method {method!r}')
+
+
+def hash_method():
+    """The configured method, or the default outside an app context"""
+    if has_app_context():
+        return normalize_method(current_app.config['PASSWORD_HASH_METHOD'])
+    return DEFAULT_METHOD
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        workers = current_app.config['PASSWORD_HASH_WORKERS'] if has_app_context() else 4
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password')
+    return _executor
+
+
+def hash_password(password, method=None):
+    """Hash a password with the configured method on the pool, waiting for the result"""
+    method = method or hash_method()
+    return executor().submit(generate_password_hash, password, method).result()
+
+
+def verify_password(password_hash, password):
+    """check_password_hash on the hashing pool, waiting for the result"""
+    return executor().submit(check_password_hash, password_hash, password).result()
+
+
+def needs_rehash(password_hash):
+    """True if the hash was made with a method other than the configured one"""
+    return password_hash.split('$', 1)[0] != hash_method()
+
+
+def _rehash(app, user_id, old_hash, password):
+    from models import db, User
+    from services.principal import invalidate_principal
+    with app.app_context():
+        new_hash = generate_password_hash(password, hash_method())
+        # Skip if the password was changed in the meantime
+        db.session.execute(
+            db.update(User)
+            .where(User.id == user_id, User.password_hash == old_hash)
+            .values(password_hash=new_hash)
+        )
+        db.session.commit()
+        invalidate_principal(user_id)
+
+
+def rehash_in_background(user, password):
+    """Upgrade an outdated hash after a successful login, off the request thread"""
+    if needs_rehash(user.password_hash):
+        app = current_app._get_current_object()
+        executor().submit(_rehash, app, user.id, user.password_hash, password)
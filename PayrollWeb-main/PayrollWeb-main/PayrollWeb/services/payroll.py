@@ -0,0 +1,170 @@
+"""
+Payroll engine: computes monthly work totals and salaries from the
+materialized attendance summary (see services.summary) in one query
+instead of walking each employee's attendances.
+
+Wages are effective-dated (WageRate). A month is priced at the rate in
+effect on its last day, minus a correction for each rate change inside the
+month: (new rate - previous rate) x hours worked before the change. Only
+employees whose rate changed that month touch raw attendance, through the
+(employee_id, work_date) index; everyone else is summary hours x one rate.
+An employee's first rate also covers earlier dates, and employees without
+any rate history are paid Employee.daily_wage.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+from models import db, Employee, Attendance, AttendanceSummary, WageRate
+
+
+def month_bounds(year, month):
+    """Return the half-open [first_of_month, first_of_next_month) range"""
+    start = date(year, month, 1)
+    if month == 12:
+        end = date(year + 1, 1, 1)
+    else:
+        end = date(year, month + 1, 1)
+    return start, end
+
+
+def parse_month(value):
+    """Parse a 'YYYY-MM' string into (year, month)"""
+    year, month = map(int, value.split('-'))
+    return year, month
+
+
+def iter_months(first, last):
+    """Yield every (year, month) from first to last, inclusive"""
+    year, month = first
+    while (year, month) <= last:
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def attendance_in_month(year, month):
+    """Index-friendly filter for the attendance rows of a month"""
+    start, end = month_bounds(year, month)
+    return db.and_(Attendance.work_date >= start, Attendance.work_date < end)
+
+
+def get_total_work(employee_id, year, month):
+    """Total work of one employee in a month"""
+    summary = db.session.get(AttendanceSummary, (employee_id, year, month))
+    return summary.total_hours if summary else 0
+
+
+def _latest_rate(employee_id, day, inclusive=True):
+    """Scalar subquery: the last rate starting on (or, if not inclusive, before) day"""
+    rates = db.aliased(WageRate)
+    starts = rates.effective_from <= day if inclusive else rates.effective_from < day
+    return db.select(rates.rate).where(rates.employee_id == employee_id, starts).order_by(
+        rates.effective_from.desc()).limit(1).scalar_subquery()
+
+
+def rate_on(employee_id, day, default):
+    """SQL expression: the wage of employee_id (a column or value) on day"""
+    rates = db.aliased(WageRate)
+    first = db.select(rates.rate).where(rates.employee_id == employee_id).order_by(
+        rates.effective_from).limit(1).scalar_subquery()
+    return db.func.coalesce(_latest_rate(employee_id, day), first, default)
+
+
+def rate_change_adjustments(year, month):
+    """Subquery (employee_id, adjustment) over the employees whose rate changed
+    inside the month; adjustment is what pricing the whole month at the
+    month-end rate overpays"""
+    start, end = month_bounds(year, month)
+    previous = db.func.coalesce(_latest_rate(WageRate.employee_id, WageRate.effective_from, inclusive=False),
+                                WageRate.rate)
+    hours_before = db.select(db.func.coalesce(db.func.sum(Attendance.work_hours), 0)).where(
+        Attendance.employee_id == WageRate.employee_id,
+        Attendance.work_date >= start,
+        Attendance.work_date < WageRate.effective_from
+    ).scalar_subquery()
+    return db.select(
+        WageRate.employee_id,
+        db.func.sum((WageRate.rate - previous) * hours_before).label('adjustment')
+    ).where(WageRate.effective_from > start, WageRate.effective_from < end).group_by(
+        WageRate.employee_id).subquery('rate_changes')
+
+
+def payroll_select(year, month, *columns, status='active'):
+    """SELECT columns + the month's (total_work, daily_wage, total_salary) for
+    every employee, ordered by id; daily_wage is the rate on the last day"""
+    start, end = month_bounds(year, month)
+    adjustments = rate_change_adjustments(year, month)
+    total_work = db.func.coalesce(AttendanceSummary.total_hours, 0)
+    daily_wage = rate_on(Employee.id, end - timedelta(days=1), Employee.daily_wage)
+    total_salary = total_work * daily_wage - db.func.coalesce(adjustments.c.adjustment, 0)
+    query = db.select(
+        *columns, total_work.label('total_work'), daily_wage.label('daily_wage'),
+        total_salary.label('total_salary')
+    ).outerjoin(
+        AttendanceSummary, db.and_(
+            AttendanceSummary.employee_id == Employee.id,
+            AttendanceSummary.year == year,
+            AttendanceSummary.month == month
+        )
+    ).outerjoin(adjustments, adjustments.c.employee_id == Employee.id)
+    if status:
+        query = query.where(Employee.status == status)
+    return query.order_by(Employee.id)
+
+
+def get_salary(employee, year, month):
+    """Return (total_work, total_salary) of one employee in a month"""
+    total_work, daily_wage, total_salary = employee_payroll(employee.id, year, month)
+    return total_work, total_salary
+
+
+def employee_payroll(employee_id, year, month):
+    """(total_work, daily_wage, total_salary) of one employee in a month"""
+    query = payroll_select(year, month, Employee.id, status=None).where(Employee.id == employee_id)
+    return tuple(db.session.execute(query).one())[1:]
+
+
+@lru_cache(maxsize=256)
+def _payroll_of_ids(year, month, status, chunk_size):
+    """iter_payroll's statement over the bound list of ids :employee_ids.
+    Building it costs more than running it for a few hundred employees, and
+    API batch reads ask for the same months over and over."""
+    return payroll_select(
+        year, month, Employee.id, Employee.full_name, Employee.position, status=status
+    ).where(Employee.id.in_(db.bindparam('employee_ids', expanding=True))).execution_options(yield_per=chunk_size)
+
+
+def iter_payroll(year, month, status='active', chunk_size=1000, id_range=None, employee_ids=None):
+    """Stream the salary rows of a month as plain tuples from a server-side cursor:
+    (employee_id, full_name, position, total_work, daily_wage, total_salary).
+    id_range = (first_id, last_id) limits it to one shard of employees,
+    employee_ids to a given set."""
+    if employee_ids is not None:
+        query = _payroll_of_ids(year, month, status, chunk_size)
+        params = {'employee_ids': list(employee_ids)}
+    else:
+        query = payroll_select(
+            year, month, Employee.id, Employee.full_name, Employee.position, status=status
+        ).execution_options(yield_per=chunk_size)
+        params = None
+    if id_range:
+        query = query.where(Employee.id.between(*id_range))
+    for row in db.session.execute(query, params):
+        yield tuple(row)
+
+
+def set_wage(employee, rate, effective_from):
+    """Record a wage change of employee from effective_from on; the caller commits.
+
+    The first change also records the wage being replaced, from the start date."""
+    from services.periods import ensure_open
+    ensure_open(effective_from)
+    if not employee.wage_rates and effective_from > employee.start_date:
+        db.session.add(WageRate(employee=employee, effective_from=employee.start_date,
+                                rate=employee.daily_wage))
+    wage_rate = db.session.get(WageRate, (employee.id, effective_from))
+    if wage_rate:
+        wage_rate.rate = rate
+    else:
+        db.session.add(WageRate(employee=employee, effective_from=effective_from, rate=rate))
+    latest = max([r.effective_from for r in employee.wage_rates] + [effective_from])
+    if effective_from == latest:
+        employee.daily_wage = rate
@@ -0,0 +1,113 @@
+"""
+Payroll period close.
+
+Closing a month writes one payslip per employee with the hours, wage and
+salary of that moment (INSERT ... SELECT, one statement) and records the
+period. From then on the month's salary views read payslips instead of
+recomputing, and attendance of the month can no longer be added, edited,
+deleted or imported until the period is reopened.
+"""
+from datetime import date, datetime
+from models import db, Employee, AttendanceSummary, PayrollPeriod, Payslip
+from services.payroll import payroll_select
+
+
+class PeriodClosedError(Exception):
+    """Raised when a change touches attendance of a closed payroll period"""
+
+
+class PeriodError(Exception):
+    """Raised when a period cannot be closed or reopened"""
+
+
+def is_closed(year, month):
+    return db.session.get(PayrollPeriod, (year, month)) is not None
+
+
+def closed_months(months):
+    """The subset of the (year, month) pairs that are closed"""
+    months = set(months)
+    if not months:
+        return set()
+    rows = db.session.execute(db.select(PayrollPeriod.year, PayrollPeriod.month).where(
+        db.tuple_(PayrollPeriod.year, PayrollPeriod.month).in_(list(months))
+    ))
+    return {tuple(row) for row in rows}
+
+
+def ensure_open(*days):
+    """Raise PeriodClosedError if any of the dates falls in a closed period"""
+    closed = closed_months((day.year, day.month) for day in days)
+    if closed:
+        year, month = min(closed)
+        raise PeriodClosedError(f'Payroll period {year:04d}-{month:02d} is closed; attendance is locked.')
+
+
+def close_period(year, month, closed_by=None):
+    """Snapshot every employee's payslip for a finished month, return the PayrollPeriod"""
+    today = date.today()
+    if (year, month) >= (today.year, today.month):
+        raise PeriodError(f'{year:04d}-{month:02d} has not ended yet.')
+    if is_closed(year, month):
+        raise PeriodError(f'{year:04d}-{month:02d} is already closed.')
+
+    # Active employees, plus inactive ones who worked that month
+    rows = payroll_select(
+        year, month, db.literal(year), db.literal(month), Employee.id, Employee.full_name, Employee.position,
+        status=None
+    ).where(db.or_(Employee.status == 'active', AttendanceSummary.total_hours.isnot(None)))
+    db.session.execute(db.insert(Payslip).from_select(
+        ['year', 'month', 'employee_id', 'full_name', 'position',
+         'total_work', 'daily_wage', 'total_salary'],
+        rows
+    ))
+
+    employee_count, total_salary = db.session.execute(db.select(
+        db.func.count(), db.func.coalesce(db.func.sum(Payslip.total_salary), 0)
+    ).where(Payslip.year == year, Payslip.month == month)).one()
+    period = PayrollPeriod(year=year, month=month, closed_at=datetime.utcnow(), closed_by=closed_by,
+                           employee_count=employee_count, total_salary=total_salary)
+    db.session.add(period)
+    db.session.commit()
+    return period
+
+
+def reopen_period(year, month):
+    """Delete a period's payslips and unlock its attendance"""
+    period = db.session.get(PayrollPeriod, (year, month))
+    if period is None:
+        raise PeriodError(f'{year:04d}-{month:02d} is not closed.')
+    db.session.execute(db.delete(Payslip).where(Payslip.year == year, Payslip.month == month))
+    db.session.delete(period)
+    db.session.commit()
+
+
+def get_payslip(employee_id, year, month):
+    return db.session.get(Payslip, (year, month, employee_id))
+
+
+def payslip_rows(year, month):
+    """Salary rows of a closed month for the salary page: dicts of employee, total_work,
+    daily_wage and total_salary"""
+    payslips = db.session.execute(db.select(Payslip).where(
+        Payslip.year == year, Payslip.month == month
+    ).order_by(Payslip.employee_id)).scalars()
+    return [{
+        'employee': payslip,
+        'total_work': payslip.total_work,
+        'daily_wage': payslip.daily_wage,
+        'total_salary': payslip.total_salary
+    } for payslip in payslips]
+
+
+def iter_payslips(year, month, chunk_size=1000, employee_ids=None):
+    """Stream a closed month as the tuples of services.payroll.iter_payroll"""
+    query = db.select(
+        Payslip.employee_id, Payslip.full_name, Payslip.position,
+        Payslip.total_work, Payslip.daily_wage, Payslip.total_salary
+    ).where(Payslip.year == year, Payslip.month == month).order_by(
+        Payslip.employee_id).execution_options(yield_per=chunk_size)
+    if employee_ids is not None:
+        query = query.where(Payslip.employee_id.in_(employee_ids))
+    for row in db.session.execute(query):
+        yield tuple(row)
@@ -0,0 +1,74 @@
+"""
+Cached identity for Flask-Login.
+
+A cache miss loads the user and its employee with one joined query in a
+short-lived session; the detached copy is kept in an LRU/TTL cache and
+merged into each request's session with load=False, which issues no SQL.
+
+The cache is per process, so every request checks the cached copy against
+users.auth_version, one primary-key lookup. Mapper events bump the version
+in the same transaction as any change to the user or its employee, so a
+password, role or profile change, or a deleted account, is seen by every
+worker on its next request. invalidate_principal() only frees the entry of
+this process early.
+"""
+from flask import current_app
+from sqlalchemy.orm import Session, joinedload
+from models import db, User, Employee
+from services.cache import LRUCache
+
+_principals = None
+
+
+def principal_cache():
+    """The process-wide principal cache, sized from the app config"""
+    global _principals
+    if _principals is None:
+        _principals = LRUCache(
+            maxsize=current_app.config['PRINCIPAL_CACHE_SIZE'],
+            ttl=current_app.config['PRINCIPAL_CACHE_SECONDS']
+        )
+    return _principals
+
+
+def _fetch_user(user_id):
+    # The request session's engine: the async one for requests served on the event loop
+    with Session(db.session.get_bind()) as session:
+        return session.execute(
+            db.select(User).options(joinedload(User.employee)).where(User.id == user_id)
+        ).scalar_one_or_none()
+
+
+def load_principal(user_id):
+    """User for Flask-Login's user_loader, attached to the current session"""
+    cache = principal_cache()
+    version = db.session.scalar(db.select(User.auth_version).where(User.id == user_id))
+    if version is None:
+        cache.delete(user_id)
+        return None
+    user = cache.get(user_id)
+    if user is None or user.auth_version != version:
+        user = _fetch_user(user_id)
+        if user is None:
+            return None
+        cache.set(user_id, user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate_principal(user_id):
+    """Forget a cached user after it or its employee changed (this process only)"""
+    if user_id is not None:
+        principal_cache().delete(user_id)
+
+
+@db.event.listens_for(User, 'before_update')
+def _user_changed(mapper, connection, user):
+    if db.object_session(user).is_modified(user, include_collections=False):
+        user.auth_version = User.auth_version + 1
+
+
+@db.event.listens_for(Employee, 'after_update')
+def _employee_changed(mapper, connection, employee):
+    if db.object_session(employee).is_modified(employee, include_collections=False):
+        connection.execute(db.update(User).where(User.employee_id == employee.id)
+                           .values(auth_version=User.auth_version + 1))
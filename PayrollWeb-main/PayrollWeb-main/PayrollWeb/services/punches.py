@@ -0,0 +1,481 @@
+"""
+Clock punch ingestion.
+
+A clock-in or clock-out is appended to punch_events: no foreign key,
+no unique constraint and no index besides the row id, so a punch is one
+cheap row write and bursts at shift start don't queue up behind the
+attendance constraint checks. A compactor thread folds the log into
+Attendance.work_hours in batches of PUNCH_BATCH_SIZE. Each batch pairs
+ins with outs, adds the hours to their (employee_id, work_date) rows,
+records each employee's clock state in punch_clocks and moves the
+folded events to punch_history, all in one transaction.
+
+Exactly once:
+- A batch is applied and removed from the log atomically. If another
+  compactor already took the same events, the delete count gives it away
+  and the batch is rolled back.
+- A punch is identified by (employee_id, punched_at, kind). One already in
+  punch_history, or twice in the batch, is a retried upload and skipped.
+
+A punch at or before the employee's last applied one (e.g. from a terminal
+that was offline) is not dropped: the employee's history is folded again
+from the last gap longer than a shift, with and without the late punches,
+and the difference is added to attendance. Hours that land in a closed
+payroll month, or that would take a day below zero, are held in
+punch_rejections for an admin to apply (after reopening the month) or
+dismiss. The compactor thread prunes punch_history to PUNCH_HISTORY_DAYS
+once a day (see prune_history()).
+
+fresh_totals() reads the compacted hours plus the log's pending punches,
+so an employee sees a shift as soon as they clock out.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from flask import current_app
+from models import db, Attendance, Employee, PunchClock, PunchEvent, PunchHistory, PunchRejection
+from services.payroll import attendance_in_month
+from services.periods import closed_months, ensure_open
+from services.stats import bucket_keys, invalidate
+from services.summary import bucket_of, rebuild_month, refresh_summaries
+from services.versions import bump
+
+KINDS = ('in', 'out')
+PRUNE_SECONDS = 24 * 3600  # How often the compactor thread prunes punch_history
+# Why punch hours were held in punch_rejections
+CLOSED_MONTH = 'closed_month'
+BELOW_ZERO = 'below_zero'
+
+_compactor = None
+_compactor_lock = threading.Lock()
+
+
+class CompactionConflict(Exception):
+    """Raised when the batch's events were compacted by someone else meanwhile"""
+
+
+class CompactResult:
+    def __init__(self):
+        self.events = 0  # Log rows folded
+        self.shifts = 0  # In/out pairs added to attendance, net of those a late punch split
+        self.skipped = 0  # Duplicate, unmatched or unknown employee, net like shifts
+        self.late = 0  # Punches before their employee's last applied one, folded again
+        self.rejected = 0  # (employee, day) totals held: closed payroll month, or below zero
+        self.buckets = set()
+
+
+def record_punches(punches):
+    """Append (employee_id, kind, punched_at) punches to the log and commit"""
+    now = datetime.utcnow()
+    rows = [{'employee_id': employee_id, 'kind': kind, 'punched_at': punched_at, 'received_at': now}
+            for employee_id, kind, punched_at in punches]
+    for row in rows:
+        if row['kind'] not in KINDS:
+            raise ValueError(f"kind must be 'in' or 'out', not {row['kind']!r}")
+    if rows:
+        db.session.execute(db.insert(PunchEvent), rows)
+        db.session.commit()
+    return len(rows)
+
+
+def record_punch(employee_id, kind, punched_at=None):
+    """Append one punch, stamped now unless given"""
+    punched_at = punched_at or datetime.now().replace(microsecond=0)
+    record_punches([(employee_id, kind, punched_at)])
+    return punched_at
+
+
+def fold(events, clocks, max_shift_hours):
+    """Pair punches into shifts.
+
+    events are (employee_id, punched_at, id, kind) sorted, without duplicates
+    and after the clock of their employee; clocks maps employee_id to
+    (last_punch_at, open_since) and is updated in place.
+    Return ({(employee_id, work_date): hours}, shift count, count of unused punches).
+    A shift counts on the day it started."""
+    max_shift = timedelta(hours=max_shift_hours)
+    hours = defaultdict(float)
+    shifts = skipped = 0
+    for employee_id, punched_at, _, kind in events:
+        open_since = clocks.get(employee_id, (None, None))[1]
+        if open_since and punched_at - open_since > max_shift:
+            # The clock-out of that shift was missed
+            open_since = None
+            skipped += 1
+        if kind == 'in':
+            if open_since:
+                skipped += 1
+            else:
+                open_since = punched_at
+        elif open_since:
+            hours[(employee_id, open_since.date())] += (punched_at - open_since).total_seconds() / 3600
+            shifts += 1
+            open_since = None
+        else:
+            skipped += 1
+        clocks[employee_id] = (punched_at, open_since)
+    return hours, shifts, skipped
+
+
+def _insert():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _add_hours_statement():
+    statement = _insert()(Attendance.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=['employee_id', 'work_date'],
+        set_={'work_hours': Attendance.__table__.c.work_hours + statement.excluded.work_hours}
+    )
+
+
+def _clock_statement():
+    statement = _insert()(PunchClock.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=['employee_id'],
+        set_={'last_punch_at': statement.excluded.last_punch_at, 'open_since': statement.excluded.open_since}
+    )
+
+
+def unique(events, seen):
+    """events without the punches whose (employee_id, punched_at, kind) is in seen,
+    each one once; seen is updated"""
+    kept = []
+    for event in events:
+        identity = (event[0], event[1], event[3])
+        if identity not in seen:
+            seen.add(identity)
+            kept.append(event)
+    return kept
+
+
+def _applied(events):
+    """Identities in punch_history of employees and times spanned by the events"""
+    if not events:
+        return set()
+    rows = db.session.execute(
+        db.select(PunchHistory.employee_id, PunchHistory.punched_at, PunchHistory.kind).where(
+            PunchHistory.employee_id.in_({event[0] for event in events}),
+            PunchHistory.punched_at.between(min(event[1] for event in events), max(event[1] for event in events)))
+    )
+    return {tuple(row) for row in rows}
+
+
+def _settled_since(employee_id, before, max_shift):
+    """The earliest applied punch of the employee such that no punch between it and
+    `before` is preceded by a gap longer than max_shift. No shift spans such a gap,
+    so folding from there with a closed clock gives the hours that were applied."""
+    start = before
+    while True:
+        earlier = db.session.execute(
+            db.select(PunchHistory.punched_at)
+            .where(PunchHistory.employee_id == employee_id, PunchHistory.punched_at < start)
+            .order_by(PunchHistory.punched_at.desc()).limit(100)
+        ).scalars().all()
+        for punched_at in earlier:
+            if start - punched_at > max_shift:
+                return start
+            start = punched_at
+        if len(earlier) < 100:
+            return start
+
+
+def refold(employee_id, events, max_shift_hours):
+    """Fold an employee's punches, some of them late, in among the applied ones.
+    Return ({(employee_id, work_date): hours to add, possibly negative}, net shifts,
+    net skipped, new clock state)"""
+    start = _settled_since(employee_id, events[0][1], timedelta(hours=max_shift_hours))
+    applied = [(employee_id, row.punched_at, 0, row.kind) for row in db.session.execute(
+        db.select(PunchHistory.punched_at, PunchHistory.kind)
+        .where(PunchHistory.employee_id == employee_id, PunchHistory.punched_at >= start)
+    )]
+    old, old_shifts, old_skipped = fold(sorted(applied), {}, max_shift_hours)
+    clocks = {}
+    new, shifts, skipped = fold(sorted(applied + events), clocks, max_shift_hours)
+    delta = {key: new.get(key, 0) - old.get(key, 0) for key in set(old) | set(new)}
+    return ({key: value for key, value in delta.items() if abs(value) > 1e-9},
+            shifts - old_shifts, skipped - old_skipped, clocks[employee_id])
+
+
+def _day_hours(keys):
+    """{(employee_id, work_date): work_hours} of the attendance rows that exist"""
+    rows = db.session.execute(
+        db.select(Attendance.employee_id, Attendance.work_date, Attendance.work_hours)
+        .where(db.tuple_(Attendance.employee_id, Attendance.work_date).in_(keys))
+    )
+    return {(row.employee_id, row.work_date): row.work_hours for row in rows}
+
+
+def _hold(hours, reason, now):
+    """Move {(employee_id, work_date): hours} to punch_rejections for an admin"""
+    if hours:
+        db.session.execute(db.insert(PunchRejection), [
+            {'employee_id': employee_id, 'work_date': day, 'work_hours': round(value, 4), 'reason': reason,
+             'rejected_at': now}
+            for (employee_id, day), value in hours.items()
+        ])
+
+
+def compact(batch_size=None):
+    """Fold the oldest batch of the log into attendance, return a CompactResult"""
+    config = current_app.config
+    result = CompactResult()
+    rows = db.session.execute(
+        db.select(PunchEvent.employee_id, PunchEvent.punched_at, PunchEvent.id, PunchEvent.kind)
+        .order_by(PunchEvent.id).limit(batch_size or config['PUNCH_BATCH_SIZE'])
+    ).all()
+    if not rows:
+        db.session.rollback()
+        return result
+    result.events = len(rows)
+    # Taken from the log first, so a second compactor of the same events stops here
+    ids = [row.id for row in rows]
+    deleted = db.session.execute(db.delete(PunchEvent).where(PunchEvent.id.in_(ids))).rowcount
+    if deleted != len(ids):
+        db.session.rollback()
+        raise CompactionConflict(f'{len(ids) - deleted} of {len(ids)} events already compacted')
+
+    employee_ids = {row.employee_id for row in rows}
+    known = set(db.session.execute(db.select(Employee.id).where(Employee.id.in_(employee_ids))).scalars())
+    clocks = {clock.employee_id: (clock.last_punch_at, clock.open_since) for clock in db.session.execute(
+        db.select(PunchClock).where(PunchClock.employee_id.in_(known))).scalars()}
+    before = dict(clocks)
+    events = sorted(tuple(row) for row in rows if row.employee_id in known)
+    events = unique(events, _applied(events))
+    result.skipped = len(rows) - len(events)
+    late = [event for event in events if event[0] in clocks and event[1] <= clocks[event[0]][0]]
+    result.late = len(late)
+    late_employees = {event[0] for event in late}
+    max_shift_hours = config['PUNCH_MAX_SHIFT_HOURS']
+    hours, result.shifts, skipped = fold([event for event in events if event[0] not in late_employees],
+                                         clocks, max_shift_hours)
+    result.skipped += skipped
+    # All of a late employee's punches in the batch are folded again together
+    for employee_id, employee_events in groupby((event for event in events if event[0] in late_employees),
+                                                key=itemgetter(0)):
+        delta, shifts, skipped, clocks[employee_id] = refold(employee_id, list(employee_events), max_shift_hours)
+        hours.update(delta)
+        result.shifts += shifts
+        result.skipped += skipped
+    if events:
+        db.session.execute(db.insert(PunchHistory), [
+            {'employee_id': employee_id, 'punched_at': punched_at, 'kind': kind}
+            for employee_id, punched_at, _, kind in events
+        ])
+
+    now = datetime.utcnow()
+    closed = closed_months({(day.year, day.month) for _, day in hours})
+    if closed:
+        rejected = {key: hours.pop(key) for key in list(hours) if (key[1].year, key[1].month) in closed}
+        _hold(rejected, CLOSED_MONTH, now)
+        current_app.logger.warning('Punch hours of %d days in closed months held for review', len(rejected))
+        result.rejected += len(rejected)
+    # A late punch can take hours away, but never more than the day still has
+    # (an admin may have edited or deleted it since)
+    short = [key for key, value in hours.items() if value < 0]
+    emptied = []
+    if short:
+        left = _day_hours(short)
+        excess = {}
+        for key in short:
+            taken = max(hours[key], -left.get(key, 0))
+            if round(hours[key] - taken, 4):
+                excess[key] = hours[key] - taken
+            hours[key] = taken
+            if round(left.get(key, 0) + taken, 4) <= 0:
+                emptied.append(key)
+            if not round(taken, 4):
+                del hours[key]
+        _hold(excess, BELOW_ZERO, now)
+        result.rejected += len(excess)
+
+    if hours:
+        db.session.execute(_add_hours_statement(), [
+            {'employee_id': employee_id, 'work_date': day, 'work_hours': round(value, 4), 'created_at': now}
+            for (employee_id, day), value in hours.items()
+        ])
+    if emptied:
+        # A day a late punch took every hour from is gone, as if never punched
+        db.session.execute(db.delete(Attendance).where(
+            db.tuple_(Attendance.employee_id, Attendance.work_date).in_(emptied),
+            Attendance.work_hours <= 0.0001,
+            db.func.coalesce(Attendance.note, '') == ''
+        ))
+    changed = [{'employee_id': employee_id, 'last_punch_at': last_punch_at, 'open_since': open_since}
+               for employee_id, (last_punch_at, open_since) in clocks.items()
+               if before.get(employee_id) != (last_punch_at, open_since)]
+    if changed:
+        db.session.execute(_clock_statement(), changed)
+
+    result.buckets = {bucket_of(employee_id, day) for employee_id, day in list(hours) + emptied}
+    months = defaultdict(list)
+    for employee_id, year, month in result.buckets:
+        months[(year, month)].append(employee_id)
+    for (year, month), month_employees in sorted(months.items()):
+        rebuild_month(year, month, month_employees)
+    bump(*result.buckets)
+    db.session.commit()
+    invalidate(*bucket_keys(*result.buckets))
+    return result
+
+
+def compact_all(batch_size=None):
+    """Compact until the log is empty, return the batch results"""
+    results = []
+    while True:
+        result = compact(batch_size)
+        if not result.events:
+            return results
+        results.append(result)
+
+
+def fresh_totals(employee_id, year, month):
+    """Hours per day of an employee's month including the punches not compacted yet,
+    and the start of the open shift (None when clocked out)"""
+    for _ in range(5):
+        clock = db.session.get(PunchClock, employee_id, populate_existing=True)
+        state = (clock.last_punch_at, clock.open_since) if clock else None
+        # A scan, but the compactor keeps the log short
+        pending = db.session.execute(
+            db.select(PunchEvent.employee_id, PunchEvent.punched_at, PunchEvent.id, PunchEvent.kind)
+            .where(PunchEvent.employee_id == employee_id)
+        ).all()
+        days = dict(db.session.execute(
+            db.select(Attendance.work_date, Attendance.work_hours)
+            .where(Attendance.employee_id == employee_id, attendance_in_month(year, month))
+        ).all())
+        # The clock moves whenever this employee's punches are compacted, which
+        # would count them twice: once from the log and once from attendance.
+        clock = db.session.get(PunchClock, employee_id, populate_existing=True)
+        if state == ((clock.last_punch_at, clock.open_since) if clock else None):
+            break
+    clocks = {employee_id: state} if state else {}
+    # Late punches only show up once compacted
+    events = [event for event in unique(sorted(tuple(row) for row in pending), set())
+              if not state or event[1] > state[0]]
+    hours, _, _ = fold(events, clocks, current_app.config['PUNCH_MAX_SHIFT_HOURS'])
+    for (_, day), value in hours.items():
+        if (day.year, day.month) == (year, month):
+            days[day] = days.get(day, 0) + value
+    return days, clocks.get(employee_id, (None, None))[1]
+
+
+def pending_count():
+    return db.session.scalar(db.select(db.func.count()).select_from(PunchEvent))
+
+
+def rejected_count():
+    return db.session.scalar(db.select(db.func.count()).select_from(PunchRejection))
+
+
+def apply_rejection(rejection):
+    """Add held hours to attendance once their month is open again, and commit"""
+    ensure_open(rejection.work_date)
+    if db.session.get(Employee, rejection.employee_id) is None:
+        raise ValueError(f'Employee {rejection.employee_id} no longer exists.')
+    left = _day_hours([(rejection.employee_id, rejection.work_date)]).get(
+        (rejection.employee_id, rejection.work_date), 0)
+    if left + rejection.work_hours < 0:
+        raise ValueError(f'The day has only {left:g} hours left to take {-rejection.work_hours:g} from.')
+    db.session.execute(_add_hours_statement(), [{
+        'employee_id': rejection.employee_id, 'work_date': rejection.work_date,
+        'work_hours': rejection.work_hours, 'created_at': datetime.utcnow()
+    }])
+    if round(left + rejection.work_hours, 4) <= 0:
+        db.session.execute(db.delete(Attendance).where(
+            Attendance.employee_id == rejection.employee_id, Attendance.work_date == rejection.work_date,
+            db.func.coalesce(Attendance.note, '') == ''
+        ))
+    bucket = bucket_of(rejection.employee_id, rejection.work_date)
+    db.session.delete(rejection)
+    refresh_summaries(bucket)
+    db.session.commit()
+    invalidate(*bucket_keys(bucket))
+
+
+def prune_history(days=None):
+    """Delete folded punches older than `days` (default PUNCH_HISTORY_DAYS) and commit,
+    return the row count. Each employee keeps everything from their last punch before
+    the cutoff taken with the clock closed, so refold() can still start from there."""
+    config = current_app.config
+    days = config['PUNCH_HISTORY_DAYS'] if days is None else days
+    if days <= 0:
+        return 0
+    cutoff = datetime.now() - timedelta(days=days)
+    max_shift = timedelta(hours=config['PUNCH_MAX_SHIFT_HOURS'])
+    rows = db.session.execute(
+        db.select(PunchHistory.employee_id, PunchHistory.punched_at, PunchHistory.kind)
+        .where(PunchHistory.punched_at < cutoff)
+        .order_by(PunchHistory.employee_id, PunchHistory.punched_at, PunchHistory.kind)
+    )
+    # The clock states of fold(), from each employee's oldest kept punch
+    keep_from = {}
+    current = open_since = None
+    for employee_id, punched_at, kind in rows:
+        if employee_id != current:
+            current, open_since = employee_id, None
+        if open_since is None or punched_at - open_since > max_shift:
+            keep_from[employee_id] = punched_at
+            open_since = None
+        if kind == 'in':
+            open_since = open_since or punched_at
+        else:
+            open_since = None
+    deleted = 0
+    if keep_from:
+        table = PunchHistory.__table__
+        deleted = db.session.execute(
+            db.delete(table).where(table.c.employee_id == db.bindparam('employee'),
+                                   table.c.punched_at < db.bindparam('since')),
+            [{'employee': employee_id, 'since': since} for employee_id, since in keep_from.items()]
+        ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def _compact_loop(app):
+    pruned_at = 0
+    while True:
+        with app.app_context():
+            try:
+                compact_all()
+                if time.monotonic() - pruned_at > PRUNE_SECONDS:
+                    pruned_at = time.monotonic()
+                    prune_history()
+            except CompactionConflict as e:
+                db.session.rollback()
+                app.logger.info('Punch compaction skipped: %s', e)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Punch compaction failed')
+            finally:
+                db.session.remove()
+        time.sleep(app.config['PUNCH_COMPACT_SECONDS'])
+
+
+def start_compactor(app):
+    """Start this process's compactor thread once"""
+    global _compactor
+    with _compactor_lock:
+        if _compactor is None:
+            _compactor = threading.Thread(target=_compact_loop, args=(app,), name='punch-compactor', daemon=True)
+            _compactor.start()
+    return _compactor
+
+
+def init_punches(app):
+    """Start the compactor with the first request, so CLI commands never run it"""
+    if app.config['PUNCH_COMPACT_SECONDS'] <= 0:
+        return
+
+    @app.before_request
+    def _start_punch_compactor():
+        if _compactor is None:
+            start_compactor(app)
@@ -0,0 +1,68 @@
+"""
+Template rendering.
+
+Outside debug mode, templates are no longer checked for changes on every
+render, and their compiled bytecode is kept in TEMPLATE_CACHE_DIR so a
+fresh worker process skips the Jinja compiler.
+
+fragment() caches the HTML of a report table in the process, keyed on the
+data version of its month (services.versions.month_stamp), so an unchanged
+report skips both its queries and its render. The |money filter formats
+amounts like "{:,.0f}".format(value), memoized, since wages repeat a lot.
+"""
+import os
+from functools import lru_cache
+from flask import current_app, render_template
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from services.cache import LRUCache
+from services.versions import month_stamp
+
+_fragments = None
+
+
+@lru_cache(maxsize=8192)
+def money(value):
+    """Amount with thousands separators and no decimals"""
+    return f'{value:,.0f}'
+
+
+def fragment_cache():
+    """The process-wide fragment cache, sized from the app config"""
+    global _fragments
+    if _fragments is None:
+        _fragments = LRUCache(
+            maxsize=current_app.config['FRAGMENT_CACHE_SIZE'],
+            ttl=current_app.config['FRAGMENT_CACHE_SECONDS']
+        )
+    return _fragments
+
+
+def fragment(template, key, build_context):
+    """HTML of `template`, rendered with build_context() on a miss and cached under key"""
+    if current_app.jinja_env.auto_reload:
+        # Templates may change under a cached copy
+        return Markup(render_template(template, **build_context()))
+    key = (template,) + tuple(key)
+    html = fragment_cache().get(key)
+    if html is None:
+        html = render_template(template, **build_context())
+        fragment_cache().set(key, html)
+    return Markup(html)
+
+
+def month_fragment(template, year, month, build_context, *extra):
+    """fragment() of a whole-month report, invalidated by any change to the month's data"""
+    return fragment(template, (year, month, month_stamp(year, month)[0]) + extra, build_context)
+
+
+def init_rendering(app):
+    """Register the filters and, outside debug mode, the template bytecode cache"""
+    app.jinja_env.filters['money'] = money
+    if app.debug or app.config['TEMPLATES_AUTO_RELOAD']:
+        return
+    app.jinja_env.auto_reload = False
+    directory = app.config['TEMPLATE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
@@ -0,0 +1,266 @@
+"""
+Employee search.
+
+On SQLite, employees are indexed in an FTS5 table (employee_search)
+holding accent-folded, lower-cased copies of the name and email, so "nguyen" finds "Nguyễn" and "đức" finds "Duc". The phone column
+holds every suffix of the phone's digits, so "5678" finds 0912345678. A query is
+split into words that must all match, the last one as a prefix. When
+nothing matches, every word is matched as a prefix and a word that still
+matches nothing is replaced by the known name words one edit away from it
+(typos), looked up in employee_search_terms.
+
+Matches are ranked in tiers: every word a whole name word, then every word
+in the name as a word or prefix, then the rest (phone, email). Within a
+tier, shorter names come first, then lower ids. That order is the rowid
+itself (sort_key(): the name's word count above the employee id), and FTS5
+reads a MATCH in rowid order, so a page is a LIMIT per tier that stops
+after the rows it returns instead of scoring every match.
+
+The index is updated from mapper events on every insert, update and delete
+of an Employee. Other databases, and SQLite builds without FTS5, fall back
+to LIKE filters.
+"""
+import re
+import sqlite3
+import unicodedata
+from functools import lru_cache
+from flask import request
+from models import db, Employee
+from services.pagination import Page, get_page_size
+
+TABLE = 'employee_search'
+TERMS_TABLE = 'employee_search_terms'
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz0123456789'
+MIN_FUZZY_LENGTH = 3
+ID_BITS = 32
+MAX_WORDS = 15  # Longer names rank with these
+
+
+def fold(text):
+    """Lower-case text with diacritics removed (Vietnamese đ becomes d)"""
+    text = (text or '').lower().replace('đ', 'd')
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if not unicodedata.combining(c))
+
+
+def words_of(text):
+    return re.findall(r'\w+', fold(text))
+
+
+@lru_cache(maxsize=None)
+def sqlite_has_fts5():
+    """Whether the SQLite library of this process was built with FTS5"""
+    connection = sqlite3.connect(':memory:')
+    try:
+        connection.execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+
+
+def search_available(bind=None):
+    return (bind or db.engine).dialect.name == 'sqlite' and sqlite_has_fts5()
+
+
+def create_index(connection):
+    connection.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+        f"USING fts5(name, phone, email, tokenize='unicode61', prefix='1 2 3')"
+    )
+    connection.exec_driver_sql(
+        f'CREATE TABLE IF NOT EXISTS {TERMS_TABLE} (term TEXT PRIMARY KEY) WITHOUT ROWID'
+    )
+
+
+def phone_suffixes(phone):
+    """Every suffix of the phone's digits: a prefix query on them matches any part of the number"""
+    digits = re.sub(r'\D', '', phone or '')
+    return ' '.join(digits[i:] for i in range(len(digits)))
+
+
+def sort_key(employee_id, words):
+    """rowid of an employee in the index: shorter names first, then lower ids"""
+    return (min(words, MAX_WORDS) << ID_BITS) | employee_id
+
+
+def employee_id_of(rowid):
+    return rowid & ((1 << ID_BITS) - 1)
+
+
+def _document(employee_id, full_name, phone, email):
+    name = fold(full_name).split()
+    return {'id': sort_key(employee_id, len(name)), 'name': ' '.join(name), 'phone': phone_suffixes(phone),
+            'email': fold(email)}
+
+
+def _delete(connection, employee_id):
+    # The word count of the indexed name is unknown here: try every key of the employee
+    connection.execute(
+        db.text(f'DELETE FROM {TABLE} WHERE rowid IN :keys').bindparams(db.bindparam('keys', expanding=True)),
+        {'keys': [sort_key(employee_id, words) for words in range(MAX_WORDS + 1)]}
+    )
+
+
+def _insert(connection, documents):
+    connection.execute(db.text(
+        f'INSERT INTO {TABLE} (rowid, name, phone, email) VALUES (:id, :name, :phone, :email)'
+    ), documents)
+    # Name words for typo lookups; words of deleted names are left behind, which is harmless
+    terms = {word for document in documents for word in re.findall(r'\w+', document['name'])}
+    if terms:
+        connection.execute(db.text(f'INSERT OR IGNORE INTO {TERMS_TABLE} (term) VALUES (:term)'),
+                           [{'term': term} for term in terms])
+
+
+def rebuild_index():
+    """Recreate the search index from the employees table, return the row count"""
+    if not search_available():
+        return 0
+    connection = db.session.connection()
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {TABLE}')
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {TERMS_TABLE}')
+    create_index(connection)
+    rows = db.session.execute(db.select(Employee.id, Employee.full_name, Employee.phone, Employee.email))
+    count = 0
+    while chunk := rows.fetchmany(10000):
+        _insert(connection, [_document(*row) for row in chunk])
+        count += len(chunk)
+    db.session.commit()
+    return count
+
+
+@db.event.listens_for(Employee, 'after_insert')
+@db.event.listens_for(Employee, 'after_update')
+def _employee_saved(mapper, connection, employee):
+    if search_available(connection):
+        _delete(connection, employee.id)
+        _insert(connection, [_document(employee.id, employee.full_name, employee.phone, employee.email)])
+
+
+@db.event.listens_for(Employee, 'after_delete')
+def _employee_deleted(mapper, connection, employee):
+    if search_available(connection):
+        _delete(connection, employee.id)
+
+
+def edits(word):
+    """Words one insertion, deletion, substitution or transposition away"""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    variants = set()
+    for left, right in splits:
+        if right:
+            variants.add(left + right[1:])
+            for c in ALPHABET:
+                variants.add(left + c + right[1:])
+        if len(right) > 1:
+            variants.add(left + right[1] + right[0] + right[2:])
+        for c in ALPHABET:
+            variants.add(left + c + right)
+    variants.discard(word)
+    return sorted(variants)
+
+
+def _has_match(expression):
+    return db.session.execute(db.text(
+        f'SELECT 1 FROM {TABLE} WHERE {TABLE} MATCH :expression LIMIT 1'
+    ), {'expression': expression}).first() is not None
+
+
+def _known_terms(words):
+    return db.session.execute(
+        db.text(f'SELECT term FROM {TERMS_TABLE} WHERE term IN :words').bindparams(
+            db.bindparam('words', expanding=True)),
+        {'words': words}
+    ).scalars().all()
+
+
+def parse_query(query, fuzzy=False):
+    """(FTS5 MATCH expression, [(whole-word term, term)] per query word) for a user query.
+
+    The expression is None if the query has no words."""
+    words = words_of(query)
+    if not words:
+        return None, []
+    groups = []
+    for i, word in enumerate(words):
+        whole = f'"{word}"'
+        term = f'"{word}"*' if fuzzy or i == len(words) - 1 else whole
+        if fuzzy and len(word) >= MIN_FUZZY_LENGTH and not _has_match(term):
+            corrections = _known_terms(edits(word))
+            if corrections:
+                whole = term = '(' + ' OR '.join(f'"{c}"' for c in corrections) + ')'
+        groups.append((whole, term))
+    return ' AND '.join(term for _, term in groups), groups
+
+
+def _tiers(groups):
+    """MATCH expressions of the ranking tiers, best first, each excluding the ones before"""
+    whole = 'name : (' + ' AND '.join(whole for whole, _ in groups) + ')'
+    name = 'name : (' + ' AND '.join(term for _, term in groups) + ')'
+    anywhere = ' AND '.join(term for _, term in groups)
+    tiers = [whole]
+    if name != whole:
+        tiers.append(f'({name}) NOT ({whole})')
+    tiers.append(f'({anywhere}) NOT ({name})')
+    return tiers
+
+
+def _ranked_ids(groups, limit, offset):
+    rowids = []
+    for expression in _tiers(groups):
+        rowids += db.session.execute(db.text(
+            f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH :expression ORDER BY rowid LIMIT :limit'
+        ), {'expression': expression, 'limit': offset + limit - len(rowids)}).scalars().all()
+        if len(rowids) == offset + limit:
+            break
+    return [employee_id_of(rowid) for rowid in rowids[offset:]]
+
+
+def search_employee_ids(query, limit=50, offset=0):
+    """Ids of the employees best matching `query`, best first"""
+    expression, groups = parse_query(query)
+    if expression is None:
+        return db.session.execute(
+            db.select(Employee.id).order_by(Employee.id).limit(limit).offset(offset)
+        ).scalars().all()
+    ids = _ranked_ids(groups, limit, offset)
+    if not ids and (offset == 0 or not _has_match(expression)):
+        ids = _ranked_ids(parse_query(query, fuzzy=True)[1], limit, offset)
+    return ids
+
+
+def search_page(query):
+    """Page of employees ranked by relevance; the cursor is an offset into the ranking"""
+    page_size = get_page_size()
+    offset = max(request.args.get('after', 0, type=int), 0)
+    ids = search_employee_ids(query, page_size + 1, offset)
+    found = {e.id: e for e in Employee.query.filter(Employee.id.in_(ids[:page_size]))}
+    items = [found[i] for i in ids[:page_size] if i in found]
+    next_cursor = str(offset + page_size) if len(ids) > page_size else None
+    return Page(items, next_cursor, offset)
+
+
+def like_filter(query):
+    """Fallback filter for databases without FTS5"""
+    return db.or_(
+        Employee.full_name.contains(query),
+        Employee.phone.contains(query),
+        Employee.email.contains(query)
+    )
+
+
+def search_filter(query):
+    """Filter on Employee matching `query`, unranked (used for streaming and the API).
+    Matches the same rows as search_employee_ids, typo fallback included."""
+    if not search_available():
+        return like_filter(query)
+    expression, _ = parse_query(query)
+    if expression is None:
+        return db.true()
+    if not _has_match(expression):
+        expression, _ = parse_query(query, fuzzy=True)
+    matches = db.text(
+        f'SELECT rowid & {(1 << ID_BITS) - 1} AS id FROM {TABLE} WHERE {TABLE} MATCH :expression'
+    ).bindparams(expression=expression).columns(db.column('id', db.Integer))
+    return Employee.id.in_(matches)
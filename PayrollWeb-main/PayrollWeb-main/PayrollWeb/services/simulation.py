@@ -0,0 +1,140 @@
+"""
+What-if payroll simulation.
+
+Positions, monthly work totals and monthly pay of a month range are loaded
+into NumPy arrays once. The pay is the payroll engine's total_salary, so it
+follows the effective-dated wage history (WageRate) month by month. Wage
+rules act per position, so after any sequence of rules every rate an
+employee was paid becomes a * rate + b with (a, b) depending only on the
+position, and a month's pay becomes a * pay + b * hours. Totals are
+therefore computed from per-position aggregates, and a batch of scenarios
+costs O(scenarios x positions x months) no matter how many employees there
+are.
+"""
+import time
+from itertools import chain
+import numpy as np
+from flask import current_app
+from models import db, Employee, AttendanceSummary
+from services.payroll import iter_months, payroll_select
+
+_datasets = {}
+
+
+class PayrollDataset:
+    def __init__(self, first, last, employee_ids, position_codes, positions, hours, pay):
+        self.first = first
+        self.last = last
+        self.months = [f'{y:04d}-{m:02d}' for y, m in iter_months(first, last)]
+        self.positions = positions            # (P,) position labels
+        self.employee_ids = employee_ids      # (E,) sorted
+        self.position_codes = position_codes  # (E,) index into positions
+        self.hours_per_employee = hours.sum(axis=1)
+        self.pay_per_employee = pay.sum(axis=1)
+
+        # Per-position aggregates, (P, M): sum of pay and of hours
+        self.position_pay = np.zeros((len(positions), len(self.months)))
+        self.position_hours = np.zeros((len(positions), len(self.months)))
+        np.add.at(self.position_pay, position_codes, pay)
+        np.add.at(self.position_hours, position_codes, hours)
+
+    @property
+    def size(self):
+        return len(self.employee_ids)
+
+
+def load_dataset(first, last, status='active'):
+    """Load positions, monthly work totals and monthly pay of months first..last into arrays"""
+    employees = db.select(Employee.id, Employee.position).order_by(Employee.id)
+    if status:
+        employees = employees.where(Employee.status == status)
+    rows = db.session.execute(employees).all()
+
+    employee_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    labels = [row[1] or '' for row in rows]
+    positions = sorted(set(labels))
+    codes = {label: i for i, label in enumerate(positions)}
+    position_codes = np.fromiter((codes[label] for label in labels), dtype=np.int64, count=len(rows))
+
+    months = list(iter_months(first, last))
+    hours = np.zeros((len(rows), len(months)))
+    pay = np.zeros((len(rows), len(months)))
+    for column, (year, month) in enumerate(months):
+        # The payroll engine's salary of each employee who worked that month
+        query = payroll_select(year, month, Employee.id, status=status).where(
+            AttendanceSummary.total_hours.isnot(None))
+        totals = db.session.execute(query).all()
+        if not totals or not len(rows):
+            continue
+        month_rows = np.fromiter(chain.from_iterable((row[0], row[1], row[3]) for row in totals),
+                                 dtype=np.float64, count=len(totals) * 3).reshape(-1, 3)
+        ids = month_rows[:, 0].astype(np.int64)
+        index = np.minimum(np.searchsorted(employee_ids, ids), len(employee_ids) - 1)
+        known = employee_ids[index] == ids
+        hours[index[known], column] = month_rows[known, 1]
+        pay[index[known], column] = month_rows[known, 2]
+
+    return PayrollDataset(first, last, employee_ids, position_codes, positions, hours, pay)
+
+
+def get_dataset(first, last, status='active'):
+    """load_dataset behind a short in-process cache, so repeated what-ifs skip the database"""
+    key = (first, last, status)
+    cached = _datasets.get(key)
+    if cached and time.monotonic() - cached[0] < current_app.config['SIMULATION_CACHE_SECONDS']:
+        return cached[1]
+    dataset = load_dataset(first, last, status)
+    _datasets.clear()
+    _datasets[key] = (time.monotonic(), dataset)
+    return dataset
+
+
+def wage_coefficients(dataset, rules):
+    """Per-position (a, b) so that every new rate is a * rate + b.
+
+    A rule is a dict with an optional 'position' (every position if empty),
+    'raise_pct' (percentage raise) and 'raise_amount' (flat raise per day);
+    rules apply in order."""
+    a = np.ones(len(dataset.positions))
+    b = np.zeros(len(dataset.positions))
+    for rule in rules:
+        position = rule.get('position')
+        if position:
+            if position not in dataset.positions:
+                continue
+            mask = dataset.positions.index(position)
+        else:
+            mask = slice(None)
+        factor = 1 + float(rule.get('raise_pct') or 0) / 100
+        a[mask] *= factor
+        b[mask] = b[mask] * factor + float(rule.get('raise_amount') or 0)
+    return a, b
+
+
+def simulate(dataset, scenarios, include_employees=False):
+    """Evaluate scenarios [{'name', 'rules'}] against the dataset, baseline first"""
+    names = ['Baseline'] + [s.get('name') or f'Scenario {i}' for i, s in enumerate(scenarios, start=1)]
+    coefficients = [wage_coefficients(dataset, [])] + [wage_coefficients(dataset, s.get('rules') or [])
+                                                      for s in scenarios]
+    a = np.array([c[0] for c in coefficients])  # (S, P)
+    b = np.array([c[1] for c in coefficients])  # (S, P)
+
+    # (S, P, M) payroll per scenario, position and month
+    totals = a[:, :, None] * dataset.position_pay + b[:, :, None] * dataset.position_hours
+    per_position = totals.sum(axis=2)
+    per_month = totals.sum(axis=1)
+
+    results = []
+    for i, name in enumerate(names):
+        result = {
+            'name': name,
+            'total': float(per_month[i].sum()),
+            'per_month': dict(zip(dataset.months, per_month[i].tolist())),
+            'per_position': dict(zip(dataset.positions, per_position[i].tolist())),
+        }
+        if include_employees:
+            pay = (a[i][dataset.position_codes] * dataset.pay_per_employee
+                   + b[i][dataset.position_codes] * dataset.hours_per_employee)
+            result['per_employee'] = dict(zip(dataset.employee_ids.tolist(), pay.tolist()))
+        results.append(result)
+    return results
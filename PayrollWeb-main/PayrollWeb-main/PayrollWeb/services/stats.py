@@ -0,0 +1,98 @@
+"""
+Cached dashboard statistics.
+
+Headcounts, month-to-date hours and payroll totals are read through a
+cache (STATS_CACHE_BACKEND: 'memory' for an in-process LRU, 'sqlite' for a
+file shared by all workers). Routes that change the underlying data call
+invalidate() after their commit with the keys from the *_keys helpers, so
+only the affected figures are recomputed.
+"""
+from flask import current_app
+from models import db, Employee, AttendanceSummary
+from services.cache import LRUCache, SQLiteCache
+from services.payroll import payroll_select
+
+_cache = None
+
+
+def stats_cache():
+    """The process-wide statistics cache, built from the app config"""
+    global _cache
+    if _cache is None:
+        config = current_app.config
+        if config['STATS_CACHE_BACKEND'] == 'sqlite':
+            _cache = SQLiteCache(config['STATS_CACHE_PATH'], ttl=config['STATS_CACHE_SECONDS'])
+        else:
+            _cache = LRUCache(maxsize=config['STATS_CACHE_SIZE'], ttl=config['STATS_CACHE_SECONDS'])
+    return _cache
+
+
+def cached(key, compute):
+    cache = stats_cache()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value)
+    return value
+
+
+def _month(year, month):
+    return f'{year:04d}-{month:02d}'
+
+
+# Keys
+
+def headcount_keys():
+    return ['employees:total', 'employees:active']
+
+
+def bucket_keys(*buckets):
+    """Keys depending on the attendance of the given (employee_id, year, month) buckets"""
+    keys = set()
+    for employee_id, year, month in buckets:
+        keys.add(f'hours:{_month(year, month)}')
+        keys.add(f'payroll:{_month(year, month)}')
+    return keys
+
+
+def employee_keys(employee_id, deleted=False):
+    """Keys depending on an employee's status and wage, or on its existence if deleted.
+
+    Call before deleting the employee: the months are read from its summaries."""
+    months = db.session.execute(db.select(AttendanceSummary.year, AttendanceSummary.month)
+                                .where(AttendanceSummary.employee_id == employee_id)).all()
+    keys = {'employees:active'} | {f'payroll:{_month(year, month)}' for year, month in months}
+    if deleted:
+        keys |= {'employees:total'} | {f'hours:{_month(year, month)}' for year, month in months}
+    return keys
+
+
+def invalidate(*keys):
+    stats_cache().delete_many(keys)
+
+
+# Figures
+
+def total_employees():
+    return cached('employees:total', lambda: db.session.scalar(db.select(db.func.count(Employee.id))))
+
+
+def active_employees():
+    return cached('employees:active', lambda: db.session.scalar(
+        db.select(db.func.count(Employee.id)).where(Employee.status == 'active')))
+
+
+def month_hours(year, month):
+    """Total work of all employees in a month"""
+    return cached(f'hours:{_month(year, month)}', lambda: db.session.scalar(
+        db.select(db.func.coalesce(db.func.sum(AttendanceSummary.total_hours), 0))
+        .where(AttendanceSummary.year == year, AttendanceSummary.month == month)))
+
+
+def payroll_total(year, month):
+    """Salary total of the active employees in a month"""
+    def compute():
+        rows = payroll_select(year, month, Employee.id).where(AttendanceSummary.total_hours.isnot(None))
+        rows = rows.order_by(None).subquery()
+        return db.session.scalar(db.select(db.func.coalesce(db.func.sum(rows.c.total_salary), 0)))
+    return cached(f'payroll:{_month(year, month)}', compute)
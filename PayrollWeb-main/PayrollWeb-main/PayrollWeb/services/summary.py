@@ -0,0 +1,117 @@
+"""
+Materialized monthly attendance summary.
+
+Each (employee_id, year, month) bucket is recomputed from the raw
+attendance rows of that month whenever one of them is written, so the
+rollup never drifts from the source data.
+"""
+from datetime import datetime
+from models import db, Attendance, AttendanceSummary
+from services.payroll import attendance_in_month
+from services.versions import bump
+
+
+def bucket_of(employee_id, work_date):
+    """Summary key of an attendance row"""
+    return (employee_id, work_date.year, work_date.month)
+
+
+def refresh_summaries(*buckets):
+    """Recompute the given (employee_id, year, month) buckets from attendance"""
+    db.session.flush()
+    bump(*buckets)
+    for employee_id, year, month in set(buckets):
+        total_hours, days_worked = db.session.query(
+            db.func.sum(Attendance.work_hours),
+            db.func.count(Attendance.id)
+        ).filter(
+            Attendance.employee_id == employee_id,
+            attendance_in_month(year, month)
+        ).one()
+
+        summary = db.session.get(AttendanceSummary, (employee_id, year, month))
+        if not days_worked:
+            if summary:
+                db.session.delete(summary)
+            continue
+
+        if not summary:
+            summary = AttendanceSummary(employee_id=employee_id, year=year, month=month)
+            db.session.add(summary)
+        summary.total_hours = total_hours
+        summary.days_worked = days_worked
+        summary.last_updated = datetime.utcnow()
+
+
+def rebuild_month(year, month, employee_ids=None):
+    """Recompute every bucket of one month (or those of employee_ids) with a single INSERT ... SELECT"""
+    db.session.flush()
+    stale = AttendanceSummary.query.filter_by(year=year, month=month)
+    if employee_ids is not None:
+        stale = stale.filter(AttendanceSummary.employee_id.in_(employee_ids))
+    stale.delete()
+    totals = db.select(
+        Attendance.employee_id,
+        db.literal(year),
+        db.literal(month),
+        db.func.sum(Attendance.work_hours),
+        db.func.count(Attendance.id),
+        db.literal(datetime.utcnow())
+    ).where(attendance_in_month(year, month)).group_by(Attendance.employee_id)
+    if employee_ids is not None:
+        totals = totals.where(Attendance.employee_id.in_(employee_ids))
+    db.session.execute(AttendanceSummary.__table__.insert().from_select(
+        ['employee_id', 'year', 'month', 'total_hours', 'days_worked', 'last_updated'],
+        totals
+    ))
+
+
+def raw_monthly_totals():
+    """Aggregate every bucket straight from the attendance table"""
+    year = db.extract('year', Attendance.work_date)
+    month = db.extract('month', Attendance.work_date)
+    return db.session.query(
+        Attendance.employee_id,
+        year,
+        month,
+        db.func.sum(Attendance.work_hours),
+        db.func.count(Attendance.id)
+    ).group_by(Attendance.employee_id, year, month)
+
+
+def rebuild_summaries():
+    """Drop the rollup and rebuild it from raw attendance, return bucket count"""
+    AttendanceSummary.query.delete()
+    now = datetime.utcnow()
+    rows = [{
+        'employee_id': employee_id,
+        'year': int(year),
+        'month': int(month),
+        'total_hours': total_hours,
+        'days_worked': days_worked,
+        'last_updated': now
+    } for employee_id, year, month, total_hours, days_worked in raw_monthly_totals()]
+    if rows:
+        db.session.execute(AttendanceSummary.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def verify_summaries():
+    """Compare the rollup with raw attendance, return the mismatched buckets"""
+    expected = {
+        (employee_id, int(year), int(month)): (total_hours, days_worked)
+        for employee_id, year, month, total_hours, days_worked in raw_monthly_totals()
+    }
+    actual = {
+        (s.employee_id, s.year, s.month): (s.total_hours, s.days_worked)
+        for s in AttendanceSummary.query
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        want = expected.get(key, (0, 0))
+        got = actual.get(key, (0, 0))
+        if want[1] != got[1] or abs(want[0] - got[0]) > 1e-9:
+            mismatches.append((key, want, got))
+    return mismatches
@@ -0,0 +1,115 @@
+"""
+Handlers of the background jobs (see services.jobs).
+
+Each returns a JSON-ready result shown on the job page. Handlers that
+report progress commit as they go, so they are written to be safe to run
+again after a crash: deletes work in chunks, the attendance upsert is
+idempotent and exports rewrite their file. Each committed chunk of
+attendance carries the refresh of its summary buckets, so the rollup is
+right between chunks and after a failed last attempt.
+"""
+import io
+import os
+from flask import current_app
+from models import db, Employee, Attendance, AttendanceSummary
+from services.export import ENCODERS, FORMATS, payroll_rows
+from services.importer import import_attendance
+from services.jobs import handler, job_file
+from services.payroll import iter_months, parse_month
+from services.periods import close_period
+from services.principal import invalidate_principal
+from services.stats import bucket_keys, employee_keys, invalidate
+from services.summary import refresh_summaries
+from services.versions import bump_employee
+
+DELETE_CHUNK_ROWS = 10000
+
+
+@handler('close_period', max_attempts=1)
+def close_period_job(context, month, closed_by=None):
+    period = close_period(*parse_month(month), closed_by=closed_by)
+    return {'month': month, 'employee_count': period.employee_count, 'total_salary': period.total_salary}
+
+
+@handler('payroll_export')
+def payroll_export_job(context, first, last, fmt):
+    months = list(iter_months(parse_month(first), parse_month(last)))
+    extension = FORMATS[fmt][1]
+
+    def rows():
+        for done, month in enumerate(months):
+            context.progress(done, len(months), f'{month[0]:04d}-{month[1]:02d}')
+            yield from payroll_rows(month, month)
+        context.progress(len(months), len(months), f'{len(months)} months')
+
+    path = job_file(context.job_id, extension)
+    with open(path, 'wb') as output:
+        for chunk in ENCODERS[fmt](rows()):
+            output.write(chunk)
+    return {'file': os.path.basename(path), 'download_name': f'payroll_{first}_{last}.{extension}',
+            'bytes': os.path.getsize(path)}
+
+
+@handler('import_attendance')
+def import_attendance_job(context, path, fmt, filename=None):
+    size = os.path.getsize(path)
+    done = False
+    try:
+        with open(path, 'rb') as raw:
+            stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+            result = import_attendance(
+                stream, fmt, current_app.config['IMPORT_BATCH_SIZE'],
+                progress=lambda result: context.progress(raw.tell(), size, f'{result.rows} rows read')
+            )
+        done = True
+    finally:
+        if done or context.final_attempt:
+            os.remove(path)
+    invalidate(*bucket_keys(*result.buckets))
+    return {'filename': filename, 'rows': result.rows, 'imported': result.imported,
+            'error_count': result.error_count, 'errors': result.errors, 'seconds': result.seconds}
+
+
+@handler('delete_employee')
+def delete_employee_job(context, employee_id):
+    employee = db.session.get(Employee, employee_id)
+    if employee is None:
+        return {'deleted': False}
+    full_name = employee.full_name
+    stats_keys = employee_keys(employee_id, deleted=True)
+
+    # Attendance first, in chunks of consecutive days, instead of one huge ORM cascade
+    own = Attendance.employee_id == employee_id
+    total = db.session.scalar(db.select(db.func.count()).where(own))
+    deleted = 0
+    while True:
+        first = db.session.scalar(db.select(db.func.min(Attendance.work_date)).where(own))
+        if first is None:
+            break
+        last = db.session.scalar(db.select(Attendance.work_date).where(own).order_by(Attendance.work_date)
+                                 .offset(DELETE_CHUNK_ROWS - 1).limit(1))
+        if last is None:
+            last = db.session.scalar(db.select(db.func.max(Attendance.work_date)).where(own))
+        count = db.session.execute(db.delete(Attendance).where(own, Attendance.work_date <= last)).rowcount
+        # The summaries of the deleted days, in the same transaction
+        month_key = AttendanceSummary.year * 100 + AttendanceSummary.month
+        months = db.session.execute(db.select(AttendanceSummary.year, AttendanceSummary.month).where(
+            AttendanceSummary.employee_id == employee_id,
+            month_key.between(first.year * 100 + first.month, last.year * 100 + last.month))).all()
+        refresh_summaries(*[(employee_id, year, month) for year, month in months])
+        db.session.commit()
+        deleted += count
+        context.progress(deleted, total or 1, f'{deleted} of {total} attendance rows deleted')
+        if count < DELETE_CHUNK_ROWS:
+            break
+
+    db.session.expire(employee)
+    user_id = employee.user.id if employee.user else None
+    if employee.user:
+        db.session.delete(employee.user)
+    db.session.delete(employee)
+    bump_employee(employee_id)
+    db.session.commit()
+    invalidate_principal(user_id)
+    invalidate(*stats_keys)
+    return {'deleted': True, 'full_name': full_name, 'attendance_rows': deleted}
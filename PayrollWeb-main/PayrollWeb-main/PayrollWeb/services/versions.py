@@ -0,0 +1,71 @@
+"""
+Version stamps of the employee self-service pages.
+
+Every attendance write bumps the (employee, year, month) stamp of its
+bucket, in the same transaction; profile and wage edits bump the
+employee-wide stamp (year = month = 0), since they can change any month.
+Whether a page may have changed is then one primary-key lookup, which is
+what the ETags of services.http_cache are built from.
+
+month_stamp() versions the whole-month reports (see services.rendering)
+with the sums of every employee's stamps, read through the (year, month)
+index. Stamps only ever grow, so the sums change with every bump, and
+concurrent writers never update a shared row.
+"""
+from datetime import datetime
+from models import db, PageVersion
+
+EMPLOYEE_WIDE = (0, 0)
+
+
+def _upsert_statement():
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(PageVersion.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=['employee_id', 'year', 'month'],
+        set_={'version': PageVersion.__table__.c.version + 1, 'updated_at': statement.excluded.updated_at}
+    )
+
+
+def bump(*buckets):
+    """Bump the stamps of the given (employee_id, year, month) buckets; the caller commits"""
+    if not buckets:
+        return
+    now = datetime.utcnow()
+    db.session.execute(_upsert_statement(), [
+        {'employee_id': employee_id, 'year': year, 'month': month, 'version': 1, 'updated_at': now}
+        for employee_id, year, month in sorted(set(buckets))
+    ])
+
+
+def bump_employee(employee_id):
+    """Bump the stamp shared by all months of an employee"""
+    bump((employee_id,) + EMPLOYEE_WIDE)
+
+
+def month_stamp(year, month):
+    """Stamp of every employee's data for a month, like page_stamp()"""
+    # One index range per stamp, summed without a GROUP BY
+    totals = [db.select(db.literal(key_month).label('month'),
+                        db.func.coalesce(db.func.sum(PageVersion.version), 0),
+                        db.func.max(PageVersion.updated_at))
+              .where(PageVersion.year == key_year, PageVersion.month == key_month)
+              for key_year, key_month in (EMPLOYEE_WIDE, (year, month))]
+    rows = db.session.execute(db.union_all(*totals)).all()
+    versions = {row[0]: row[1] for row in rows}
+    stamp = (versions[EMPLOYEE_WIDE[1]], versions[month])
+    return stamp, max((row[2] for row in rows if row[2] is not None), default=None)
+
+
+def page_stamp(employee_id, year, month):
+    """((employee-wide version, month version), time of the last change) of an employee's month"""
+    rows = db.session.execute(db.select(PageVersion.month, PageVersion.version, PageVersion.updated_at).where(
+        PageVersion.employee_id == employee_id,
+        db.tuple_(PageVersion.year, PageVersion.month).in_([EMPLOYEE_WIDE, (year, month)])
+    )).all()
+    versions = {row.month: row.version for row in rows}
+    stamp = (versions.get(EMPLOYEE_WIDE[1], 0), versions.get(month, 0))
+    return stamp, max((row.updated_at for row in rows), default=None)
@@ -0,0 +1,134 @@
+"""
+Synthetic workforce generator for benchmarks and load tests.
+
+Creates employees (each with a login 'user<id>' / password '123456'), and
+their weekday attendance for a range of months, from a fixed random seed
+so the same arguments always produce the same data. Rows go in with large
+executemany batches on the raw DBAPI cursor; all users share one password
+hash, computed once, since hashing each would dominate the run time.
+"""
+import random
+from datetime import date, datetime, timedelta
+from models import db, User, Employee, Attendance
+from services.payroll import iter_months, month_bounds
+from services.passwords import hash_password
+
+FAMILY = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng',
+          'Bùi', 'Đỗ', 'Hồ', 'Ngô', 'Dương', 'Lý']
+MIDDLE = ['Văn', 'Thị', 'Hữu', 'Đức', 'Minh', 'Ngọc', 'Thanh', 'Quốc', 'Gia', 'Xuân']
+GIVEN = ['An', 'Bình', 'Cường', 'Dũng', 'Đạt', 'Giang', 'Hà', 'Hải', 'Hạnh', 'Hiếu', 'Hoa',
+         'Hùng', 'Hương', 'Khánh', 'Lan', 'Linh', 'Long', 'Mai', 'Nam', 'Nga', 'Phong',
+         'Phúc', 'Quân', 'Quang', 'Sơn', 'Tâm', 'Thảo', 'Thắng', 'Trang', 'Tuấn', 'Vy', 'Yến']
+POSITIONS = {  # position: (lowest, highest) daily wage
+    'Sales person': (250000, 400000),
+    'Accountant': (300000, 500000),
+    'Technician': (300000, 550000),
+    'Cashier': (220000, 320000),
+    'Driver': (250000, 380000),
+    'Warehouse staff': (200000, 300000),
+    'Security': (200000, 280000),
+    'Manager': (600000, 1200000),
+}
+PASSWORD = '123456'
+BATCH_SIZE = 10000
+
+
+def random_name(rng):
+    return f'{rng.choice(FAMILY)} {rng.choice(MIDDLE)} {rng.choice(GIVEN)}'
+
+
+def _insert_text(dialect, table, columns):
+    """INSERT of exactly `columns` in the driver's paramstyle. Compiling db.insert()
+    instead would add the columns that have Python-side defaults."""
+    quote = dialect.identifier_preparer.quote
+    markers = {
+        'qmark': lambda i, name: '?',
+        'format': lambda i, name: '%s',
+        'numeric': lambda i, name: f':{i + 1}',
+        'named': lambda i, name: f':{name}',
+        'pyformat': lambda i, name: f'%({name})s',
+    }[dialect.paramstyle]
+    return (f'INSERT INTO {quote(table.name)} ({", ".join(quote(name) for name in columns)}) '
+            f'VALUES ({", ".join(markers(i, name) for i, name in enumerate(columns))})')
+
+
+def _bulk_insert(connection, table, columns, rows):
+    """executemany of driver-ready tuples in BATCH_SIZE chunks, return the row count"""
+    statement = _insert_text(connection.dialect, table, columns)
+    positional = connection.dialect.paramstyle in ('qmark', 'format', 'numeric')
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row if positional else dict(zip(columns, row)))
+        if len(batch) == BATCH_SIZE:
+            connection.exec_driver_sql(statement, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        connection.exec_driver_sql(statement, batch)
+        count += len(batch)
+    return count
+
+
+def generate_workforce(employees, months, seed=1, last_month=None, absence_rate=0.05):
+    """Insert `employees` employees with users and `months` months of attendance
+    ending with `last_month` (year, month; default the previous month).
+    Return (employee count, attendance count)."""
+    from services.summary import rebuild_summaries
+    from services.search import rebuild_index
+
+    rng = random.Random(seed)
+    if last_month is None:
+        first_of_month = date.today().replace(day=1)
+        previous = first_of_month - timedelta(days=1)
+        last_month = (previous.year, previous.month)
+    first_index = last_month[0] * 12 + last_month[1] - 1 - (months - 1)
+    first_month = (first_index // 12, first_index % 12 + 1)
+    created_at = datetime(*first_month, 1)
+
+    first_id = (db.session.scalar(db.select(db.func.max(Employee.id))) or 0) + 1
+    ids = range(first_id, first_id + employees)
+    positions = list(POSITIONS)
+    staff = []
+    for employee_id in ids:
+        position = rng.choice(positions)
+        low, high = POSITIONS[position]
+        staff.append((
+            employee_id, random_name(rng), f'09{rng.randrange(10 ** 8):08d}',
+            f'user{employee_id}@example.com', position, float(rng.randrange(low, high + 1, 10000)),
+            created_at.date().isoformat(), 'active' if rng.random() < 0.95 else 'inactive',
+            created_at.isoformat(' ')
+        ))
+
+    connection = db.session.connection()
+    _bulk_insert(connection, Employee.__table__,
+                 ('id', 'full_name', 'phone', 'email', 'position', 'daily_wage',
+                  'start_date', 'status', 'created_at'), staff)
+
+    password_hash = hash_password(PASSWORD)
+    _bulk_insert(connection, User.__table__,
+                 ('username', 'password_hash', 'role', 'employee_id'),
+                 ((f'user{employee_id}', password_hash, 'user', employee_id) for employee_id in ids))
+
+    workdays = []
+    for year, month in iter_months(first_month, last_month):
+        start, end = month_bounds(year, month)
+        workdays += [(start + timedelta(days=i)).isoformat()
+                     for i in range((end - start).days) if (start + timedelta(days=i)).weekday() < 5]
+
+    def attendance():
+        stamp = created_at.isoformat(' ')
+        for employee_id in ids:
+            for day in workdays:
+                roll = rng.random()
+                if roll < absence_rate:
+                    continue
+                yield (employee_id, day, 0.5 if roll < absence_rate * 2 else 1.0, '', stamp)
+
+    count = _bulk_insert(connection, Attendance.__table__,
+                         ('employee_id', 'work_date', 'work_hours', 'note', 'created_at'), attendance())
+    db.session.commit()
+
+    rebuild_summaries()
+    rebuild_index()
+    return employees, count
@@ -0,0 +1,96 @@
+"""
+Statements per page must not grow with the data (see services.loading).
+
+Each page is requested once to warm the caches, then counted on a second
+request, against a small and a large database.
+"""
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+SMALL, LARGE = 3, 300  # Employees
+PAGES = {
+    'admin.attendance': ('admin', '/admin/attendance'),
+    'admin.employees': ('admin', '/admin/employees'),
+    'employee.attendance': ('employee', '/employee/attendance'),
+}
+
+
+def build_app(directory, employees, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///' + os.path.join(directory, 'hrms.db'))
+    monkeypatch.setattr(Config, 'STATS_CACHE_PATH', os.path.join(directory, 'stats.db'))
+    monkeypatch.setattr(Config, 'TEMPLATE_CACHE_DIR', '')
+    monkeypatch.setattr(Config, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    monkeypatch.setattr(Config, 'JOB_WORKERS', 0)
+    monkeypatch.setattr(Config, 'PUNCH_COMPACT_SECONDS', 0)
+    monkeypatch.setattr(Config, 'METRICS_ENABLED', False)
+    # Process-wide caches of an app built earlier in the session
+    import services.principal
+    import services.rendering
+    import services.stats
+    monkeypatch.setattr(services.principal, '_principals', None)
+    monkeypatch.setattr(services.rendering, '_fragments', None)
+    monkeypatch.setattr(services.stats, '_cache', None)
+
+    from app import create_app
+    from models import db, Employee, User, Attendance
+    from services.summary import rebuild_summaries
+    app = create_app()
+    first = date.today().replace(day=1)
+    with app.app_context():
+        db.session.execute(db.insert(Employee), [
+            {'id': i, 'full_name': f'Employee {i}', 'position': f'Position {i % 5}',
+             'daily_wage': 100.0, 'start_date': date(2024, 1, 1)} for i in range(1, employees + 1)])
+        # A few days each, spread so the month holds at least a page of rows at the large size
+        db.session.execute(db.insert(Attendance), [
+            {'employee_id': i, 'work_date': first + timedelta(days=day), 'work_hours': 8.0}
+            for i in range(1, employees + 1) for day in range(min(date.today().day, 4))])
+        admin = User(username='admin', role='admin')
+        admin.set_password('admin')
+        user = User(username='employee', role='user', employee_id=1)
+        user.set_password('employee')
+        db.session.add_all([admin, user])
+        db.session.commit()
+        rebuild_summaries()
+    return app
+
+
+def statement_count(app, role, path):
+    """Statements run by the second GET of path, signed in as role"""
+    from models import db
+    client = app.test_client()
+    client.post('/login', data={'username': role, 'password': role})
+    assert client.get(path).status_code == 200
+    statements = []
+    with app.app_context():
+        engine = db.engine
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(path)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('endpoint', sorted(PAGES))
+def test_query_count_does_not_grow_with_rows(endpoint, tmp_path, monkeypatch):
+    role, path = PAGES[endpoint]
+    counts = []
+    for employees in (SMALL, LARGE):
+        directory = tmp_path / str(employees)
+        directory.mkdir()
+        with monkeypatch.context() as patch:
+            counts.append(statement_count(build_app(str(directory), employees, patch), role, path))
+    assert counts[0] == counts[1], f'{endpoint}: {counts[0]} statements with {SMALL} employees, {counts[1]} with {LARGE}'
@@ -0,0 +1,35 @@
+"""
+The synthetic workforce generator (flask seed workforce, the benchmarks)
+writes with raw INSERTs, so a schema change can break it without any page
+noticing. Run it on a tiny database.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+
+def test_generate_workforce(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', 'sqlite:///' + str(tmp_path / 'hrms.db'))
+    monkeypatch.setattr(Config, 'STATS_CACHE_PATH', str(tmp_path / 'stats.db'))
+    monkeypatch.setattr(Config, 'TEMPLATE_CACHE_DIR', '')
+    monkeypatch.setattr(Config, 'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+    monkeypatch.setattr(Config, 'JOB_WORKERS', 0)
+    monkeypatch.setattr(Config, 'PUNCH_COMPACT_SECONDS', 0)
+    monkeypatch.setattr(Config, 'METRICS_ENABLED', False)
+
+    from app import create_app
+    from models import db, Employee, User, Attendance, AttendanceSummary
+    from services.workforce import PASSWORD, generate_workforce
+    app = create_app()
+    with app.app_context():
+        employees, attendance = generate_workforce(5, 2, last_month=(2024, 2))
+        assert (employees, attendance) == (5, db.session.scalar(db.select(db.func.count(Attendance.id))))
+        assert attendance > 0
+        assert db.session.scalar(db.select(db.func.count(Employee.id))) == 5
+        user = User.query.filter_by(username='user1').one()
+        assert user.employee_id == 1 and user.auth_version == 1 and user.check_password(PASSWORD)
+        total = db.session.scalar(db.select(db.func.sum(AttendanceSummary.days_worked)))
+        assert total == attendance